@@ -0,0 +1,285 @@
+"""
+Performance benchmarks of the simulation functions.
+
+Every case is run over a matrix of time steps x sims x assets in its own process,
+and the best wall time of a few repeats, the peak RSS added by the case and the
+number of paths per second (sims x assets / time) are recorded.
+
+Usage (from the root of the repo):
+
+    python benchmarks/bench_sims.py                      # run and print
+    python benchmarks/bench_sims.py --save out.json      # run and save results
+    python benchmarks/bench_sims.py --compare benchmarks/baseline.json
+
+With --compare, the script exits with status 1 if any case is slower than the
+baseline by more than --tolerance (25% by default) or uses more than --tolerance
+more memory, so it can be run before a release. Timings depend on the machine, so
+the baseline should be regenerated with --save on the machine that runs the
+comparison. --quick runs the smallest sizes only.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+# sizes of the benchmark matrix
+STEPS = [52, 252]
+SIMS = [1_000, 10_000, 50_000]
+ASSETS = [2, 4]
+
+QUICK_STEPS = [52]
+QUICK_SIMS = [1_000]
+QUICK_ASSETS = [2]
+
+REPEATS = 3
+
+
+def _cor(M):
+    cor = np.full((M, M), 0.3)
+    np.fill_diagonal(cor, 1)
+    return cor
+
+
+def _cases(steps, sims, assets):
+    # name, function of (rt, N, sims, M), and the sizes it is run over
+    univariate = [
+        ("simGBM", lambda rt, N, S, M: rt.simGBM(T=1, dt=1 / N, sims=S, seed=1)),
+        (
+            "simOU_c",
+            lambda rt, N, S, M: rt.simOU(T=1, dt=1 / N, sims=S, seed=1, c=True),
+        ),
+        (
+            "simOU_py",
+            lambda rt, N, S, M: rt.simOU(T=1, dt=1 / N, sims=S, seed=1, c=False),
+        ),
+        (
+            "simOU_stats",
+            lambda rt, N, S, M: rt.simOU(T=1, dt=1 / N, sims=S, seed=1, keep="stats"),
+        ),
+        (
+            "simOUJ",
+            lambda rt, N, S, M: rt.simOUJ(T=1, dt=1 / N, sims=S, seed=1, mr_lag=5),
+        ),
+        (
+            "simOUJ_sparse",
+            lambda rt, N, S, M: rt.simOUJ(
+                T=1, dt=1 / N, sims=S, seed=1, mr_lag=5, jumps="sparse"
+            ),
+        ),
+    ]
+    multivariate = [
+        (
+            "generate_eps_MV",
+            lambda rt, N, S, M: rt.generate_eps_MV(
+                _cor(M), T=1, dt=1 / N, sims=S, seed=1
+            ),
+        ),
+        (
+            "simOU_MV",
+            lambda rt, N, S, M: rt.simOU_MV(
+                s0=np.full(M, 5.0),
+                mu=np.full(M, 4.0),
+                theta=np.full(M, 2.0),
+                sigma=np.full(M, 0.3),
+                T=1,
+                dt=1 / N,
+                cor=_cor(M),
+                sims=S,
+                seed=1,
+            ),
+        ),
+        (
+            "simOUJ_MV",
+            lambda rt, N, S, M: rt.simOUJ_MV(
+                s0=np.full(M, 5.0),
+                mu=np.full(M, 4.0),
+                theta=np.full(M, 2.0),
+                sigma=np.full(M, 0.3),
+                jump_prob=np.full(M, 2.0),
+                jump_avgsize=np.full(M, 1.0),
+                jump_stdv=np.full(M, 0.1),
+                T=1,
+                dt=1 / N,
+                cor=_cor(M),
+                sims=S,
+                seed=1,
+                mr_lag=np.full(M, 5),
+            ),
+        ),
+    ]
+
+    out = []
+    for N in steps:
+        for S in sims:
+            for name, fun in univariate:
+                out.append((name, N, S, 1))
+            for M in assets:
+                for name, fun in multivariate:
+                    out.append((name, N, S, M))
+    return out, dict(univariate + multivariate)
+
+
+def _rss():
+    # peak resident set size of this process in bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if platform.system() == "Darwin" else rss * 1024
+
+
+def _run_case(args):
+    name, N, S, M, repeats = args
+
+    import risktools as rt
+
+    fun = _cases([N], [S], [M])[1][name]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # small warm up run so that jit compilation and imports are not timed
+        fun(rt, N, 10, M)
+        before = _rss()
+
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fun(rt, N, S, M)
+            times.append(time.perf_counter() - start)
+
+    best = min(times)
+
+    return {
+        "name": name,
+        "steps": N,
+        "sims": S,
+        "assets": M,
+        "time": best,
+        "peak_rss": _rss() - before,
+        "paths_per_sec": S * M / best,
+    }
+
+
+def _processor():
+    # model name of the cpu, which platform.processor leaves empty on linux
+    with contextlib.suppress(OSError):
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    return platform.processor()
+
+
+def _key(r):
+    return f"{r['name']}[steps={r['steps']},sims={r['sims']},assets={r['assets']}]"
+
+
+def run(quick=False, repeats=REPEATS, only=None):
+    """
+    Run the benchmark matrix, each case in a fresh process so that its peak RSS is
+    measured on its own. Returns a dict of the environment and the results by case.
+    """
+    if quick:
+        cases, _ = _cases(QUICK_STEPS, QUICK_SIMS, QUICK_ASSETS)
+    else:
+        cases, _ = _cases(STEPS, SIMS, ASSETS)
+
+    if only is not None:
+        cases = [c for c in cases if c[0] in only]
+
+    ctx = mp.get_context("spawn")
+    results = {}
+
+    for name, N, S, M in cases:
+        with ctx.Pool(1) as pool:
+            r = pool.apply(_run_case, ((name, N, S, M, repeats),))
+        results[_key(r)] = r
+        print(
+            f"{_key(r):55s} {r['time']:9.4f}s {r['peak_rss'] / 2**20:9.1f}MB "
+            f"{r['paths_per_sec']:14,.0f} paths/s",
+            flush=True,
+        )
+
+    import risktools as rt
+
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": _processor(),
+            "cpus": os.cpu_count(),
+            "backend": rt.get_backend(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.25):
+    """
+    Compare results to a baseline. Returns the list of regressions, cases whose time or
+    peak RSS is more than tolerance above the baseline. Memory differences under 16MB
+    are ignored as noise.
+    """
+    regressions = []
+
+    for key, r in current["results"].items():
+        if key not in baseline["results"]:
+            continue
+        b = baseline["results"][key]
+
+        if r["time"] > b["time"] * (1 + tolerance):
+            regressions.append(f"{key}: time {b['time']:.4f}s -> {r['time']:.4f}s")
+
+        if (r["peak_rss"] > b["peak_rss"] * (1 + tolerance)) & (
+            r["peak_rss"] - b["peak_rss"] > 2**24
+        ):
+            regressions.append(
+                f"{key}: peak RSS {b['peak_rss'] / 2**20:.1f}MB -> "
+                f"{r['peak_rss'] / 2**20:.1f}MB"
+            )
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="smallest sizes only")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--only", nargs="+", help="names of the cases to run")
+    parser.add_argument("--save", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    current = run(quick=args.quick, repeats=args.repeats, only=args.only)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressions = compare(current, baseline, args.tolerance)
+        for r in regressions:
+            print("REGRESSION", r)
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@ import os
 import sys
 import pandas as pd
 import numpy as np
+import pytest
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/")
 
@@ -465,5 +466,250 @@ def test_simOUJ_MV_sigma():
     assert np.allclose(df1, df2), "Time varying sigma test failed"
 
 
+def test_simOU_MV_exact():
+    cor = [[1, 0.2], [0.2, 1]]
+    eps = rt.generate_eps_MV(cor=cor, T=4, dt=0.25, sims=2, seed=12345)
+
+    df = rt.simOU_MV(
+        s0=[5, 5],
+        mu=[4, 3],
+        theta=[2, 8],
+        T=4,
+        sigma=[0.32, 0.2],
+        eps=eps,
+        scheme="exact",
+    )
+    ans = rt.simOU(5, 3, 8, 0.2, T=4, dt=0.25, eps=eps[:, :, 1], scheme="exact")
+
+    assert np.allclose(df[:, :, 1], ans), "Exact scheme MV test failed"
+
+
+def test_simOU_MV_workers():
+    s0 = [5] * 2
+    mu = [4] * 2
+    theta = [2] * 2
+    sigma = [0.32] * 2
+    cor = [[1, 0.2], [0.2, 1]]
+
+    df1 = rt.simOU_MV(
+        s0=s0,
+        mu=mu,
+        theta=theta,
+        T=1,
+        dt=1 / 252,
+        sigma=sigma,
+        cor=cor,
+        sims=50,
+        seed=12345,
+    )
+    df2 = rt.simOU_MV(
+        s0=s0,
+        mu=mu,
+        theta=theta,
+        T=1,
+        dt=1 / 252,
+        sigma=sigma,
+        cor=cor,
+        sims=50,
+        seed=12345,
+        workers=3,
+    )
+    assert np.array_equal(df1, df2), "Workers test failed"
+
+
+def test_MV_fan():
+    kwargs = dict(
+        s0=[100, 50], r=0, sigma=[0.1, 0.2], T=1, dt=1 / 252, cor=[[1, 0.5], [0.5, 1]]
+    )
+    df = rt.simGBM_MV(**kwargs, sims=2000, seed=12345)
+    fan = rt.simGBM_MV(**kwargs, sims=2000, seed=12345, fan=rt.FanAccumulator())
+
+    assert fan.shape == (253, 14), "simGBM_MV fan test failed"
+    assert np.allclose(fan[(1, "mean")], df[:, :, 1].mean(axis=1)), "Fan mean failed"
+
+    ou = rt.MVOU(
+        s0=[5, 5], mu=[4, 4], theta=[2, 2], sigma=[0.1, 0.1], T=1, dt=1 / 252,
+        cor=[[1, 0.5], [0.5, 1]],
+    )  # fmt: skip
+    ou.fit()
+    ou.simulate(sims=500, seed=12345, fan=rt.FanAccumulator(quantiles=[0.5]))
+    assert ou.fan.shape == (253, 10), "MVOU fan test failed"
+    assert ou.sims is None, "MVOU fan test failed"
+
+
+def test_generate_eps_MV_source():
+    source = rt.SobolNormalSource(seed=12345)
+    eps = rt.generate_eps_MV([[1, 0.5], [0.5, 1]], 1, 1 / 52, sims=4096, source=source)
+
+    assert eps.shape == (52, 4096, 2), "Source shape test failed"
+    assert np.allclose(
+        np.corrcoef(eps.reshape(-1, 2).T), [[1, 0.5], [0.5, 1]], atol=0.01
+    )
+
+
+def test_simOUJ_MV_streams():
+    # identical assets with perfectly correlated diffusions must still get
+    # independent jumps
+    kwargs = dict(
+        s0=[5, 5], mu=[4, 4], theta=[2, 2], sigma=[0.1, 0.1], jump_prob=[5, 5],
+        jump_avgsize=[1, 1], jump_stdv=[0.1, 0.1], T=1, dt=1 / 252,
+        cor=[[1, 1], [1, 1]], sims=20,
+    )  # fmt: skip
+    df = rt.simOUJ_MV(**kwargs, seed=12345)
+
+    assert not np.allclose(df[:, :, 0], df[:, :, 1]), "Jump streams test failed"
+    assert np.array_equal(df, rt.simOUJ_MV(**kwargs, seed=12345)), "Seed test failed"
+
+    w1 = rt.generate_random_portfolio_weights(3, 10, seed=12345)
+    w2 = rt.generate_random_portfolio_weights(3, 10, seed=12345)
+    assert np.array_equal(w1, w2), "Weights seed test failed"
+
+
 if __name__ == "__main__":
     test_simOUJ_MV_mu()
+
+
+def test_correlated_normal_source():
+    cor = [[1, 0.5], [0.5, 1]]
+    eps = rt.generate_eps_MV(cor, 1, 1 / 252, sims=2000, seed=12345)
+
+    # drawn block by block in the same order as generate_eps_MV
+    source = rt.CorrelatedNormalSource(cor, seed=12345, block_size=1000, reuse=True)
+    z = source.normal(252, 2000)
+    assert np.array_equal(z, eps), "Source block test failed"
+    assert np.allclose(np.corrcoef(z.reshape(-1, 2).T), cor, atol=0.01)
+
+    # the buffer is reused by the next draw of the same size
+    source.reset(1)
+    assert source.normal(252, 2000) is z, "Source buffer test failed"
+
+    z = rt.CorrelatedNormalSource(cor, seed=1, dtype=np.float32).normal(52, 100)
+    assert z.dtype == np.float32, "Source dtype test failed"
+
+    # singular matrices are factored from their eigen decomposition
+    eps = rt.generate_eps_MV([[1, 1], [1, 1]], 1, 1 / 52, sims=10, seed=1)
+    assert np.allclose(eps[:, :, 0], eps[:, :, 1]), "Singular cor test failed"
+
+    ou = rt.MVOU(
+        s0=[5, 5], mu=[4, 4], theta=[2, 2], sigma=[0.1, 0.1], T=1, dt=1 / 252,
+        cor=cor,
+    )  # fmt: skip
+    ou.fit()
+    ou.simulate(sims=100, seed=12345)
+    df = rt.simOU_MV(
+        s0=[5, 5], mu=[4, 4], theta=[2, 2], sigma=[0.1, 0.1], T=1, dt=1 / 252,
+        cor=cor, sims=100, seed=12345,
+    )  # fmt: skip
+    assert np.array_equal(ou.sims, df), "MVOU source test failed"
+
+
+def test_factor_normal_source():
+    loadings = np.array([[0.8, 0.1], [0.7, -0.3], [0.6, 0.5], [0.5, 0.0]])
+    source = rt.FactorNormalSource(loadings, seed=12345)
+
+    assert np.allclose(np.diag(source.cor), 1), "Factor variance test failed"
+
+    z = source.normal(252, 2000)
+    assert z.shape == (252, 2000, 4), "Factor shape test failed"
+    assert np.allclose(np.corrcoef(z.reshape(-1, 4).T), source.cor, atol=0.01)
+
+    # the block size doesn't change the numbers
+    z2 = rt.FactorNormalSource(loadings, seed=12345, block_size=100).normal(252, 2000)
+    assert np.array_equal(z, z2), "Factor block test failed"
+
+    # principal components keep the diagonal of cor
+    source = rt.FactorNormalSource.from_cor(source.cor, factors=1, seed=1)
+    assert np.allclose(np.diag(source.cor), 1), "Factor PCA test failed"
+
+    ou = rt.MVOU(
+        s0=[5] * 4, mu=[4] * 4, theta=[2] * 4, sigma=[0.1] * 4, T=1, dt=1 / 252,
+        cor=source.cor, factors=1,
+    )  # fmt: skip
+    ou.fit()
+    ou.simulate(sims=10, seed=12345)
+    assert ou.sims.shape == (253, 10, 4), "MVOU factor test failed"
+
+
+def test_simOU_MV_kernel():
+    # the fused kernel steps every asset as simOU does
+    eps = rt.generate_eps_MV([[1, 0.3], [0.3, 1]], 1, 1 / 52, sims=50, seed=12345)
+    s0, mu, theta = [5, 6], np.array([[4, 5]] * 52), [2, 10]
+    sigma = np.random.default_rng(1).uniform(0.1, 0.3, eps.shape)
+
+    for scheme in ["euler", "exact"]:
+        ans = np.stack(
+            [
+                rt.simOU(
+                    s0=s0[i], mu=mu[:, i], theta=theta[i], sigma=sigma[:, :, i],
+                    T=1, dt=1 / 52, eps=eps[:, :, i], scheme=scheme, output="array",
+                )  # fmt: skip
+                for i in range(2)
+            ],
+            axis=2,
+        )
+
+        for backend in rt.available_backends():
+            df = rt.simOU_MV(
+                s0=s0, mu=mu, theta=theta, sigma=sigma, T=1, eps=eps, scheme=scheme,
+                backend=backend, workers=2,
+            )  # fmt: skip
+            assert np.allclose(df, ans), f"simOU_MV {backend} {scheme} test failed"
+
+
+def test_simOUJ_MV_common_jumps():
+    # without diffusion and mean reversion the increments are the jumps
+    cor = np.array([[1, 0.9, 0], [0.9, 1, 0], [0, 0, 1]])
+    kw = dict(
+        s0=[5] * 3, mu=[4] * 3, theta=[0] * 3, sigma=[0] * 3, jump_prob=[0] * 3,
+        jump_avgsize=[1] * 3, jump_stdv=[0.5] * 3, T=1, dt=1 / 52, cor=cor,
+        sims=4000, seed=12345, common_jump_prob=5, common_jump_share=[1, 1, 0.5],
+    )  # fmt: skip
+
+    df = rt.simOUJ_MV(**kw)
+    jumps = np.diff(df, axis=0)
+    hit = jumps > 0
+
+    assert np.allclose(hit.sum(axis=0).mean(axis=0), [5, 5, 2.5], rtol=0.05)
+    assert (hit[:, :, 0] == hit[:, :, 1]).all(), "common jumps test failed"
+
+    # sizes of common jumps are correlated by cor
+    both = hit[:, :, 0] & hit[:, :, 2]
+    logs = np.log(jumps[hit[:, :, 0]][:, :2])
+    assert np.corrcoef(logs[:, 0], logs[:, 1])[0, 1] > 0.8
+    assert abs(np.corrcoef(np.log(jumps[both][:, [0, 2]]).T)[0, 1]) < 0.1
+
+    for backend in rt.available_backends():
+        for mr_lag in [None, [3, None, 2]]:
+            ans = rt.simOUJ_MV(
+                **dict(kw, theta=[2] * 3, sigma=[0.3] * 3, mr_lag=mr_lag)
+            )
+            df = rt.simOUJ_MV(
+                **dict(kw, theta=[2] * 3, sigma=[0.3] * 3, mr_lag=mr_lag),
+                backend=backend, workers=3,
+            )  # fmt: skip
+            assert np.allclose(df, ans), f"simOUJ_MV {backend} test failed"
+
+
+def test_MV_kwargs():
+    # options that used to be passed on to each asset are deprecated
+    kw = dict(s0=[5, 5], mu=[4, 4], theta=[2, 2], sigma=[0.3, 0.3], T=1, dt=1 / 52)
+    kw.update(cor=[[1, 0.5], [0.5, 1]], sims=10, seed=1)
+    ans = rt.simOU_MV(**kw)
+
+    with pytest.warns(DeprecationWarning):
+        df = rt.simOU_MV(**kw, antithetic=False)
+    assert np.array_equal(df, ans), "simOU_MV kwargs test failed"
+
+    with pytest.warns(DeprecationWarning):
+        rt.simOUJ_MV(
+            **kw,
+            jump_prob=[1, 1],
+            jump_avgsize=[1, 1],
+            jump_stdv=[0.1, 0.1],
+            jumps="dense",
+        )
+
+    with pytest.raises(TypeError):
+        rt.simOU_MV(**kw, foo=1)
+    with pytest.raises(TypeError):
+        rt.simOU_MV(**kw, jumps="dense")
@@ -2,6 +2,7 @@ import os
 import sys
 import pandas as pd
 import numpy as np
+import pytest
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/")
 
@@ -73,6 +74,81 @@ def test_fitOU():
     ), f"{mm} OU fit failed"
 
 
+def test_fitOU_batch():
+    dt = 1 / 252
+    df = rt.simOU(s0=5, mu=4, theta=25, sigma=0.32, T=1, dt=dt, sims=20, seed=42)
+
+    for mm in ["OLS", "MLE"]:
+        params = rt.fitOU_batch(df, dt=dt, method=mm)
+
+        for i in range(df.shape[1]):
+            ans = rt.fitOU(df.iloc[:, i], dt=dt, method=mm)
+            assert np.allclose(
+                params[i].values,
+                [ans["theta"], ans["annualized_sigma"], ans["mu"]],
+                rtol=1e-8,
+            ), f"{mm} batch OU fit failed"
+
+    # missing values are skipped
+    df.iloc[:10, 0] = np.nan
+    df.iloc[:, 1] = np.nan
+    params = rt.fitOU_batch(df, dt=dt)
+    ans = rt.fitOU(df.iloc[10:, 0], dt=dt)
+
+    assert np.allclose(params[0].values, [ans[k] for k in params.index])
+    assert params[1].isna().all()
+
+
+def test_fitOU_rolling():
+    dt = 1 / 252
+    df = rt.simOU(s0=5, mu=4, theta=5, sigma=0.32, T=2, dt=dt, sims=3, seed=42)
+    df.iloc[100:110, 1] = np.nan
+
+    for mm in ["OLS", "MLE"]:
+        res = rt.fitOU_rolling(df, window=100, dt=dt, method=mm, min_periods=1)
+        exp = rt.fitOU_rolling(df, dt=dt, method=mm)
+
+        for t in [99, 150, 504]:
+            ans = rt.fitOU_batch(df.iloc[t - 99 : t + 1], dt=dt, method=mm)
+            assert np.allclose(
+                res.loc[t].unstack().loc[ans.index], ans
+            ), f"{mm} rolling OU fit failed"
+
+            ans = rt.fitOU_batch(df.iloc[: t + 1], dt=dt, method=mm)
+            assert np.allclose(
+                exp.loc[t].unstack().loc[ans.index], ans
+            ), f"{mm} expanding OU fit failed"
+
+    # windows with missing values are NaN unless min_periods allows them
+    res = rt.fitOU_rolling(df, window=100, dt=dt)
+    assert res["theta"].iloc[:99].isna().all().all()
+    assert res.loc[150, ("theta", 1)] != res.loc[150, ("theta", 1)]
+    assert res.loc[209, ("theta", 1)] > 0
+
+    res = rt.fitOU_rolling(df[0], window=100, dt=dt)
+    assert list(res.columns) == ["theta", "annualized_sigma", "mu"]
+
+
+def test_fitOU_bootstrap():
+    dt = 1 / 252
+    spread = rt.simOU(s0=5, mu=4, theta=25, sigma=0.32, T=2, dt=dt, sims=1, seed=4)[0]
+
+    for mm in ["OLS", "MLE"]:
+        ans = rt.fitOU(spread, dt=dt, method=mm)
+        boot = rt.fitOU_bootstrap(spread, n_boot=2000, dt=dt, method=mm, seed=1)
+
+        assert boot.shape == (2000, 3)
+        assert np.allclose(
+            boot.median()[["theta", "annualized_sigma", "mu"]],
+            [ans["theta"], ans["annualized_sigma"], ans["mu"]],
+            rtol=0.1,
+        ), f"{mm} OU bootstrap failed"
+
+    # threads only split the work
+    boot2 = rt.fitOU_bootstrap(spread, n_boot=2000, dt=dt, method=mm, seed=1, workers=3)
+    assert np.array_equal(boot.values, boot2.values)
+
+
 def test_simGBM():
     eps = pd.read_csv("./pytest/data/diffusion.csv", header=None)
 
@@ -98,6 +174,23 @@ def test_simGBM():
 
     assert df.equals(act), "simGBM generated eps failed"
 
+    # ndarray output and float32 buffers
+    eps = np.random.normal(size=(252, 20))
+    df = rt.simGBM(s0=10, sigma=0.2, r=0.05, T=1, dt=1 / 252, eps=eps)
+    arr = rt.simGBM(
+        s0=10,
+        sigma=0.2,
+        r=0.05,
+        T=1,
+        dt=1 / 252,
+        eps=eps,
+        dtype="float32",
+        output="array",
+    )
+    assert isinstance(arr, np.ndarray), "simGBM array output failed"
+    assert arr.dtype == np.float32, "simGBM float32 failed"
+    assert np.allclose(df, arr, rtol=1e-5), "simGBM float32 failed"
+
 
 def test_simOU_logic():
     s0 = 5
@@ -611,5 +704,478 @@ def test_simOUJ_mr_lag():
         ), f"{'C' if c else 'Py'} mr_lag test failed for lag 25 days later"
 
 
+def test_simOUJ_mr_lag_state():
+    # given jumps are not modified and C matches python for any mr_lag
+    rng = np.random.default_rng(7)
+    eps = rng.normal(size=(252, 50))
+    elp = rng.lognormal(mean=np.log(2), sigma=0.1, size=(252, 50))
+    ejp = rng.poisson(lam=0.05, size=(252, 50)).astype(float)
+    ejp0 = ejp.copy()
+    kw = dict(s0=5, mu=4, theta=2, T=1, dt=1 / 252, eps=eps, elp=elp, ejp=ejp)
+    for lag in [1, 2, 40, 500]:
+        df1 = rt.simOUJ(mr_lag=lag, c=True, **kw)
+        df2 = rt.simOUJ(mr_lag=lag, c=False, **kw)
+        assert np.allclose(df1, df2), f"mr_lag {lag} C vs python failed"
+    assert np.array_equal(ejp, ejp0), "mr_lag modified ejp"
+
+
+def test_simOU_broadcast():
+    # scalar, time varying and full 2D parameters must give the same paths
+    N = 16
+    for c in [True, False]:
+        df1 = rt.simOU(5, 4, 2, 0.32, T=4, dt=0.25, sims=3, seed=12345, c=c)
+        df2 = rt.simOU(
+            5,
+            np.ones(N) * 4,
+            2,
+            np.ones((N, 3)) * 0.32,
+            T=4,
+            dt=0.25,
+            sims=3,
+            seed=12345,
+            c=c,
+        )
+        df3 = rt.simOU(
+            5,
+            np.ones((N, 3)) * 4,
+            2,
+            np.ones(N) * 0.32,
+            T=4,
+            dt=0.25,
+            sims=3,
+            seed=12345,
+            c=c,
+        )
+        assert np.allclose(df1, df2), f"{'C' if c else 'Py'} broadcast test failed"
+        assert np.allclose(df1, df3), f"{'C' if c else 'Py'} broadcast test failed"
+
+
+def test_simOU_exact():
+    # exact scheme must match the OU transition distribution on a coarse grid
+    s0 = 5
+    mu = 4
+    theta = 20
+    sigma = 0.5
+    T = 1
+
+    mean = mu + (s0 - mu) * np.exp(-theta * T)
+    var = sigma**2 * (1 - np.exp(-2 * theta * T)) / (2 * theta)
+
+    for c in [True, False]:
+        df = rt.simOU(
+            s0,
+            mu,
+            theta,
+            sigma,
+            T,
+            dt=1 / 12,
+            sims=20000,
+            seed=12345,
+            c=c,
+            scheme="exact",
+        )
+        assert np.allclose(
+            [df.iloc[-1].mean(), df.iloc[-1].var()], [mean, var], rtol=0.05
+        ), f"{'C' if c else 'Py'} exact scheme test failed"
+
+        # log prices revert to mu - sigma^2 / (2 theta)
+        df = rt.simOU(
+            s0,
+            mu,
+            theta,
+            sigma,
+            T,
+            dt=1 / 12,
+            sims=20000,
+            seed=12345,
+            c=c,
+            log_price=True,
+            scheme="exact",
+        )
+        assert np.isclose(
+            df.iloc[-1].mean(), mean - sigma**2 / (2 * theta), rtol=0.01
+        ), f"{'C' if c else 'Py'} exact scheme log price test failed"
+
+
+def test_sim_numpy():
+    # numpy engines match the compiled kernels for every scheme and for
+    # time varying mu and sigma
+    rng = np.random.default_rng(3)
+    mu = np.linspace(3, 5, 50)
+    sigma = rng.uniform(0.1, 0.4, size=(50, 20))
+    eps = rng.normal(size=(50, 20))
+    for scheme in ["euler", "exact"]:
+        for log_price in [False, True]:
+            kw = dict(mu=mu, sigma=sigma, T=1, dt=0.02, eps=eps)
+            kw.update(scheme=scheme, log_price=log_price)
+            df1 = rt.simOU(c=True, **kw)
+            df2 = rt.simOU(c=False, **kw)
+            assert np.allclose(df1, df2), f"{scheme} {log_price} numpy OU failed"
+
+    kw = dict(mu=mu, sigma=sigma, T=1, dt=0.02, eps=eps, mr_lag=3)
+    kw.update(elp=rng.lognormal(size=(50, 20)), ejp=rng.poisson(0.2, size=(50, 20)))
+    assert np.allclose(
+        rt.simOUJ(c=True, **kw), rt.simOUJ(c=False, **kw)
+    ), "numpy OUJ failed"
+
+
+def test_backends():
+    # every available backend gives the same paths for the same random numbers
+    assert "numpy" in rt.available_backends(), "numpy backend missing"
+    assert rt.get_backend() == rt.available_backends()[0], "default backend failed"
+
+    eps = np.random.default_rng(5).normal(size=(50, 40))
+    kw = dict(T=1, dt=0.02, eps=eps, mr_lag=3, jump_prob=10, seed=2)
+    base = rt.simOUJ(backend="numpy", **kw)
+    for b in rt.available_backends():
+        assert np.allclose(base, rt.simOUJ(backend=b, **kw)), f"{b} OUJ failed"
+        df = rt.simOU(T=1, dt=0.02, eps=eps, backend=b, scheme="exact", workers=2)
+        assert np.allclose(df, rt.simOU(T=1, dt=0.02, eps=eps, c=False, scheme="exact"))
+
+    # compiled backends also draw the same random numbers
+    compiled = [b for b in rt.available_backends() if b != "numpy"]
+    for b in compiled[1:]:
+        df = rt.simOU(sims=50, seed=1, backend=compiled[0], keep="stats")
+        assert df.equals(rt.simOU(sims=50, seed=1, backend=b, keep="stats")), b
+
+    old = rt.get_backend()
+    rt.set_backend("numpy")
+    assert rt.get_backend() == "numpy", "set_backend failed"
+    rt.set_backend(old)
+
+    with pytest.raises(ValueError):
+        rt.simOU(backend="foo")
+
+
+def test_simOU_batch():
+    # every parameter set matches simOU with the same random numbers
+    params = pd.DataFrame({"theta": [0.5, 2, 5], "sigma": [0.1, 0.3, 0.5], "s0": 4})
+    eps = np.random.default_rng(1).normal(size=(50, 20))
+    for c in [True, False]:
+        x = rt.simOU_batch(params, T=1, dt=0.02, eps=eps, c=c, scheme="exact")
+        assert x.shape == (51, 20, 3), "batch shape failed"
+        for p in range(3):
+            df = rt.simOU(T=1, dt=0.02, eps=eps, scheme="exact", **params.iloc[p])
+            assert np.allclose(x[:, :, p], df), f"{'C' if c else 'Py'} batch failed"
+
+    # common random numbers give the same paths for the same parameters
+    x = rt.simOU_batch({"theta": [1, 1]}, sims=10, seed=1)
+    assert np.array_equal(x[:, :, 0], x[:, :, 1]), "common eps failed"
+    x = rt.simOU_batch({"theta": [1, 1]}, sims=10, seed=1, common=False)
+    assert not np.array_equal(x[:, :, 0], x[:, :, 1]), "independent eps failed"
+
+    with pytest.raises(ValueError):
+        rt.simOU_batch({"kappa": [1, 2]})
+
+
+def test_simulation_result():
+    # results share the simulated buffer and match the dataframe output
+    res = rt.simOU(sims=50, seed=1, output="result")
+    df = rt.simOU(sims=50, seed=1)
+    assert isinstance(res, rt.SimulationResult), "output result failed"
+    assert np.array_equal(res.values, df), "result values failed"
+    assert np.shares_memory(res.to_frame().values, res.values), "to_frame copied"
+    assert res.terminal().equals(df.iloc[-1].rename(None)), "terminal failed"
+    assert np.allclose(
+        res.quantiles([0.5])["P50"], df.median(axis=1)
+    ), "quantile failed"
+
+    sub = res[::2, :10]
+    assert sub.shape == (127, 10) and sub.dt == 2 / 252, "slicing failed"
+    assert np.shares_memory(sub.values, res.values), "slicing copied"
+    assert isinstance(res[-1], np.ndarray), "row slicing failed"
+
+    x = rt.simGBM(sims=20, seed=1, output="result")
+    assert np.array_equal(x.values, rt.simGBM(sims=20, seed=1)), "GBM result failed"
+
+    # multivariate results with asset names
+    res = rt.simOU_MV(
+        s0=[5, 5],
+        mu=[4, 4],
+        theta=[2, 3],
+        sigma=[0.3, 0.2],
+        T=1,
+        dt=1 / 252,
+        cor=[[1, 0.3], [0.3, 1]],
+        sims=20,
+        seed=4,
+        output="result",
+    )
+    res.names = ["WTI", "Brent"]
+    assert res.assets == 2 and list(res.terminal().columns) == res.names, "MV failed"
+    assert np.array_equal(res.to_frame("Brent"), res.values[:, :, 1]), "MV frame failed"
+    assert res.to_frame().shape == (253, 40), "MV frame failed"
+    assert res.quantiles()["WTI"].shape == (253, 3), "MV quantiles failed"
+
+
+def test_sim_payoffs():
+    # payoffs from the stats match the ones computed on the full paths
+    rng = np.random.default_rng(1)
+    eps = rng.normal(size=(52, 200))
+    elp = rng.lognormal(mean=-1, sigma=0.2, size=(52, 200))
+    ejp = rng.poisson(0.1, size=(52, 200))
+    for c in [True, False]:
+        for f, extra in [(rt.simOU, {}), (rt.simOUJ, dict(mr_lag=3, elp=elp, ejp=ejp))]:
+            args = dict(s0=5, mu=4, theta=2, sigma=0.5, T=1, dt=1 / 52, eps=eps, c=c)
+            args.update(extra)
+            df = f(**args)
+            st = f(keep="stats", strike=4.5, barrier=6, **args)
+            assert np.allclose(
+                st["call"], np.maximum(df.iloc[-1] - 4.5, 0)
+            ), "call failed"
+            assert np.allclose(
+                st["put"], np.maximum(4.5 - df.iloc[-1], 0)
+            ), "put failed"
+            avg = df.iloc[1:].mean()
+            assert np.allclose(
+                st["asian_call"], np.maximum(avg - 4.5, 0)
+            ), "asian failed"
+            assert np.allclose(st["above"], (df.iloc[1:] > 4.5).mean()), "above failed"
+            assert np.array_equal(st["barrier_hit"], df.max() >= 6), "barrier failed"
+
+    df = rt.simGBM(s0=5, sigma=0.3, T=1, dt=1 / 52, eps=eps)
+    st = rt.simGBM(
+        s0=5, sigma=0.3, T=1, dt=1 / 52, eps=eps, keep="stats", strike=5, barrier=4
+    )
+    assert np.allclose(st["above"], (df.iloc[1:] > 5).mean()), "GBM above failed"
+    assert np.array_equal(st["barrier_hit"], df.min() <= 4), "GBM barrier failed"
+
+
+def test_sim_workers():
+    # splitting the sims across threads must not change the results
+    df1 = rt.simOU(T=1, dt=1 / 252, sims=101, seed=12345)
+    df2 = rt.simOU(T=1, dt=1 / 252, sims=101, seed=12345, workers=4)
+    assert df1.equals(df2), "simOU workers test failed"
+
+    df1 = rt.simOUJ(T=1, dt=1 / 252, sims=101, mr_lag=10, seed=12345)
+    df2 = rt.simOUJ(T=1, dt=1 / 252, sims=101, mr_lag=10, seed=12345, workers=-1)
+    assert df1.equals(df2), "simOUJ workers test failed"
+
+
+def test_sim_iter():
+    chunks = rt.plan_sim_chunks(N=252, sims=1000, max_bytes=253 * 8 * 4 * 300)
+    assert chunks[0] == (0, 300), "Chunk planner failed"
+    assert chunks[-1] == (900, 1000), "Chunk planner failed"
+
+    # joining the blocks must give the same result as an unchunked run
+    df1 = rt.simOU(T=1, dt=1 / 252, sims=50, seed=12345)
+    df2 = pd.concat(
+        rt.simOU_iter(T=1, dt=1 / 252, sims=50, chunk_sims=7, seed=12345), axis=1
+    )
+    assert df1.equals(df2), "simOU_iter test failed"
+
+    df1 = rt.simOUJ(dt=1 / 252, sims=50, mr_lag=5, seed=12345, jumps="sparse")
+    df2 = pd.concat(
+        rt.simOUJ_iter(dt=1 / 252, sims=50, mr_lag=5, chunk_sims=7, seed=12345), axis=1
+    )
+    assert df1.equals(df2), "simOUJ_iter test failed"
+
+    # per sim mu and sigma are split with the blocks
+    mu = np.random.default_rng(1).uniform(3, 6, (13, 100))
+    df1 = pd.concat(rt.simOUJ_iter(mu=mu, sigma=mu / 20, sims=100, seed=1), axis=1)
+    df2 = pd.concat(
+        rt.simOUJ_iter(mu=mu, sigma=mu / 20, sims=100, chunk_sims=40, seed=1), axis=1
+    )
+    assert df1.equals(df2), "simOUJ_iter mu test failed"
+
+
+def test_sim_keep():
+    rng = np.random.default_rng(12345)
+    eps = rng.normal(size=(50, 20))
+    elp = rng.lognormal(mean=np.log(3), sigma=0.05, size=(50, 20))
+    ejp = rng.poisson(lam=0.3, size=(50, 20))
+
+    def check(path, stats, msg):
+        assert np.allclose(path.iloc[-1], stats["terminal"]), msg
+        assert np.allclose(path.mean(), stats["mean"]), msg
+        assert np.allclose(path.min(), stats["min"]), msg
+        assert np.allclose(path.max(), stats["max"]), msg
+
+    # the running statistics must match the ones of the full paths
+    for c in [True, False]:
+        for scheme in ["euler", "exact"]:
+            kwargs = dict(theta=2, T=1, dt=0.02, eps=eps, c=c, scheme=scheme)
+            df = rt.simOU(**kwargs)
+            check(df, rt.simOU(**kwargs, keep="stats"), "simOU keep test failed")
+            term = rt.simOU(**kwargs, keep="terminal")
+            assert np.allclose(df.iloc[-1], term), "simOU keep test failed"
+
+        for mr_lag in [None, 3]:
+            kwargs = dict(T=1, dt=0.02, mr_lag=mr_lag, eps=eps, elp=elp, c=c)
+            df = rt.simOUJ(**kwargs, ejp=ejp.copy())
+            st = rt.simOUJ(**kwargs, ejp=ejp.copy(), keep="stats")
+            check(df, st, "simOUJ keep test failed")
+
+    df = rt.simGBM(T=1, dt=0.02, eps=eps)
+    check(df, rt.simGBM(T=1, dt=0.02, eps=eps, keep="stats"), "simGBM keep test failed")
+
+    # output applies to every keep mode the same way
+    for fun in [rt.simGBM, rt.simOU, rt.simOUJ]:
+        kwargs = dict(T=1, dt=0.02, eps=eps, seed=1)
+        for keep in ["terminal", "stats"]:
+            arr = fun(**kwargs, keep=keep, output="array")
+            assert isinstance(arr, np.ndarray), f"{fun.__name__} output test failed"
+            assert np.allclose(arr, fun(**kwargs, keep=keep).to_numpy())
+            with pytest.raises(ValueError):
+                fun(**kwargs, keep=keep, output="result")
+
+    # exact terminal distribution
+    s = rt.simOU(
+        s0=1, mu=4, theta=3, sigma=0.5, T=2, dt=1 / 12, sims=200000, seed=1,
+        scheme="exact", keep="terminal",
+    )  # fmt: skip
+    sd = 0.5 * np.sqrt((1 - np.exp(-2 * 3 * 2)) / (2 * 3))
+    assert abs(s.mean() - (4 - 3 * np.exp(-6))) < 0.01, "simOU terminal test failed"
+    assert abs(s.std() - sd) < 0.01, "simOU terminal test failed"
+
+    np.random.seed(1)
+    s = rt.simGBM(s0=5, sigma=0.3, r=0.02, sims=200000, keep="terminal")
+    assert abs(s.mean() - 5 * np.exp(0.02)) < 0.02, "simGBM terminal test failed"
+
+
+def test_fan():
+    rng = np.random.default_rng(12345)
+    x = rng.lognormal(size=(20, 40000))
+
+    # adding the sims in blocks or merging accumulators gives the same summary
+    fan = rt.FanAccumulator(quantiles=[0.01, 0.5, 0.95])
+    for i in range(0, 40000, 7000):
+        fan.update(x[:, i : i + 7000])
+    fan2 = rt.FanAccumulator(quantiles=[0.01, 0.5, 0.95])
+    fan2.update(x[:, :20000]).merge(rt.FanAccumulator().update(x[:, 20000:]))
+
+    for f in [fan, fan2]:
+        df = f.summary()
+        assert f.count == 40000, "Fan count test failed"
+        assert np.allclose(df["mean"], x.mean(axis=1)), "Fan mean test failed"
+        assert np.allclose(df["std"], x.std(axis=1, ddof=1)), "Fan std test failed"
+        assert np.array_equal(df["max"], x.max(axis=1)), "Fan max test failed"
+
+        for q in [0.01, 0.5, 0.95]:
+            rank = (x < df[f"P{100 * q:g}"].to_numpy()[:, np.newaxis]).mean(axis=1)
+            assert np.abs(rank - q).max() < 0.002, "Fan quantile test failed"
+
+    # simulators summarize their own blocks
+    eps = rng.normal(size=(252, 500))
+    df = rt.simOU(eps=eps, fan=rt.FanAccumulator())
+    assert np.allclose(df["mean"], rt.simOU(eps=eps).mean(axis=1)), "simOU fan failed"
+
+    df = rt.simOUJ(sims=500, dt=1 / 252, mr_lag=5, seed=1, fan=rt.FanAccumulator())
+    assert df.shape == (253, 7), "simOUJ fan test failed"
+    ans = rt.simOUJ(sims=500, dt=1 / 252, mr_lag=5, seed=1).mean(axis=1)
+    assert np.allclose(df["mean"], ans), "simOUJ fan test failed"
+
+    kw = dict(sims=500, dt=1 / 252, mr_lag=5, seed=1, jumps="sparse")
+    df = rt.simOUJ(fan=rt.FanAccumulator(), **kw)
+    assert np.allclose(df["mean"], rt.simOUJ(**kw).mean(axis=1)), "Fan test failed"
+
+
+def test_antithetic():
+    # the mirrored sims are the reflection of the first half around the mean
+    for c in [True, False]:
+        df = rt.simOU(sims=11, T=0.1, seed=12345, c=c, antithetic=True)
+        mean = rt.meanOU(T=0.1).to_numpy()[:, np.newaxis]
+        assert np.allclose(df.iloc[:, :5] - mean, mean - df.iloc[:, 6:]), "simOU failed"
+
+    df = rt.simOU(sims=20000, seed=12345, antithetic=True)
+    assert np.isclose(df.iloc[-1].mean(), rt.meanOU().iloc[-1]), "simOU mean failed"
+
+    np.random.seed(12345)
+    df = np.log(rt.simGBM(sims=10, antithetic=True)).diff().iloc[1:]
+    drift = -(0.2**2) / 2 / 252
+    assert np.allclose(
+        df.iloc[:, :5] + df.iloc[:, 5:].to_numpy(), 2 * drift
+    ), "simGBM failed"
+
+    eps = rt.generate_eps_MV([[1, 0.5], [0.5, 1]], 1, 1 / 252, sims=5, antithetic=True)
+    assert np.array_equal(eps[:, :2], -eps[:, 3:]), "generate_eps_MV failed"
+
+
+def test_control_variate():
+    np.random.seed(12345)
+    df = rt.simGBM(s0=100, sigma=0.3, r=0.02, sims=20000)
+    payoff = np.maximum(df.iloc[-1] - 100, 0)
+    mean = rt.meanGBM(s0=100, sigma=0.3, r=0.02).iloc[-1]
+    assert np.isclose(mean, 100 * np.exp(0.02)), "meanGBM test failed"
+
+    cv = rt.control_variate(payoff, df.iloc[-1], mean)
+    assert cv["variance_reduction"] > 4, "Control variate test failed"
+    assert cv["std_error"] < payoff.std() / np.sqrt(
+        20000
+    ), "Control variate test failed"
+
+    # Black-Scholes value of the call is 12.82
+    assert abs(cv["estimate"] - 12.82) < 3 * cv["std_error"], "Control variate failed"
+
+    # the discrete mean matches the paths exactly when eps has mean zero
+    eps = np.random.normal(size=(252, 1000))
+    eps = np.hstack((eps, -eps))
+    df = rt.simOU(eps=eps, scheme="exact", mu=np.linspace(3, 5, 252))
+    mean = rt.meanOU(scheme="exact", mu=np.linspace(3, 5, 252))
+    assert np.allclose(df.mean(axis=1), mean), "meanOU test failed"
+
+
+def test_normal_source():
+    # the bridge turns iid normals into iid increments
+    z = np.random.default_rng(12345).normal(size=(16, 100000))
+    eps = rt.brownian_bridge(z)
+    assert np.allclose(np.cov(eps), np.eye(16), atol=0.02), "Brownian bridge failed"
+
+    # Black-Scholes call priced with quasi random paths
+    bs = 12.8216
+    for seed in range(3):
+        source = rt.SobolNormalSource(seed=seed)
+        df = rt.simGBM(100, 0, 0.3, 0.02, 1, 1 / 64, sims=4096, source=source)
+        price = np.maximum(df.iloc[-1] - 100, 0).mean() * np.exp(-0.02)
+        assert abs(price - bs) < 0.05, "Sobol source test failed"
+
+    # sources give the same paths as passing their normals as eps
+    df1 = rt.simOU(sims=64, source=rt.PseudoNormalSource(seed=1))
+    df2 = rt.simOU(eps=np.random.Generator(np.random.SFC64(1)).normal(size=(252, 64)))
+    assert df1.equals(df2), "Pseudo source test failed"
+
+
+def test_random_streams():
+    # children are reproducible and different from each other
+    a1, b1 = rt.RandomStreams(12345).spawn(2)
+    a2, b2 = rt.RandomStreams(12345).spawn(2)
+    df = rt.simOU(sims=10, seed=a1)
+    assert df.equals(rt.simOU(sims=10, seed=a2)), "RandomStreams test failed"
+    assert not df.equals(rt.simOU(sims=10, seed=b1)), "RandomStreams test failed"
+
+    streams = rt.RandomStreams()
+    df = rt.simGBM(sims=10, seed=rt.RandomStreams(streams.entropy))
+    assert df.equals(rt.simGBM(sims=10, seed=streams)), "Entropy test failed"
+    assert rt.simGBM(sims=10, seed=1).equals(rt.simGBM(sims=10, seed=1)), "GBM failed"
+
+
+def test_simOUJ_sparse():
+    # sparse jumps give the same paths on every backend, and the same as the
+    # dense elp and ejp arrays of the same jumps
+    eps = np.random.default_rng(2).normal(size=(250, 500))
+    kw = dict(s0=5, mu=4, theta=2, sigma=0.3, T=1, dt=1 / 250, eps=eps, mr_lag=5)
+    kw.update(jump_prob=20, jump_avgsize=2, jump_stdv=0.2, seed=42)
+    df = rt.simOUJ(**kw, jumps="sparse")
+
+    # without diffusion, mean reversion and lag the increments are the jumps
+    jumps = rt.simOUJ(**dict(kw, theta=0, sigma=0, mr_lag=None), jumps="sparse")
+    jumps = jumps.diff().iloc[1:]
+    rate = (jumps != 0).mean().mean()
+    assert abs(rate - (1 - np.exp(-20 / 250))) < 0.005, "Jump rate test failed"
+
+    elp = np.where(jumps != 0, jumps, 1.0)
+    ejp = (jumps != 0).astype(float)
+    for backend in rt.available_backends():
+        ans = rt.simOUJ(**kw, jumps="sparse", backend=backend)
+        assert np.allclose(df, ans), f"simOUJ sparse {backend} test failed"
+        ans = rt.simOUJ(**kw, jumps="sparse", keep="terminal", backend=backend)
+        assert np.allclose(df.iloc[-1], ans), f"simOUJ sparse {backend} keep failed"
+        ans = rt.simOUJ(**kw, elp=elp, ejp=ejp, jumps="dense", backend=backend)
+        assert np.allclose(df, ans), f"simOUJ dense {backend} test failed"
+
+    with pytest.raises(ValueError):
+        rt.simOUJ(jumps="foo")
+
+
 if __name__ == "__main__":
     test_simOU_eps()
@@ -20,7 +20,9 @@ extensions = [
     Extension(
         name="extensions",
         sources=["src/risktools/pyx/sims.pyx"],
-        include_dirs=[numpy.get_include()]
+        include_dirs=[numpy.get_include()],
+        # the simulations fall back to numba or numpy if it can't be built
+        optional=True,
         # extra_compile_args=['-fPIC', '-shared']
     )
 ]
@@ -79,6 +81,7 @@ setuptools.setup(
         # "Source Code": "https://github.com/statsmodels/statsmodels",
     },
     install_requires=requirements,
+    extras_require={"numba": ["numba"]},
     include_package_data=True,
     classifiers=[
         "Development Status :: 4 - Beta",  # Chose either "3 - Alpha", "4 - Beta" or "5 - Production/Stable" as the current state of your package
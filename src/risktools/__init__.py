@@ -4,7 +4,16 @@ from ._swap import *
 from ._sims import *
 from ._main_functions import *
 from ._multivariate import *
-from .extensions import *
+from ._fans import *
+from ._normals import *
+from ._streams import *
+from ._backends import *
+from ._results import *
+
+try:
+    from .extensions import *
+except ImportError:
+    pass
 
 # from .data import get_gis
 from ._refineryLP import *
@@ -0,0 +1,127 @@
+# selection of the engine that runs the simulation kernels
+
+import importlib.util as _util
+
+try:
+    from . import extensions as _extensions
+except ImportError:
+    _extensions = None
+
+# in order of preference, the first one available is the default
+_BACKENDS = ["cython", "numba", "numpy"]
+
+_AVAILABLE = [
+    b
+    for b, ok in zip(
+        _BACKENDS,
+        [_extensions is not None, _util.find_spec("numba") is not None, True],
+    )
+    if ok
+]
+
+_default = _AVAILABLE[0]
+_loaded = {}
+
+
+def available_backends():
+    """
+    Backends that can run the simulations in this environment, fastest first.
+
+    'cython' is the compiled extension built with the package, 'numba' jit compiles
+    the same kernels the first time they are used (needs numba installed) and runs
+    the sims in parallel, and 'numpy' is vectorized across sims and always available.
+
+    Returns
+    -------
+    List of backend names.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.available_backends()
+    """
+    return list(_AVAILABLE)
+
+
+def get_backend():
+    """
+    Backend used by simOU, simOUJ and the multivariate simulators when none is given.
+    Set at import to the fastest available backend.
+
+    Returns
+    -------
+    Backend name.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.get_backend()
+    """
+    return _default
+
+
+def set_backend(backend):
+    """
+    Set the backend used by simOU, simOUJ and the multivariate simulators when none
+    is given.
+
+    Parameters
+    ----------
+    backend : ['cython', 'numba', 'numpy']
+        Name of the backend. Must be one of available_backends().
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.set_backend("numba")
+    """
+    global _default
+    _default = _resolve_backend(backend)
+
+
+class _Kernels:
+    # the kernels of a compiled backend, all with the arguments of the cython ones
+    def __init__(self, module, parallel=False):
+        self.simOU = module.csimOU
+        self.simOU_batch = module.csimOU_batch
+        self.simOU_MV = module.csimOU_MV
+        self.simOUJ = module.csimOUJ
+        self.simOUJ_sparse = module.csimOUJ_sparse
+        self.simOUJ_MV = module.csimOUJ_MV
+        self.simOU_state = module.csimOU_state
+        self.simOUJ_state = module.csimOUJ_state
+
+        # parallel kernels run their own threads rather than being split
+        # across a thread pool, with threads(workers) setting how many
+        self.parallel = parallel
+        self.threads = getattr(module, "threads", None)
+
+
+def _kernels(backend):
+    # kernels of a compiled backend, loaded the first time they are needed
+    if backend not in _loaded:
+        if backend == "cython":
+            _loaded[backend] = _Kernels(_extensions)
+        elif backend == "numba":
+            from . import _numba
+
+            _loaded[backend] = _Kernels(_numba, parallel=True)
+        else:
+            raise ValueError(f"backend {backend} has no compiled kernels")
+
+    return _loaded[backend]
+
+
+def _resolve_backend(backend=None, c=True):
+    # the backend to use, by default the global one or numpy if c is False
+    if backend is None:
+        backend = _default if c else "numpy"
+
+    if backend not in _BACKENDS:
+        raise ValueError(f"backend must be one of {_BACKENDS}")
+    if backend not in _AVAILABLE:
+        raise ValueError(
+            f"backend {backend} is not available, available backends are {_AVAILABLE}"
+        )
+
+    return backend
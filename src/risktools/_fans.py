@@ -0,0 +1,277 @@
+# streaming summaries of simulations
+
+import numpy as _np
+import pandas as _pd
+
+
+class FanAccumulator:
+    """
+    Streaming per time step summary of simulations for building fan charts (P5/P50/P95
+    bands etc.) without holding all the paths in memory.
+
+    Blocks of simulations are passed to the update method one at a time. For every time
+    step (and asset for multivariate simulations) the accumulator keeps the count, mean,
+    variance, min and max exactly and the distribution of the simulated values as a
+    t-digest style sketch of at most `compression` weighted centroids, from which the
+    quantiles are estimated. Memory is fixed by the number of time steps and compression,
+    not by the number of simulations.
+
+    Parameters
+    ----------
+    quantiles : array-like[float], optional
+        Quantiles to report in the summary. By default (0.05, 0.5, 0.95).
+    compression : int, optional
+        Maximum number of centroids kept per time step. Centroids are smaller in the tails
+        so that extreme quantiles stay accurate. Higher values are more accurate but slower.
+        By default 200.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> fan = rt.FanAccumulator(quantiles=[0.05, 0.5, 0.95])
+    >>> for df in rt.simOU_iter(sims=1_000_000, chunk_sims=100_000):
+    ...     fan.update(df)
+    >>> fan.summary()
+    """
+
+    def __init__(self, quantiles=(0.05, 0.5, 0.95), compression=200):
+        self.quantiles = list(quantiles)
+        self.compression = int(compression)
+
+        if any((q < 0) | (q > 1) for q in self.quantiles):
+            raise ValueError("quantiles must be between 0 and 1")
+        if self.compression < 2:
+            raise ValueError("compression must be at least 2")
+
+        self._shape = None
+        self._n = 0
+        self._mean = None
+        self._m2 = None
+        self._min = None
+        self._max = None
+        self._c_mean = None
+        self._c_weight = None
+
+    def update(self, x):
+        """
+        Add a block of simulations to the summary.
+
+        Parameters
+        ----------
+        x : array-like[float]
+            Simulated values of size (p x sims) or (p x sims x M) where p is the number of
+            time steps and M is the number of assets, i.e. the output of simOU, simOUJ,
+            simGBM, simOU_MV or simGBM_MV. All blocks must have the same p (and M).
+
+        Returns
+        -------
+        The accumulator so that calls can be chained.
+        """
+        x = _np.asarray(x, dtype=float)
+
+        if x.ndim == 1:
+            x = x[:, _np.newaxis]
+
+        # rows are every time step (and asset), columns the sims
+        shape = (x.shape[0],) + x.shape[2:]
+        n = x.shape[1]
+        x = _np.moveaxis(x, 1, -1).reshape(-1, n)
+
+        if n == 0:
+            return self
+
+        self._check_shape(shape)
+
+        mean = x.mean(axis=1)
+        m2 = ((x - mean[:, _np.newaxis]) ** 2).sum(axis=1)
+
+        self._combine(n, mean, m2, x.min(axis=1), x.max(axis=1), x, _np.ones(x.shape))
+
+        return self
+
+    def merge(self, other):
+        """
+        Add the summary of another accumulator, for example one that was filled from
+        a different process or thread.
+
+        Parameters
+        ----------
+        other : FanAccumulator
+            Accumulator with the same time steps (and assets).
+
+        Returns
+        -------
+        The accumulator so that calls can be chained.
+        """
+        if other._n == 0:
+            return self
+
+        self._check_shape(other._shape)
+        self._combine(
+            other._n,
+            other._mean,
+            other._m2,
+            other._min,
+            other._max,
+            other._c_mean,
+            other._c_weight,
+        )
+
+        return self
+
+    @property
+    def count(self):
+        """Number of simulations added"""
+        return self._n
+
+    @property
+    def mean(self):
+        """Mean of each time step"""
+        return self._reshape(self._mean)
+
+    @property
+    def std(self):
+        """Sample standard deviation of each time step"""
+        if self._n < 2:
+            return self._reshape(_np.full_like(self._m2, _np.nan))
+        return self._reshape(_np.sqrt(self._m2 / (self._n - 1)))
+
+    @property
+    def min(self):
+        """Minimum of each time step"""
+        return self._reshape(self._min)
+
+    @property
+    def max(self):
+        """Maximum of each time step"""
+        return self._reshape(self._max)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of each time step from the centroids.
+
+        Parameters
+        ----------
+        q : float
+            Quantile between 0 and 1.
+
+        Returns
+        -------
+        Array of size p or (p x M) of the estimated quantile.
+        """
+        if self._n == 0:
+            raise ValueError("no simulations have been added")
+
+        out = _np.empty(self._mean.shape[0])
+
+        for i in range(out.shape[0]):
+            w = self._c_weight[i]
+            m = self._c_mean[i][w > 0]
+            w = w[w > 0]
+
+            # centroids are placed at the midpoint of their weight and the ends are
+            # pinned to the exact min and max
+            pos = _np.concatenate(([0.0], _np.cumsum(w) - w / 2, [self._n]))
+            val = _np.concatenate(([self._min[i]], m, [self._max[i]]))
+
+            out[i] = _np.interp(q * self._n, pos, val)
+
+        return self._reshape(out)
+
+    def summary(self):
+        """
+        Summary of the simulations added so far.
+
+        Returns
+        -------
+        A pandas dataframe with the time steps as rows and the mean, standard deviation, min,
+        max and quantiles (labelled P5, P50 etc.) as columns. For multivariate simulations,
+        the columns are a MultiIndex of the asset number and the statistic.
+        """
+        stats = {
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in self.quantiles:
+            stats[f"P{100 * q:g}"] = self.quantile(q)
+
+        if len(self._shape) == 1:
+            return _pd.DataFrame(stats)
+
+        assets = _np.prod(self._shape[1:], dtype=int)
+        return _pd.concat(
+            {
+                i: _pd.DataFrame(
+                    {
+                        k: v.reshape(self._shape[0], assets)[:, i]
+                        for k, v in stats.items()
+                    }
+                )
+                for i in range(assets)
+            },
+            axis=1,
+        )
+
+    def _check_shape(self, shape):
+        if self._shape is None:
+            self._shape = tuple(shape)
+        elif self._shape != tuple(shape):
+            raise ValueError(
+                f"block has {shape} time steps (and assets), expected {self._shape}"
+            )
+
+    def _reshape(self, x):
+        return x.reshape(self._shape)
+
+    def _combine(self, n, mean, m2, x_min, x_max, c_mean, c_weight):
+        if self._n == 0:
+            self._n = n
+            self._mean = mean
+            self._m2 = m2
+            self._min = x_min
+            self._max = x_max
+        else:
+            # parallel update of the mean and sum of squares (Chan et al.)
+            total = self._n + n
+            delta = mean - self._mean
+            self._mean = self._mean + delta * n / total
+            self._m2 = self._m2 + m2 + delta**2 * self._n * n / total
+            self._min = _np.minimum(self._min, x_min)
+            self._max = _np.maximum(self._max, x_max)
+            self._n = total
+
+            c_mean = _np.hstack((self._c_mean, c_mean))
+            c_weight = _np.hstack((self._c_weight, c_weight))
+
+        self._c_mean, self._c_weight = _compress(c_mean, c_weight, self.compression)
+
+
+def _compress(x, w, k):
+    """
+    Merge the weighted points of each row of x into at most k centroids.
+
+    Points are sorted and assigned to centroids by where their weight midpoint
+    falls on the arcsine scale of the t-digest, which gives small centroids in
+    the tails and large ones around the median. All rows are done at once.
+    """
+    rows = x.shape[0]
+
+    idx = _np.argsort(x, axis=1, kind="stable")
+    x = _np.take_along_axis(x, idx, axis=1)
+    w = _np.take_along_axis(w, idx, axis=1)
+
+    cw = _np.cumsum(w, axis=1)
+    q = (cw - w / 2) / cw[:, -1:]
+
+    c = _np.floor((_np.arcsin(2 * q - 1) / _np.pi + 0.5) * k).astype(_np.int64)
+    c = _np.clip(c, 0, k - 1) + k * _np.arange(rows)[:, _np.newaxis]
+
+    weight = _np.bincount(c.ravel(), weights=w.ravel(), minlength=rows * k)
+    total = _np.bincount(c.ravel(), weights=(w * x).ravel(), minlength=rows * k)
+
+    # empty centroids have zero weight and are skipped when estimating quantiles
+    mean = _np.divide(total, weight, out=_np.zeros_like(total), where=weight > 0)
+
+    return mean.reshape(rows, k), weight.reshape(rows, k)
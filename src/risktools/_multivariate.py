@@ -1,11 +1,18 @@
 # multivariate simulations
 
 from ast import arguments
+import warnings as _warnings
 import numpy as _np
 import pandas as _pd
 import matplotlib.pyplot as _plt
 import plotly.graph_objects as _go
-from ._sims import fitOU, simOU, simOUJ
+from ._sims import fitOU, fitOU_batch, simOU, simOUJ, plan_sim_chunks
+from ._sims import _make_rng, _antithetic, _OU_SCHEMES, _ou_exact_coefs, _run_by_sims
+from ._sims import _jump_events
+from ._backends import _kernels, _resolve_backend
+from ._streams import _spawn_rngs
+from ._normals import CorrelatedNormalSource, FactorNormalSource, _cor_factor
+from ._results import SimulationResult
 from abc import ABC as _ABC, abstractmethod as _abstractmethod
 from numpy.random import Generator, SFC64
 
@@ -75,24 +82,23 @@ def fitOU_MV(df, dt, log_price=False, method="OLS", verbose=False):
     -------
     DataFrame of the fitted parameters for each OU process. The rows
     correspond to the parameters and the columns correspond to the OU processes.
+    All processes are fitted at once, see fitOU_batch.
 
     Example
     -------
     >>> import risktools as rt
     """
 
-    params = _pd.DataFrame()
+    if verbose == True:
+        for c in df.columns:
+            fitOU(df[c], dt, log_price=log_price, method=method, verbose=verbose)
 
-    for c in df.columns:
-        ret = fitOU(df[c], dt, log_price=log_price, method=method, verbose=verbose)
-        params.loc["theta", c] = ret["theta"]
-        params.loc["annualized_sigma", c] = ret["annualized_sigma"]
-        params.loc["mu", c] = ret["mu"]
+    return fitOU_batch(df, dt, log_price=log_price, method=method)
 
-    return params
 
-
-def generate_eps_MV(cor, T, dt, sims=1000, mu=None, seed=None):
+def generate_eps_MV(
+    cor, T, dt, sims=1000, mu=None, seed=None, antithetic=False, source=None
+):
     """
     Generate epsilons from a multivariate normal distribution
     for use in multivariate stochastic simulations
@@ -112,8 +118,19 @@ def generate_eps_MV(cor, T, dt, sims=1000, mu=None, seed=None):
     mu : array-like[float], optional
         Array of means to use for the multivariate normal for each random process.
         If None, mu = 0 is used for all random processes. By default None.
-    seed : int
-        To pass to numpy random number generator as seed. For testing only.
+    seed : int | Generator | RandomStreams
+        To pass to numpy random number generator as seed. For testing only. A numpy Generator
+        or RandomStreams can also be passed in which case random numbers are drawn from it
+        directly.
+    antithetic : bool, optional
+        Use antithetic variates. Only half of the simulations are drawn and the other half
+        mirror them around mu. With an odd number of sims the last mirrored simulation is
+        dropped. By default False.
+    source : NormalSource, optional
+        Source of independent standard normal random numbers, e.g. a SobolNormalSource for
+        quasi-Monte Carlo, that are correlated with the Cholesky factor of cor, or a
+        CorrelatedNormalSource or FactorNormalSource whose numbers are used as they are.
+        seed and antithetic are not used if given. By default None.
 
     Returns
     -------
@@ -143,16 +160,44 @@ def generate_eps_MV(cor, T, dt, sims=1000, mu=None, seed=None):
     # sd = _np.diag(sigma)
     # cov = sd @ cor @ sd
     cov = cor
-    rng = Generator(SFC64(seed))
-
-    eps = rng.multivariate_normal(mu, cov, size=(N, sims))
+    M = cov.shape[0]
+
+    # the factor of cov is cached, so repeated simulations on the same
+    # matrix only factor it once
+    if isinstance(source, CorrelatedNormalSource):
+        eps = source.normal(N, sims, M)
+    elif source is not None:
+        eps = source.normal(N, sims, M) @ _cor_factor(cov).T
+    elif antithetic:
+        factor = _cor_factor(cov).T
+        rng = _make_rng(seed)
+        eps = _antithetic(
+            lambda size: rng.standard_normal(size + (M,)) @ factor, (N, sims), axis=1
+        )
+    else:
+        eps = CorrelatedNormalSource(cov, seed=seed).normal(N, sims)
 
-    # eps = _np.random.multivariate_normal(mu, cov, size=(N, sims))
+    if _np.any(mu != 0):
+        eps += mu
 
     return eps
 
 
-def simGBM_MV(s0, r, sigma, T, dt, mu=None, cor=None, eps=None, sims=1000, seed=None):
+def simGBM_MV(
+    s0,
+    r,
+    sigma,
+    T,
+    dt,
+    mu=None,
+    cor=None,
+    eps=None,
+    sims=1000,
+    seed=None,
+    fan=None,
+    output="array",
+    source=None,
+):
     """
     Simulate Geometric Brownian Motion for stochastic processes with
     multiple assets using a multivariate normal distribution.
@@ -187,14 +232,23 @@ def simGBM_MV(s0, r, sigma, T, dt, mu=None, cor=None, eps=None, sims=1000, seed=
         simulations, and M is the number of assets. By default None.
     sims : int
         Number of simulations. By default 1000.
-    seed : int | None
+    seed : int | Generator | RandomStreams | None
         To pass to numpy random number generator as seed. For testing only.
+    fan : FanAccumulator, optional
+        If given, the simulation is run in blocks of sims that are added to fan instead
+        of being returned. By default None.
+    output : ['array', 'result'], optional
+        Return the numpy array or a SimulationResult of it without a copy. By default
+        'array'.
+    source : NormalSource, optional
+        Source of the standard normal random numbers, see generate_eps_MV. By default None.
 
     Returns
     -------
-    Matrix of simulated values of the stochastic processes. The first dimension
+    Matrix (or SimulationResult, see output) of simulated values of the stochastic processes. The first dimension
     corresponds to the time steps, the second dimension corresponds to the simulations,
-    and the third dimension corresponds to the assets.
+    and the third dimension corresponds to the assets. If fan is given, the summary of
+    fan (see FanAccumulator.summary).
 
     Example
     -------
@@ -204,6 +258,19 @@ def simGBM_MV(s0, r, sigma, T, dt, mu=None, cor=None, eps=None, sims=1000, seed=
     if (cor is None) & (eps is None):
         raise ValueError("correlation matrix cor required if eps not passed")
 
+    if (fan is not None) & (eps is None):
+        rng = _make_rng(seed)
+
+        for start, stop in plan_sim_chunks(int(T / dt), sims, arrays=2 * len(s0)):
+            fan.update(
+                simGBM_MV(
+                    s0, r, sigma, T, dt, mu, cor, sims=stop - start, seed=rng,
+                    source=source,
+                )  # fmt: skip
+            )
+
+        return fan.summary()
+
     if ~isinstance(s0, _np.ndarray):
         s0 = _np.array(s0)
     if ~isinstance(sigma, _np.ndarray):
@@ -222,7 +289,7 @@ def simGBM_MV(s0, r, sigma, T, dt, mu=None, cor=None, eps=None, sims=1000, seed=
     N = int(T / dt)
 
     if eps is None:
-        eps = generate_eps_MV(cor, T, dt, sims, mu, seed=seed)
+        eps = generate_eps_MV(cor, T, dt, sims, mu, seed=seed, source=source)
 
     s = _np.zeros((N + 1, sims, len(s0)))
 
@@ -231,8 +298,12 @@ def simGBM_MV(s0, r, sigma, T, dt, mu=None, cor=None, eps=None, sims=1000, seed=
             (r - 0.5 * sigma[i] ** 2) * dt + sigma[i] * _np.sqrt(dt) * eps[:, :, i]
         )
     s[0, :, :] = s0
+    s = s.cumprod(axis=0)
 
-    return s.cumprod(axis=0)
+    if fan is not None:
+        return fan.update(s).summary()
+
+    return _MV_output(s, output, dt, seed)
 
 
 def simOU_MV(
@@ -247,6 +318,12 @@ def simOU_MV(
     eps=None,
     seed=None,
     log_price=False,
+    workers=1,
+    scheme="euler",
+    fan=None,
+    source=None,
+    output="array",
+    backend=None,
     **kwargs,
 ):
     """
@@ -302,14 +379,35 @@ def simOU_MV(
     log_price : bool
         Adds adjustment term to the mean reversion term if the prices passed are log prices. By
         default False.
+    workers : int, optional
+        Number of threads to split the simulations across. -1 uses all available cores.
+        Results are identical for any number of workers. By default 1.
+    scheme : ['euler', 'exact'], optional
+        Discretization of the OU processes. 'exact' uses the closed-form OU transition over
+        each step so it stays unbiased on coarse time grids. See simOU. By default 'euler'.
+    fan : FanAccumulator, optional
+        If given, the simulation is run in blocks of sims that are added to fan instead
+        of being returned. By default None.
+    source : NormalSource, optional
+        Source of the standard normal random numbers, see generate_eps_MV. By default None.
+    output : ['array', 'result'], optional
+        Return the numpy array or a SimulationResult of it without a copy. By default
+        'array'.
+    backend : ['cython', 'numba', 'numpy'], optional
+        Backend of the simulation kernel, by default the one set with set_backend. All
+        assets are stepped together in one kernel call.
     **kwargs : optional
-        Keyword arguments to pass to simOU function.
+        c as in simOU, c=False runs the numpy backend. keep, antithetic, strike and
+        barrier used to be passed on to simOU for each asset. They are not used by the
+        multi-asset kernel, are ignored with a DeprecationWarning and will raise a
+        TypeError in a future version.
 
     Returns
     -------
-    Matrix of simulated values of the stochastic processes of size N x sims x M where
+    Matrix (or SimulationResult, see output) of simulated values of the stochastic processes of size N x sims x M where
     N corresponds to the number of time steps, sims corresponds to the simulations,
-    and M corresponds to the number of assets.
+    and M corresponds to the number of assets. If fan is given, the summary of fan
+    (see FanAccumulator.summary).
 
     Example
     -------
@@ -317,66 +415,147 @@ def simOU_MV(
     >>> rt.simOU_MV(s0=[100,100], mu=[0.1,0.1], sigma=[0.3,0.3], theta=[10,10],
             T=1, dt=1/252, cor=[[1,0],[0,1]], sims=100)
     """
+    c = _MV_kwargs("simOU_MV", kwargs, _MV_DEPRECATED)
+
+    backend = _resolve_backend(backend, c)
+
+    if scheme not in _OU_SCHEMES:
+        raise ValueError(f"scheme must be one of {list(_OU_SCHEMES)}")
+
     if eps is None:
         if dt is None:
             raise ValueError("Must provide dt if eps is not provided.")
         if cor is None:
             raise ValueError("Must provide cor if eps is not provided.")
-        eps = generate_eps_MV(cor=cor, T=T, dt=dt, sims=sims, seed=seed)
+
+        if fan is not None:
+            rng = _make_rng(seed)
+            sigma = _np.array(sigma)
+
+            for start, stop in plan_sim_chunks(int(T / dt), sims, arrays=3 * len(s0)):
+                fan.update(
+                    simOU_MV(
+                        s0=s0,
+                        mu=mu,
+                        theta=theta,
+                        sigma=sigma[:, start:stop] if sigma.ndim == 3 else sigma,
+                        T=T,
+                        dt=dt,
+                        cor=cor,
+                        sims=stop - start,
+                        seed=rng,
+                        log_price=log_price,
+                        workers=workers,
+                        scheme=scheme,
+                        source=source,
+                        backend=backend,
+                    )
+                )
+
+            return fan.summary()
+
+        eps = generate_eps_MV(cor=cor, T=T, dt=dt, sims=sims, seed=seed, source=source)
     else:
         dt = T / eps.shape[0]
 
-    sigma_arr = _np.zeros(eps.shape)
-    mu_arr = _np.zeros((eps.shape[0], eps.shape[2]))
-    sigma = _np.array(sigma)
-    mu = _np.array(mu)
-
-    # broadcast sigma into 3D array
-    if len(sigma.shape) == 1:
-
-        for i in range(0, eps.shape[2]):
-            sigma_arr[:, :, i] = sigma[i]
-    elif len(sigma.shape) == 2:
-        for i in range(0, eps.shape[2]):
-            sigma_arr[:, :, i] = sigma[:, _np.newaxis, i]
-    elif len(sigma.shape) == 3:
-        sigma_arr = sigma
-
-    # broadcast mu into 2D array
-    if len(mu.shape) == 1:
-        for i in range(0, eps.shape[2]):
-            mu_arr[:, i] = mu[i]
+    N, sims, M = eps.shape
+
+    # (N x sims x M) views of mu and sigma for steps 1 to N, per asset values
+    # and time series are broadcast rather than copied
+    mu = _MV_param(mu, N, sims, M)
+    sigma = _MV_param(sigma, N, sims, M)
+    theta = _np.ascontiguousarray(_np.asarray(theta, dtype=float).reshape(M))
+
+    # stepped in place from s0 and the random numbers
+    s = _np.empty((N + 1, sims, M))
+    s[0] = _np.asarray(s0, dtype=float).reshape(M)
+    s[1:] = eps
+
+    if backend == "numpy":
+        _simOU_MVpy(s, theta, mu, sigma, dt, log_price, scheme)
     else:
-        mu_arr = mu
+        kernels = _kernels(backend)
+
+        def run(start, stop):
+            kernels.simOU_MV(
+                s[:, start:stop],
+                theta,
+                mu[:, start:stop],
+                sigma[:, start:stop],
+                dt,
+                steps=N,
+                sims=stop - start,
+                assets=M,
+                log_price=int(log_price),
+                scheme=_OU_SCHEMES[scheme],
+            )
 
-    # number of time steps
-    N = eps.shape[0]
+        _run_by_sims(run, sims, workers, backend)
 
-    s = _np.zeros((N + 1, eps.shape[1], eps.shape[2]))
+    if fan is not None:
+        return fan.update(s).summary()
 
-    try:
-        s0 = s0.to_numpy()
-    except:
-        pass
+    return _MV_output(s, output, dt, seed)
 
-    try:
-        theta = theta.to_numpy()
-    except:
-        pass
 
-    for i in range(0, eps.shape[2]):
-        s[:, :, i] = simOU(
-            s0=s0[i],
-            mu=mu_arr[:, i],
-            theta=theta[i],
-            sigma=sigma_arr[:, :, i],
-            T=T,
-            dt=dt,
-            eps=eps[:, :, i],
-            log_price=log_price,
-            **kwargs,
+# keyword arguments that simOU_MV and simOUJ_MV used to pass on to simOU and
+# simOUJ for each asset, which the multi-asset kernels don't use
+_MV_DEPRECATED = ["keep", "antithetic", "strike", "barrier"]
+
+
+def _MV_kwargs(fun, kwargs, deprecated):
+    # c from the keyword arguments of simOU_MV and simOUJ_MV, warning about
+    # the ones that are no longer passed on
+    c = kwargs.pop("c", True)
+
+    ignored = [k for k in kwargs if k in deprecated]
+    unknown = [k for k in kwargs if k not in deprecated]
+
+    if len(unknown) > 0:
+        raise TypeError(f"{fun} got unexpected keyword arguments {unknown}")
+    if len(ignored) > 0:
+        _warnings.warn(
+            f"{fun} steps all assets in one kernel and ignores {ignored}, which it "
+            "used to pass on to the simulation of each asset. They will raise a "
+            "TypeError in a future version.",
+            DeprecationWarning,
+            stacklevel=3,
         )
 
+    return c
+
+
+def _MV_param(x, N, sims, M):
+    # read-only (N x sims x M) view of a per asset (M), time series (N x M) or
+    # stochastic (N x sims x M) parameter, broadcast with zero strides
+    x = _np.asarray(x, dtype=float)
+
+    if x.ndim == 2:
+        x = x[:, _np.newaxis, :]
+
+    return _np.broadcast_to(x, (N, sims, M))
+
+
+def _simOU_MVpy(s, theta, mu, sigma, dt, log_price=False, scheme="euler"):
+    # numpy version of the csimOU_MV kernel, vectorized across sims and assets.
+    # Both schemes are x[j] = a * x[j - 1] + u[j] with u computed for all steps
+    # at once, see _simOUpy
+    eps = s[1:]
+
+    if scheme == "exact":
+        a, oma, g, b = _np.vectorize(_ou_exact_coefs)(theta, dt)
+        u = oma * mu + sigma * b * eps
+        if log_price:
+            u -= 0.5 * sigma * sigma * g
+    else:
+        a = 1 - theta * dt
+        u = theta * mu * dt + sigma * _np.sqrt(dt) * eps
+        if log_price:
+            u -= 0.5 * sigma * sigma * dt
+
+    for j in range(1, s.shape[0]):
+        s[j] = a * s[j - 1] + u[j - 1]
+
     return s
 
 
@@ -397,12 +576,25 @@ def simOUJ_MV(
     elp=None,
     ejp=None,
     seed=None,
+    workers=1,
+    output="array",
+    source=None,
+    common_jump_prob=0.0,
+    common_jump_share=None,
+    backend=None,
     **kwargs,
 ):
     """
     Simulate Ornstein-Uhlenbeck Jump process for stochastic processes for
     multiple assets using a multivariate normal distribution.
 
+    Jumps can be correlated across assets with a common shock model. On top of the
+    jumps of each asset (jump_prob), common jumps arrive at a rate of
+    common_jump_prob and hit each asset with a probability of its common_jump_share,
+    with lognormal sizes of every asset's jump_avgsize and jump_stdv that are
+    correlated by cor. Related contracts, e.g. crude and refined products, then jump
+    together. All assets are stepped together in one kernel call.
+
     Parameters
     ----------
     s0 : array-like[float]
@@ -465,19 +657,43 @@ def simOUJ_MV(
         Must be a 3D array of
         size (N x sims x M) where N is the number of time steps, sims is the number of
         simulations, and M is the number of assets. By default None. If None, then random numbers are generated.
+        Must be given with ejp.
     ejp : numpy array, optional
         Array of random numbers to use for the jump size.
         Must be a 3D array of
         size (N x sims x M) where N is the number of time steps, sims is the number of
         simulations, and M is the number of assets. By default None. If None, then random numbers are generated.
-    seed : int, optional
-        To pass to numpy random number generator as seed. For testing only.
+        Must be given with elp.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. For testing only. The jumps of
+        each asset are drawn from their own independent child stream of seed.
+    workers : int, optional
+        Number of threads to split the simulations across. -1 uses all available cores.
+        Results are identical for any number of workers. By default 1.
+    output : ['array', 'result'], optional
+        Return the numpy array or a SimulationResult of it without a copy. By default
+        'array'.
+    source : NormalSource, optional
+        Source of the standard normal random numbers of the diffusions, see
+        generate_eps_MV. By default None.
+    common_jump_prob : float, optional
+        Probability (annual rate) of common jumps for a Poisson process. Not used if
+        elp and ejp are given. By default 0.
+    common_jump_share : array_like[float], optional
+        Probability that each asset jumps in a common jump. Must be a 1D array of length
+        M where M is the number of assets. If None, every asset jumps in every common
+        jump. By default None.
+    backend : ['cython', 'numba', 'numpy'], optional
+        Backend of the simulation kernel, by default the one set with set_backend.
     **kwargs : optional
-        Keyword arguments to pass to simOUJ function.
+        c as in simOUJ, c=False runs the numpy backend. keep, antithetic, strike,
+        barrier, fan and jumps used to be passed on to simOUJ for each asset. They are
+        not used by the multi-asset kernel, are ignored with a DeprecationWarning and
+        will raise a TypeError in a future version.
 
     Returns
     -------
-    Matrix of simulated values of the stochastic processes of size N x sims x M where
+    Matrix (or SimulationResult, see output) of simulated values of the stochastic processes of size N x sims x M where
     N corresponds to the number of time steps, sims corresponds to the simulations,
     and M corresponds to the number of assets.
 
@@ -488,72 +704,214 @@ def simOUJ_MV(
             jump_prob=[0.1,0.1], jump_avgsize=[10,10], jump_stdv=[0.1,0.1],
             T=1, dt=1/252, cor=[[1,0],[0,1]], sims=100)
     """
+    c = _MV_kwargs("simOUJ_MV", kwargs, _MV_DEPRECATED + ["fan", "jumps"])
+    if (elp is None) != (ejp is None):
+        raise ValueError("elp and ejp must be given together")
+
+    backend = _resolve_backend(backend, c)
+
     if eps is None:
         if dt is None:
             raise ValueError("Must provide dt if eps is not provided.")
         if cor is None:
             raise ValueError("Must provide cor if eps is not provided.")
-        eps = generate_eps_MV(cor=cor, T=T, dt=dt, sims=sims, seed=seed)
+        eps = generate_eps_MV(cor=cor, T=T, dt=dt, sims=sims, seed=seed, source=source)
     else:
         dt = T / eps.shape[0]
 
-    sigma_arr = _np.zeros(eps.shape)
-    mu_arr = _np.zeros((eps.shape[0], eps.shape[2]))
-    sigma = _np.array(sigma)
-    mu = _np.array(mu)
-
-    # broadcast sigma into 3D array
-    if len(sigma.shape) == 1:
-
-        for i in range(0, eps.shape[2]):
-            sigma_arr[:, :, i] = sigma[i]
-    elif len(sigma.shape) == 2:
-        for i in range(0, eps.shape[2]):
-            sigma_arr[:, :, i] = sigma[:, _np.newaxis, i]
-    elif len(sigma.shape) == 3:
-        sigma_arr = sigma
-
-    # broadcast mu into 2D array
-    if len(mu.shape) == 1:
-        for i in range(0, eps.shape[2]):
-            mu_arr[:, i] = mu[i]
-    else:
-        mu_arr = mu
+    N, sims, M = eps.shape
 
-    # number of time steps
-    N = eps.shape[0]
+    mu = _MV_param(mu, N, sims, M)
+    sigma = _MV_param(sigma, N, sims, M)
+    theta = _asset_param(theta, M)
+    jump_prob = _asset_param(jump_prob, M)
+    jump_avgsize = _asset_param(jump_avgsize, M)
+    jump_stdv = _asset_param(jump_stdv, M)
 
     if mr_lag is None:
-        mr_lag = [mr_lag] * eps.shape[2]
-
-    s = _np.zeros((N + 1, eps.shape[1], eps.shape[2]))
-
-    for i in range(0, eps.shape[2]):
-        ejp_tmp = ejp[:, :, i] if ejp is not None else None
-        elp_tmp = elp[:, :, i] if elp is not None else None
-
-        s[:, :, i] = simOUJ(
-            s0=s0[i],
-            mu=mu_arr[:, i],
-            theta=theta[i],
-            sigma=sigma_arr[:, :, i],
-            jump_prob=jump_prob[i],
-            jump_avgsize=jump_avgsize[i],
-            jump_stdv=jump_stdv[i],
-            T=T,
-            dt=dt,
-            eps=eps[:, :, i],
-            elp=elp_tmp,
-            ejp=ejp_tmp,
-            seed=seed,
-            mr_lag=mr_lag[i],
-            **kwargs,
+        mr_lag = [mr_lag] * M
+    mr_lag = _np.array(
+        [0 if lag is None else lag for lag in _np.broadcast_to(mr_lag, M)],
+        dtype=_np.int64,
+    )
+
+    share = _np.ones(M) if common_jump_share is None else common_jump_share
+    share = _asset_param(share, M)
+
+    if elp is not None:
+        events = _dense_jump_events(elp, ejp)
+        common_jump_prob = 0.0
+    else:
+        # jumps of each asset from their own child stream of seed and the
+        # common jumps from the next one
+        rngs = _spawn_rngs(seed, M + 1)
+        factor = _np.eye(M) if cor is None else _cor_factor(_np.asarray(cor))
+
+        events = _MV_jump_events(
+            rngs, N, sims, jump_prob * dt, jump_avgsize, jump_stdv,
+            common_jump_prob * dt, share, factor,
+        )  # fmt: skip
+
+    # mean reversion is adjusted for the expected jumps of each asset
+    jump_rate = jump_prob + common_jump_prob * share
+
+    # stepped in place from s0 and the random numbers
+    s = _np.empty((N + 1, sims, M))
+    s[0] = _asset_param(s0, M)
+    s[1:] = eps
+
+    if backend == "numpy":
+        _simOUJ_MVpy(
+            s, events, theta, mu, sigma, dt, mr_lag, jump_rate, jump_avgsize
         )
+    else:
+        ptr, step, jump = events
+        kernels = _kernels(backend)
+
+        def run(start, stop):
+            kernels.simOUJ_MV(
+                s[:, start:stop],
+                ptr[start * M : stop * M + 1],
+                step,
+                jump,
+                theta,
+                mu[:, start:stop],
+                dt,
+                sigma[:, start:stop],
+                steps=N,
+                sims=stop - start,
+                assets=M,
+                mr_lag=mr_lag,
+                jump_prob=jump_rate,
+                jump_avgsize=jump_avgsize,
+            )
+
+        _run_by_sims(run, sims, workers, backend)
+
+    return _MV_output(s, output, dt, seed)
+
 
+def _asset_param(x, M):
+    # contiguous array of a per asset parameter
+    return _np.ascontiguousarray(
+        _np.broadcast_to(_np.asarray(x, dtype=float).ravel(), M)
+    )
+
+
+def _MV_jump_events(
+    rngs, N, sims, lam, jump_avgsize, jump_stdv, lam_common, share, factor
+):
+    """
+    Draws the jumps of every asset as events in CSR form with a row for each sim and
+    asset (r * M + i), see _jump_events. Each asset i has its own Poisson(lam[i]) jumps
+    drawn from rngs[i]. Common jumps drawn from rngs[M] arrive as Poisson(lam_common)
+    and hit asset i with probability share[i] with lognormal sizes correlated by the
+    factor of the correlation matrix. A common and an own jump in the same step add
+    up. Returns (ptr, step, jump).
+    """
+    M = len(lam)
+    rows, steps, jumps = [], [], []
+
+    for i in range(M):
+        ptr, step, jump = _jump_events(
+            rngs[i], N, sims, lam[i], jump_avgsize[i], jump_stdv[i]
+        )
+        rows.append(_np.repeat(_np.arange(sims), _np.diff(ptr)) * M + i)
+        steps.append(step)
+        jumps.append(jump)
+
+    if lam_common > 0:
+        # jump counts only, the sizes are drawn for every asset below
+        ptr, step, count = _jump_events(rngs[M], N, sims, lam_common, 1.0, 0.0)
+        sim = _np.repeat(_np.arange(sims), _np.diff(ptr))
+
+        z = rngs[M].standard_normal((step.shape[0], M)) @ factor.T
+        size = _np.exp(_np.log(jump_avgsize) + jump_stdv * z)
+        e, i = _np.nonzero(rngs[M].random((step.shape[0], M)) < share)
+
+        rows.append(sim[e] * M + i)
+        steps.append(step[e])
+        jumps.append(count[e] * size[e, i])
+
+    row, step, jump = (_np.concatenate(x) for x in [rows, steps, jumps])
+
+    return _jump_csr(row, step, jump, N, sims * M)
+
+
+def _dense_jump_events(elp, ejp):
+    # events of (N x sims x M) elp and ejp arrays, jumps where ejp is not 0
+    elp = _np.asarray(elp, dtype=float)
+    ejp = _np.asarray(ejp, dtype=float)
+    N, sims, M = ejp.shape
+
+    j, r, i = _np.nonzero(ejp != 0)
+    return _jump_csr(r * M + i, j + 1, ejp[j, r, i] * elp[j, r, i], N, sims * M)
+
+
+def _jump_csr(row, step, jump, N, rows):
+    # events sorted by row and time step in CSR form, summing the jumps of
+    # events in the same row and step
+    order = _np.lexsort((step, row))
+    row, step, jump = row[order], step[order], jump[order]
+
+    if row.shape[0] > 0:
+        key = row * (N + 1) + step
+        first = _np.flatnonzero(_np.r_[True, key[1:] != key[:-1]])
+        row, step, jump = row[first], step[first], _np.add.reduceat(jump, first)
+
+    ptr = _np.searchsorted(row, _np.arange(rows + 1)).astype(_np.int64)
+
+    return ptr, step.astype(_np.int64), _np.ascontiguousarray(jump, dtype=float)
+
+
+def _simOUJ_MVpy(s, events, theta, mu, sigma, dt, mr_lag, jump_prob, jump_avgsize):
+    # numpy version of the csimOUJ_MV kernel, stepping all sims and assets at
+    # once with the jumps of each step taken from a dense array
+    N, sims, M = s.shape[0] - 1, s.shape[1], s.shape[2]
+    ptr, step, jump = events
+    row = _np.repeat(_np.arange(sims * M), _np.diff(ptr))
+
+    jumps = _np.zeros((N, sims, M))
+    jumps[step - 1, row // M, row % M] = jump
+
+    sq = _np.sqrt(dt)
+    lag_jump = _np.zeros((sims, M))
+    lag_left = _np.zeros((sims, M), dtype=_np.int64)
+    lag = _np.broadcast_to(mr_lag, (sims, M))
+
+    for j in range(1, N + 1):
+        # a jump raises the mean reversion level for mr_lag - 1 steps and
+        # no other jump can happen in that time
+        lagged = lag_left > 0
+        m = _np.where(lagged, mu[j - 1] + lag_jump, mu[j - 1])
+        jmp = _np.where(lagged, 0.0, jumps[j - 1])
+
+        lag_left[lagged] -= 1
+        new = ~lagged & (jmp != 0) & (lag > 1)
+        lag_jump[new] = jmp[new]
+        lag_left[new] = lag[new] - 1
+
+        x = s[j - 1]
+        s[j] = (
+            x
+            + theta * (m - jump_prob * jump_avgsize - x) * x * dt
+            + sigma[j - 1] * x * s[j] * sq
+            + jmp
+        )
+
+    return s
+
+
+def _MV_output(s, output, dt=None, seed=None):
+    # (N + 1 x sims x M) paths as the array itself or a SimulationResult
+    if output not in ["array", "result"]:
+        raise ValueError("output must be one of ['array', 'result']")
+    if output == "result":
+        return SimulationResult(s, dt=dt, seed=seed)
     return s
 
 
-def generate_random_portfolio_weights(number_assets, number_sims=2500):
+def generate_random_portfolio_weights(number_assets, number_sims=2500, seed=None):
     """
     Generate a matrix of random portfolio weights based on
     a number of assets using a uniform distribution.
@@ -564,6 +922,9 @@ def generate_random_portfolio_weights(number_assets, number_sims=2500):
         Number of assets in the portfolio.
     number_sims : int, optional
         Number of simulations. By default 2500.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator (SFC64) as seed. If None, numpy's global
+        random state is used. By default None.
 
     Returns
     -------
@@ -575,7 +936,8 @@ def generate_random_portfolio_weights(number_assets, number_sims=2500):
     >>> import risktools as rt
     >>> rt.generate_random_portfolio_weights(5, 1000)
     """
-    weights = _np.random.uniform(size=(number_sims, number_assets))
+    rng = _np.random if seed is None else _make_rng(seed)
+    weights = rng.uniform(size=(number_sims, number_assets))
     weights = _np.multiply(weights.T, 1 / weights.sum(axis=1)).T
 
     return weights
@@ -879,19 +1241,42 @@ class _MVSIM(_ABC):
 
     _frontier = None
     _sims = None
+    _fan = None
     _prices = None
     _params = None
     _asset_names = None
+    _factors = None
+    _source = None
+    _source_cor = None
 
     @_abstractmethod
     def fit():
         pass
 
+    def _normal_source(self, seed=None):
+        # correlated normals for simulate, kept between runs so that the factor of
+        # cor and the buffer of random numbers are reused while cor is unchanged
+        cor = _np.asarray(self._cor, dtype=float)
+
+        if (self._source is None) or (not _np.array_equal(self._source_cor, cor)):
+            if self._factors is None:
+                self._source = CorrelatedNormalSource(cor, reuse=True)
+            else:
+                self._source = FactorNormalSource.from_cor(
+                    cor, self._factors, reuse=True
+                )
+            self._source_cor = cor
+        self._source.reset(seed)
+
+        return self._source
+
     @_abstractmethod
     def simulate():
         pass
 
-    def plot_efficient_frontier(self, strike=0, payoff_funcs=None, portfolio_sims=5000):
+    def plot_efficient_frontier(
+        self, strike=0, payoff_funcs=None, portfolio_sims=5000, seed=None
+    ):
         """
         Plot the efficient frontier based on a specificied payoff function.
 
@@ -906,6 +1291,8 @@ class _MVSIM(_ABC):
             time T.
         portfolio_sims : int
             Number of random portfolios to simulate for the efficient frontier.
+        seed : int | Generator | RandomStreams, optional
+            Seed for the random portfolio weights. By default None.
 
         Returns
         -------
@@ -920,7 +1307,9 @@ class _MVSIM(_ABC):
         self._payoffs = calculate_payoffs(self._sims, strike, payoff_funcs)
 
         # calculate efficient frontier
-        weights = generate_random_portfolio_weights(len(self._s0), portfolio_sims)
+        weights = generate_random_portfolio_weights(
+            len(self._s0), portfolio_sims, seed=seed
+        )
         port = simulate_efficient_frontier(self._payoffs, weights)
 
         # make dataframe
@@ -977,6 +1366,14 @@ class _MVSIM(_ABC):
         """
         return self._sims
 
+    @property
+    def fan(self):
+        """
+        Returns the per time step summary of the last simulation run with
+        a FanAccumulator (see the simulate method), else None
+        """
+        return self._fan
+
     @property
     def prices(self):
         if self._prices is None:
@@ -1045,6 +1442,10 @@ class MVGBM(_MVSIM):
         method if s0, sigma and cor not passed.
     asset_names : list[str], optional
         List of strings to use as asset names in the output dataframe.
+    factors : int, optional
+        If given, the shocks are drawn from a factor model of this many principal
+        components of cor (see FactorNormalSource), which is much faster for large
+        numbers of assets. By default None.
 
     Example
     -------
@@ -1064,9 +1465,19 @@ class MVGBM(_MVSIM):
     """
 
     def __init__(
-        self, r, T, dt, s0=None, sigma=None, cor=None, prices=None, asset_names=None
+        self,
+        r,
+        T,
+        dt,
+        s0=None,
+        sigma=None,
+        cor=None,
+        prices=None,
+        asset_names=None,
+        factors=None,
     ):
         self._r = r
+        self._factors = factors
         self._T = T
         self._dt = dt
         self._prices = prices
@@ -1099,9 +1510,21 @@ class MVGBM(_MVSIM):
             self._sigma = returns.std() * _np.sqrt(1 / self._dt)
             self._cor = returns.corr()
 
-    def simulate(self, sims=1000, seed=None):
+    def simulate(self, sims=1000, seed=None, fan=None):
+        """
+        Method to run the simulation.
 
-        self._sims = simGBM_MV(
+        Parameters
+        ----------
+        sims : int, optional
+            Number of simulations. By default 1000.
+        seed : int, optional
+            To pass to numpy random number generator as seed. For testing only.
+        fan : FanAccumulator, optional
+            If given, the simulations are summarized by fan in blocks of sims instead of
+            being kept, and the summary is stored in the fan property. By default None.
+        """
+        out = simGBM_MV(
             self._s0,
             self._r,
             self._sigma,
@@ -1110,8 +1533,15 @@ class MVGBM(_MVSIM):
             cor=self._cor,
             sims=sims,
             seed=seed,
+            fan=fan,
+            source=self._normal_source(seed),
         )
 
+        if fan is None:
+            self._sims = out
+        else:
+            self._fan = out
+
     def output(self, start_date=None, freq="B", names=None):
         """
         Method for outputing the results of the simulations. It will return a
@@ -1190,6 +1620,10 @@ class MVOU(_MVSIM):
         method if s0, mu, theta, sigma and cor not passed.
     asset_names : list[str]
         List of strings to use as asset names in the output dataframe.
+    factors : int, optional
+        If given, the shocks are drawn from a factor model of this many principal
+        components of cor (see FactorNormalSource), which is much faster for large
+        numbers of assets. By default None.
 
     Example
     -------
@@ -1220,8 +1654,10 @@ class MVOU(_MVSIM):
         cor=None,
         prices=None,
         asset_names=None,
+        factors=None,
     ):
         self._mu = mu
+        self._factors = factors
         self._theta = theta
         self._T = T
         self._dt = dt
@@ -1284,9 +1720,21 @@ class MVOU(_MVSIM):
         if self._asset_names is not None:
             self._params.columns = self._asset_names
 
-    def simulate(self, sims=1000, seed=None):
+    def simulate(self, sims=1000, seed=None, fan=None):
+        """
+        Method to run the simulation.
 
-        self._sims = simOU_MV(
+        Parameters
+        ----------
+        sims : int, optional
+            Number of simulations. By default 1000.
+        seed : int, optional
+            To pass to numpy random number generator as seed. For testing only.
+        fan : FanAccumulator, optional
+            If given, the simulations are summarized by fan in blocks of sims instead of
+            being kept, and the summary is stored in the fan property. By default None.
+        """
+        out = simOU_MV(
             s0=self._s0,
             mu=self._params.loc["mu", :],
             theta=self._params.loc["theta", :],
@@ -1297,8 +1745,15 @@ class MVOU(_MVSIM):
             sims=sims,
             log_price=False,
             seed=seed,
+            fan=fan,
+            source=self._normal_source(seed),
         )
 
+        if fan is None:
+            self._sims = out
+        else:
+            self._fan = out
+
     def output(self, start_date=None, freq="B", names=None):
         """
         Method for outputing the results of the simulations. It will return a
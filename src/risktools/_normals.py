@@ -0,0 +1,548 @@
+# sources of standard normal random numbers for the simulators
+
+import numpy as _np
+import warnings as _warnings
+from abc import ABC as _ABC, abstractmethod as _abstractmethod
+from scipy.special import ndtri as _ndtri
+from scipy.stats import qmc as _qmc
+from ._sims import _make_rng, _normal
+from ._streams import _spawn_rngs
+
+# factors of the correlation matrices used so far, see _cor_factor
+_FACTORS = {}
+_MAX_FACTORS = 32
+
+
+class NormalSource(_ABC):
+    """
+    Abstract base class for sources of standard normal random numbers that can be
+    passed to the simulators (simGBM, simOU, simOU_MV, generate_eps_MV) with the
+    source argument in place of their own pseudo random draws.
+    """
+
+    @_abstractmethod
+    def normal(self, N, sims, dims=None):
+        """
+        Draw standard normal random numbers.
+
+        Parameters
+        ----------
+        N : int
+            Number of time steps.
+        sims : int
+            Number of simulations.
+        dims : int, optional
+            Number of random processes (assets) for multivariate simulations. By default
+            None.
+
+        Returns
+        -------
+        Array of size (N x sims) or (N x sims x dims) if dims is given.
+        """
+        pass
+
+
+class PseudoNormalSource(NormalSource):
+    """
+    Pseudo random normals from a numpy Generator, the same as the simulators use by
+    default.
+
+    Parameters
+    ----------
+    seed : int | Generator, optional
+        To pass to numpy random number generator as seed. A numpy Generator can also be
+        passed in which case random numbers are drawn from it directly. By default None.
+    antithetic : bool, optional
+        Mirror the first half of the sims for the second half (see simOU). By default
+        False.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.simOU(source=rt.PseudoNormalSource(seed=42))
+    """
+
+    def __init__(self, seed=None, antithetic=False):
+        self._rng = _make_rng(seed)
+        self.antithetic = antithetic
+
+    def normal(self, N, sims, dims=None):
+        size = (N, sims) if dims is None else (N, sims, dims)
+        return _normal(self._rng, size, self.antithetic, axis=1)
+
+
+class SobolNormalSource(NormalSource):
+    """
+    Quasi random normals from a Sobol sequence for quasi-Monte Carlo simulation. Each
+    simulation is one point of a Sobol sequence with a dimension for every time step
+    (and asset), mapped to normals with the inverse normal cdf. For smooth payoffs the
+    error falls close to 1/sims rather than 1/sqrt(sims).
+
+    With bridge=True the paths are built with a Brownian bridge: the first dimensions,
+    which are the most evenly spread, set the terminal value and the coarse shape of each
+    path and the later ones fill in the detail. This concentrates the variance in the
+    best dimensions of the sequence.
+
+    Successive calls with the same number of time steps and dims continue the sequence,
+    so a simulation can be drawn in blocks of sims. Sobol sequences are balanced for
+    powers of 2 sims.
+
+    Parameters
+    ----------
+    scramble : bool, optional
+        Use a randomized (Owen scrambled) sequence. Needed to estimate errors from
+        independent runs with different seeds. By default True.
+    bridge : bool, optional
+        Build the paths with a Brownian bridge. By default True.
+    seed : int | Generator, optional
+        Seed for the scrambling. By default None.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.simGBM(s0=100, sigma=0.3, sims=2**12, source=rt.SobolNormalSource(seed=42))
+    """
+
+    # the largest number of dimensions of the Sobol direction numbers in scipy
+    max_dims = 21201
+
+    def __init__(self, scramble=True, bridge=True, seed=None):
+        self.scramble = scramble
+        self.bridge = bridge
+        self._rng = _make_rng(seed)
+        self._samplers = {}
+
+    def normal(self, N, sims, dims=None):
+        d = N * (1 if dims is None else dims)
+
+        if d > self.max_dims:
+            raise ValueError(
+                f"Sobol sequences are limited to {self.max_dims} time steps x dims, got {d}"
+            )
+
+        if d not in self._samplers:
+            sampler = _qmc.Sobol(d, scramble=self.scramble, seed=self._rng)
+            if not self.scramble:
+                # the first point of the unscrambled sequence is 0
+                sampler.fast_forward(1)
+            self._samplers[d] = sampler
+
+        # dimensions are ordered time step first so that the first time steps (or the
+        # bridge points) of every asset get the best dimensions
+        z = _ndtri(self._samplers[d].random(sims))
+        z = z.reshape(sims, N, -1).transpose(1, 0, 2)
+
+        if self.bridge:
+            z = brownian_bridge(z)
+
+        return z[:, :, 0] if dims is None else z
+
+
+class CorrelatedNormalSource(NormalSource):
+    """
+    Correlated standard normals for the multivariate simulators (generate_eps_MV,
+    simGBM_MV, simOU_MV and the MVGBM and MVOU classes). The correlation matrix is
+    factored once when the source is made, with a Cholesky decomposition or, if it is
+    not positive definite, from its eigen decomposition with the negative eigenvalues
+    set to 0. Factors are also cached by the values of the matrix, so sources and
+    simulations on the same matrix don't factor it again.
+
+    Independent normals are drawn into a scratch buffer a block of time steps at a time
+    and multiplied by the factor with BLAS into the output, so no (N x sims x M) array
+    is made other than the output. With reuse=True the output buffer is kept and
+    filled again by the next draw of the same size.
+
+    Parameters
+    ----------
+    cor : matrix-like[float]
+        Correlation matrix of size M x M where M is the number of assets.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. By default None.
+    dtype : [float64, float32], optional
+        Type of the random numbers. float32 halves the memory and the time to draw them.
+        By default float64.
+    reuse : bool, optional
+        Return the same buffer from every draw of the same size, overwriting the
+        previous draw. By default False.
+    block_size : int, optional
+        Number of random numbers drawn and correlated at a time. By default 2**20.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> source = rt.CorrelatedNormalSource([[1, 0.5], [0.5, 1]], seed=42)
+    >>> rt.simOU_MV(s0=[5, 5], mu=[4, 4], theta=[2, 2], sigma=[0.1, 0.1], T=1,
+            dt=1/252, cor=[[1, 0.5], [0.5, 1]], source=source)
+    """
+
+    def __init__(
+        self, cor, seed=None, dtype=_np.float64, reuse=False, block_size=2**20
+    ):
+        self.cor = _np.array(cor, dtype=float)
+        self.factor = _cor_factor(self.cor)
+        self.dtype = _np.dtype(dtype)
+        self.reuse = reuse
+        self.block_size = block_size
+        self._rng = _make_rng(seed)
+        self._out = None
+        self._buffers = {}
+
+        if self.dtype not in [_np.float64, _np.float32]:
+            raise ValueError("dtype must be float64 or float32")
+
+    @property
+    def dims(self):
+        """Number of assets"""
+        return self.cor.shape[0]
+
+    def reset(self, seed=None):
+        """
+        Start a new stream of random numbers from seed, keeping the factor and buffers.
+
+        Parameters
+        ----------
+        seed : int | Generator | RandomStreams, optional
+            To pass to numpy random number generator as seed. By default None.
+        """
+        self._rng = _make_rng(seed)
+
+    def normal(self, N, sims, dims=None, out=None):
+        """
+        Draw correlated standard normal random numbers.
+
+        Parameters
+        ----------
+        N : int
+            Number of time steps.
+        sims : int
+            Number of simulations.
+        dims : int, optional
+            Number of assets, must be the size of cor if given. By default None.
+        out : numpy array, optional
+            C contiguous array of size (N x sims x M) to write the random numbers to.
+            By default None.
+
+        Returns
+        -------
+        Array of size (N x sims x M).
+        """
+        M = self.dims
+        out = self._output(N, sims, dims, out)
+
+        # whole time steps per block, drawn in the same order as one draw of
+        # the full array so that the block size doesn't change the numbers
+        rows = max(1, min(N, self.block_size // max(sims * M, 1)))
+        scratch = self._scratch(rows * sims * M, out.dtype)
+
+        factor = self.factor.T.astype(out.dtype)
+        flat = out.reshape(N * sims, M)
+
+        for start in range(0, N, rows):
+            stop = min(start + rows, N)
+            z = scratch[: (stop - start) * sims * M].reshape(-1, M)
+            self._rng.standard_normal(out=z, dtype=out.dtype)
+            _np.matmul(z, factor, out=flat[start * sims : stop * sims])
+
+        return out
+
+    def _output(self, N, sims, dims=None, out=None):
+        # the (N x sims x M) array to draw into, the kept one if reuse is set
+        M = self.dims
+        if (dims is not None) and (dims != M):
+            raise ValueError(f"source is for {M} assets, not {dims}")
+
+        shape = (N, sims, M)
+
+        if out is None:
+            if self.reuse and (self._out is not None) and (self._out.shape == shape):
+                return self._out
+
+            out = _np.empty(shape, dtype=self.dtype)
+            if self.reuse:
+                self._out = out
+        elif (out.shape != shape) or (not out.flags.c_contiguous):
+            raise ValueError(f"out must be a C contiguous array of size {shape}")
+
+        return out
+
+    def _scratch(self, size, dtype, i=0):
+        # flat buffer i of at least size numbers, kept between draws
+        buf = self._buffers.get(i)
+        if (buf is None) or (buf.size < size) or (buf.dtype != dtype):
+            buf = _np.empty(size, dtype=dtype)
+            self._buffers[i] = buf
+        return buf
+
+
+class FactorNormalSource(CorrelatedNormalSource):
+    """
+    Correlated standard normals from a factor model, for simulating large numbers of
+    assets. The shock of asset i is
+
+        eps_i = sum_j B_ij * f_j + sqrt(d_i) * e_i
+
+    with k independent standard normal factors f, loadings B of size M x k and
+    independent idiosyncratic normals e with variance d, so the correlation matrix is
+    B @ B.T + diag(d). Drawing costs O(k + M) per time step and sim rather than the
+    O(M^2) of correlating M normals with a full factor of cor.
+
+    Use from_cor to build the model from the first k principal components of a
+    correlation matrix. Can be passed as source to generate_eps_MV, simGBM_MV,
+    simOU_MV and simOUJ_MV, and is used by MVGBM and MVOU when they are given
+    factors.
+
+    Parameters
+    ----------
+    loadings : matrix-like[float]
+        Loadings B of the assets on the factors, of size M x k.
+    idio_var : array-like[float], optional
+        Idiosyncratic variance d of each asset. If None, 1 - sum_j B_ij ** 2 so that the
+        shocks have unit variance. By default None.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. By default None.
+    dtype : [float64, float32], optional
+        Type of the random numbers. By default float64.
+    reuse : bool, optional
+        Return the same buffer from every draw of the same size, overwriting the
+        previous draw. By default False.
+    block_size : int, optional
+        Number of random numbers drawn at a time. By default 2**20.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> import numpy as np
+    >>> cor = np.full((300, 300), 0.6) + 0.4 * np.eye(300)
+    >>> source = rt.FactorNormalSource.from_cor(cor, factors=3, seed=42)
+    >>> eps = rt.generate_eps_MV(cor, T=1, dt=1/252, sims=1000, source=source)
+    """
+
+    def __init__(
+        self,
+        loadings,
+        idio_var=None,
+        seed=None,
+        dtype=_np.float64,
+        reuse=False,
+        block_size=2**20,
+    ):
+        self.loadings = _np.array(loadings, dtype=float, ndmin=2)
+
+        if idio_var is None:
+            idio_var = 1 - (self.loadings**2).sum(axis=1)
+        idio_var = _np.broadcast_to(
+            _np.asarray(idio_var, dtype=float), self.loadings.shape[:1]
+        )
+
+        if _np.any(idio_var < -1e-8):
+            raise ValueError(
+                "idio_var must not be negative, without it the sum of the squared "
+                "loadings of each asset must be at most 1"
+            )
+
+        self.idio_sd = _np.sqrt(_np.clip(idio_var, 0, None))
+        self.cor = self.loadings @ self.loadings.T + _np.diag(self.idio_sd**2)
+        self.factor = None
+        self.dtype = _np.dtype(dtype)
+        self.reuse = reuse
+        self.block_size = block_size
+        self._out = None
+        self._buffers = {}
+        self.reset(seed)
+
+        if self.dtype not in [_np.float64, _np.float32]:
+            raise ValueError("dtype must be float64 or float32")
+
+    @classmethod
+    def from_cor(cls, cor, factors, **kwargs):
+        """
+        Factor model of the first principal components of a correlation matrix, with the
+        rest of the variance of each asset left to its idiosyncratic shock so that the
+        diagonal of cor is kept.
+
+        Parameters
+        ----------
+        cor : matrix-like[float]
+            Correlation matrix of size M x M.
+        factors : int
+            Number of principal components k to keep.
+        **kwargs : optional
+            Keyword arguments of FactorNormalSource, e.g. seed.
+
+        Returns
+        -------
+        FactorNormalSource
+        """
+        cor = _np.asarray(cor, dtype=float)
+        if not 0 < factors <= cor.shape[0]:
+            raise ValueError(f"factors must be between 1 and {cor.shape[0]}")
+
+        w, v = _np.linalg.eigh((cor + cor.T) / 2)
+        w, v = w[::-1][:factors], v[:, ::-1][:, :factors]
+
+        loadings = v * _np.sqrt(_np.clip(w, 0, None))
+        idio_var = _np.clip(_np.diag(cor) - (loadings**2).sum(axis=1), 0, None)
+
+        return cls(loadings, idio_var, **kwargs)
+
+    @property
+    def factors(self):
+        """Number of factors"""
+        return self.loadings.shape[1]
+
+    def reset(self, seed=None):
+        """
+        Start a new stream of random numbers from seed, keeping the buffers.
+
+        Parameters
+        ----------
+        seed : int | Generator | RandomStreams, optional
+            To pass to numpy random number generator as seed. By default None.
+        """
+        # factors and idiosyncratic shocks are drawn from their own streams so
+        # that the block size doesn't change the numbers
+        self._rng, self._rng_idio = _spawn_rngs(seed, 2)
+
+    def normal(self, N, sims, dims=None, out=None):
+        """
+        Draw correlated standard normal random numbers.
+
+        Parameters
+        ----------
+        N : int
+            Number of time steps.
+        sims : int
+            Number of simulations.
+        dims : int, optional
+            Number of assets, must be the number of rows of loadings if given. By
+            default None.
+        out : numpy array, optional
+            C contiguous array of size (N x sims x M) to write the random numbers to.
+            By default None.
+
+        Returns
+        -------
+        Array of size (N x sims x M).
+        """
+        M, k = self.loadings.shape
+        out = self._output(N, sims, dims, out)
+
+        rows = max(1, min(N, self.block_size // max(sims * M, 1)))
+        f_buf = self._scratch(rows * sims * k, out.dtype, 0)
+        e_buf = self._scratch(rows * sims * M, out.dtype, 1)
+
+        loadings = self.loadings.T.astype(out.dtype)
+        idio_sd = self.idio_sd.astype(out.dtype)
+        flat = out.reshape(N * sims, M)
+
+        for start in range(0, N, rows):
+            stop = min(start + rows, N)
+            block = flat[start * sims : stop * sims]
+
+            f = f_buf[: (stop - start) * sims * k].reshape(-1, k)
+            self._rng.standard_normal(out=f, dtype=out.dtype)
+            _np.matmul(f, loadings, out=block)
+
+            e = e_buf[: (stop - start) * sims * M].reshape(-1, M)
+            self._rng_idio.standard_normal(out=e, dtype=out.dtype)
+            e *= idio_sd
+            block += e
+
+        return out
+
+
+def _cor_factor(cor):
+    # matrix A with A @ A.T = cor for correlating independent normals, cached by
+    # the values of cor. Cholesky if cor is positive definite, else from the eigen
+    # decomposition of cor with the negative eigenvalues set to 0 and the rows
+    # scaled back to the diagonal of cor
+    cor = _np.ascontiguousarray(cor, dtype=float)
+    key = (cor.shape, cor.tobytes())
+
+    if key not in _FACTORS:
+        try:
+            factor = _np.linalg.cholesky(cor)
+        except _np.linalg.LinAlgError:
+            w, v = _np.linalg.eigh((cor + cor.T) / 2)
+
+            if w.min() < -1e-8 * max(abs(w).max(), 1):
+                _warnings.warn(
+                    "cor is not positive semi-definite, the nearest positive "
+                    "semi-definite matrix with the same diagonal is used"
+                )
+
+            factor = v * _np.sqrt(_np.clip(w, 0, None))
+            norm = _np.sqrt((factor**2).sum(axis=1))
+            scale = _np.sqrt(_np.clip(_np.diag(cor), 0, None))
+            factor *= (scale / _np.where(norm > 0, norm, 1))[:, None]
+
+        if len(_FACTORS) >= _MAX_FACTORS:
+            _FACTORS.pop(next(iter(_FACTORS)))
+
+        factor.setflags(write=False)
+        _FACTORS[key] = factor
+
+    return _FACTORS[key]
+
+
+def _bridge_plan(N):
+    # order in which the Brownian motion is built at steps 1..N after W(N),
+    # with the neighbouring points and weights of each step
+    plan = []
+    intervals = [(0, N)]
+
+    while len(intervals) > 0:
+        left, right = intervals.pop(0)
+        if right - left < 2:
+            continue
+
+        mid = (left + right) // 2
+        plan.append(
+            (
+                mid,
+                left,
+                right,
+                (right - mid) / (right - left),
+                (mid - left) / (right - left),
+                _np.sqrt((mid - left) * (right - mid) / (right - left)),
+            )
+        )
+        intervals += [(left, mid), (mid, right)]
+
+    return plan
+
+
+def brownian_bridge(z):
+    """
+    Turn standard normals into the standardized increments of Brownian motion paths
+    built with a Brownian bridge. The first normal of each path sets its end point, the
+    second the midpoint and so on, halving the intervals until every step is filled in.
+
+    Parameters
+    ----------
+    z : array-like[float]
+        Standard normals of size (N x sims) or (N x sims x M) in order of importance
+        along the first axis.
+
+    Returns
+    -------
+    Array of the same size of independent standard normal increments, one per time step,
+    to use as eps in the simulators.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> import numpy as np
+    >>> rt.brownian_bridge(np.random.normal(size=(252, 100)))
+    """
+    z = _np.asarray(z, dtype=float)
+    N = z.shape[0]
+
+    # unit time steps so that the increments are standard normal
+    w = _np.zeros((N + 1,) + z.shape[1:])
+    w[N] = _np.sqrt(N) * z[0]
+
+    for k, (mid, left, right, wl, wr, sd) in enumerate(_bridge_plan(N), start=1):
+        w[mid] = wl * w[left] + wr * w[right] + sd * z[k]
+
+    return _np.diff(w, axis=0)
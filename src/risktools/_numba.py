@@ -0,0 +1,335 @@
+# numba versions of the simulation kernels in pyx/sims.pyx, with the same
+# arguments, for environments where the cython extension can't be built.
+# The loops over the sims run in parallel on numba's threads.
+
+import numpy as _np
+import numba as _numba
+from contextlib import contextmanager as _contextmanager
+from numba import njit as _njit, prange as _prange
+
+
+@_contextmanager
+def threads(workers):
+    # number of numba threads used by the kernels called in this thread
+    old = _numba.get_num_threads()
+    _numba.set_num_threads(max(1, min(workers, _numba.config.NUMBA_NUM_THREADS)))
+    try:
+        yield
+    finally:
+        _numba.set_num_threads(old)
+
+
+@_njit(nogil=True, cache=True)
+def _ou_exact_coefs(theta, dt):
+    # exact transition of the OU process over a step of dt, see csimOU
+    a = _np.exp(-theta * dt)
+    oma = -_np.expm1(-theta * dt)
+    if theta != 0.0:
+        g = oma / theta
+        b = _np.sqrt(-_np.expm1(-2.0 * theta * dt) / (2.0 * theta))
+    else:
+        g = dt
+        b = _np.sqrt(dt)
+    return a, oma, g, b
+
+
+@_njit(nogil=True, cache=True, inline="always")
+def _ou_step(x, e, theta, mu, sigma, dt, sq, log_price, scheme, a, oma, g, b):
+    # one step of the OU process from x with random number e
+    if scheme == 1:
+        return x * a + oma * mu - 0.5 * log_price * sigma * sigma * g + sigma * b * e
+    elif log_price != 0:
+        return x + (theta * (mu - x) - 0.5 * sigma * sigma) * dt + sigma * sq * e
+    else:
+        return x + (theta * (mu - x)) * dt + sigma * sq * e
+
+
+@_njit(nogil=True, cache=True, inline="always")
+def _ouj_step(x, e, jump, theta, mu, sigma, dt, sq, jump_prob, jump_avgsize):
+    # one step of the OU jump process from x with random number e
+    return (
+        x
+        + theta * (mu - jump_prob * jump_avgsize - x) * x * dt
+        + sigma * x * e * sq
+        + jump
+    )
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOU(x, theta, mu, dt, sigma, rows, cols, log_price, scheme=0):
+    sq = _np.sqrt(dt)
+    a, oma, g, b = _ou_exact_coefs(theta, dt)
+
+    for r in _prange(rows):
+        for j in range(1, cols):
+            x[r, j] = _ou_step(
+                x[r, j - 1], x[r, j], theta, mu[r, j], sigma[r, j], dt, sq,
+                log_price, scheme, a, oma, g, b,
+            )  # fmt: skip
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOU_batch(x, theta, mu, sigma, dt, rows, cols, log_price, scheme=0):
+    sq = _np.sqrt(dt)
+
+    for r in _prange(rows):
+        a, oma, g, b = _ou_exact_coefs(theta[r], dt)
+
+        for j in range(1, cols):
+            x[r, j] = _ou_step(
+                x[r, j - 1], x[r, j], theta[r], mu[r], sigma[r], dt, sq,
+                log_price, scheme, a, oma, g, b,
+            )  # fmt: skip
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOU_MV(x, theta, mu, sigma, dt, steps, sims, assets, log_price, scheme=0):
+    sq = _np.sqrt(dt)
+    a = _np.zeros(assets)
+    oma = _np.zeros(assets)
+    g = _np.zeros(assets)
+    b = _np.zeros(assets)
+
+    for i in range(assets):
+        a[i], oma[i], g[i], b[i] = _ou_exact_coefs(theta[i], dt)
+
+    # sims are the outer (parallel) loop, see the cython kernel
+    for r in _prange(sims):
+        for j in range(1, steps + 1):
+            for i in range(assets):
+                x[j, r, i] = _ou_step(
+                    x[j - 1, r, i], x[j, r, i], theta[i], mu[j - 1, r, i],
+                    sigma[j - 1, r, i], dt, sq, log_price, scheme, a[i],
+                    oma[i], g[i], b[i],
+                )  # fmt: skip
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOUJ(
+    x, elp, ejp, theta, mu, dt, sigma, rows, cols, mr_lag, jump_prob, jump_avgsize
+):
+    sq = _np.sqrt(dt)
+
+    for r in _prange(rows):
+        lag_left = 0
+        lag_jump = 0.0
+
+        for j in range(1, cols):
+            m = mu[r, j]
+            jump = ejp[r, j] * elp[r, j]
+
+            if lag_left > 0:
+                m = m + lag_jump
+                jump = 0.0
+                lag_left = lag_left - 1
+            elif (mr_lag > 1) and (ejp[r, j] > 0.0):
+                lag_jump = jump
+                lag_left = mr_lag - 1
+
+            x[r, j] = _ouj_step(
+                x[r, j - 1], x[r, j], jump, theta, m, sigma[r, j], dt, sq,
+                jump_prob, jump_avgsize,
+            )  # fmt: skip
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOUJ_sparse(
+    x,
+    ev_ptr,
+    ev_step,
+    ev_jump,
+    theta,
+    mu,
+    dt,
+    sigma,
+    rows,
+    cols,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+):
+    sq = _np.sqrt(dt)
+
+    for r in _prange(rows):
+        k = ev_ptr[r]
+        lag_left = 0
+        lag_jump = 0.0
+
+        for j in range(1, cols):
+            m = mu[r, j]
+            jump = 0.0
+
+            if (k < ev_ptr[r + 1]) and (ev_step[k] == j):
+                jump = ev_jump[k]
+                k = k + 1
+
+            if lag_left > 0:
+                m = m + lag_jump
+                jump = 0.0
+                lag_left = lag_left - 1
+            elif (mr_lag > 1) and (jump != 0.0):
+                lag_jump = jump
+                lag_left = mr_lag - 1
+
+            x[r, j] = _ouj_step(
+                x[r, j - 1], x[r, j], jump, theta, m, sigma[r, j], dt, sq,
+                jump_prob, jump_avgsize,
+            )  # fmt: skip
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOUJ_MV(
+    x,
+    ev_ptr,
+    ev_step,
+    ev_jump,
+    theta,
+    mu,
+    dt,
+    sigma,
+    steps,
+    sims,
+    assets,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+):
+    sq = _np.sqrt(dt)
+
+    # sims are the outer (parallel) loop with the state of their assets
+    for r in _prange(sims):
+        k = ev_ptr[r * assets : (r + 1) * assets].copy()
+        lag_left = _np.zeros(assets, dtype=_np.int64)
+        lag_jump = _np.zeros(assets)
+
+        for j in range(1, steps + 1):
+            for i in range(assets):
+                n = r * assets + i
+                m = mu[j - 1, r, i]
+                jump = 0.0
+
+                if (k[i] < ev_ptr[n + 1]) and (ev_step[k[i]] == j):
+                    jump = ev_jump[k[i]]
+                    k[i] = k[i] + 1
+
+                if lag_left[i] > 0:
+                    m = m + lag_jump[i]
+                    jump = 0.0
+                    lag_left[i] = lag_left[i] - 1
+                elif (mr_lag[i] > 1) and (jump != 0.0):
+                    lag_jump[i] = jump
+                    lag_left[i] = mr_lag[i] - 1
+
+                x[j, r, i] = _ouj_step(
+                    x[j - 1, r, i], x[j, r, i], jump, theta[i], m,
+                    sigma[j - 1, r, i], dt, sq, jump_prob[i], jump_avgsize[i],
+                )  # fmt: skip
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOU_state(
+    x,
+    eps,
+    theta,
+    mu,
+    dt,
+    sigma,
+    x_sum,
+    x_min,
+    x_max,
+    x_above,
+    rows,
+    cols,
+    log_price,
+    scheme=0,
+    stats=0,
+    above=0,
+    strike=0.0,
+):
+    sq = _np.sqrt(dt)
+    a, oma, g, b = _ou_exact_coefs(theta, dt)
+
+    # time steps are rows as in the cython kernel, but each sim is
+    # independent so the sims are the outer (parallel) loop
+    for r in _prange(cols):
+        for j in range(rows):
+            x[r] = _ou_step(
+                x[r], eps[j, r], theta, mu[j, r], sigma[j, r], dt, sq,
+                log_price, scheme, a, oma, g, b,
+            )  # fmt: skip
+
+            if stats != 0:
+                x_sum[r] = x_sum[r] + x[r]
+                x_min[r] = min(x_min[r], x[r])
+                x_max[r] = max(x_max[r], x[r])
+            if (above != 0) and (x[r] > strike):
+                x_above[r] = x_above[r] + 1.0
+
+    return x
+
+
+@_njit(parallel=True, nogil=True, cache=True)
+def csimOUJ_state(
+    x,
+    eps,
+    elp,
+    ejp,
+    theta,
+    mu,
+    dt,
+    sigma,
+    lag_jump,
+    lag_left,
+    x_sum,
+    x_min,
+    x_max,
+    x_above,
+    rows,
+    cols,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+    stats=0,
+    above=0,
+    strike=0.0,
+):
+    sq = _np.sqrt(dt)
+
+    for r in _prange(cols):
+        for j in range(rows):
+            m = mu[j, r]
+            jump = ejp[j, r] * elp[j, r]
+
+            if lag_left[r] > 0:
+                m = m + lag_jump[r]
+                jump = 0.0
+                lag_left[r] = lag_left[r] - 1
+            elif (mr_lag > 1) and (ejp[j, r] > 0.0):
+                lag_jump[r] = jump
+                lag_left[r] = mr_lag - 1
+
+            x[r] = _ouj_step(
+                x[r], eps[j, r], jump, theta, m, sigma[j, r], dt, sq,
+                jump_prob, jump_avgsize,
+            )  # fmt: skip
+
+            if stats != 0:
+                x_sum[r] = x_sum[r] + x[r]
+                x_min[r] = min(x_min[r], x[r])
+                x_max[r] = max(x_max[r], x[r])
+            if (above != 0) and (x[r] > strike):
+                x_above[r] = x_above[r] + 1.0
+
+    return x
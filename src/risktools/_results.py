@@ -0,0 +1,211 @@
+# container for simulated paths
+
+import numpy as _np
+import pandas as _pd
+
+
+class SimulationResult:
+    """
+    Simulated paths held as the numpy array written by the simulators, with the time
+    step, dates, asset names and seed of the simulation. Nothing is copied until a
+    pandas object is asked for, so large simulations only pay for the conversion when
+    it is needed.
+
+    Returned by simOU, simOUJ, simGBM, simOU_MV, simOUJ_MV and simGBM_MV with
+    output='result'.
+
+    Parameters
+    ----------
+    values : array-like[float]
+        Simulated values of size (N + 1 x sims) or (N + 1 x sims x M) where N is the
+        number of time steps and M is the number of assets.
+    dt : float, optional
+        Time step of the simulation in years. By default None.
+    dates : array-like, optional
+        Labels of the N + 1 time steps, e.g. a DatetimeIndex. If None, the time steps are
+        numbered from 0. By default None.
+    names : array-like[str], optional
+        Names of the M assets. If None, the assets are numbered from 0. By default None.
+    seed : optional
+        Seed the simulation was run with. By default None.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> res = rt.simOU(sims=100_000, output="result")
+    >>> res.terminal().mean()
+    >>> res.quantiles([0.05, 0.95])
+    >>> res[:, :100].to_frame()
+    """
+
+    def __init__(self, values, dt=None, dates=None, names=None, seed=None):
+        self._values = _np.asarray(values)
+        self.dt = dt
+        self.dates = None if dates is None else _pd.Index(dates)
+        self.names = None if names is None else list(names)
+        self.seed = seed
+
+        if self._values.ndim not in [2, 3]:
+            raise ValueError(
+                "values must be of size (N + 1 x sims) or (N + 1 x sims x M)"
+            )
+        if (self.dates is not None) and (len(self.dates) != self._values.shape[0]):
+            raise ValueError(f"dates must have {self._values.shape[0]} elements")
+        if (self.names is not None) and (
+            (self._values.ndim < 3) or (len(self.names) != self._values.shape[2])
+        ):
+            raise ValueError("names must have one element per asset")
+
+    def __repr__(self):
+        return (
+            f"SimulationResult(steps={self.N}, sims={self.sims}, assets={self.assets})"
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        values = (
+            self._values if dtype is None else self._values.astype(dtype, copy=False)
+        )
+        return values.copy() if copy else values
+
+    def __len__(self):
+        return self._values.shape[0]
+
+    def __getitem__(self, key):
+        """
+        Index the values as a numpy array. Slices of the time steps and sims (and any
+        selection of assets) return a SimulationResult of the same buffer, anything else
+        a numpy array.
+        """
+        values = self._values[key]
+
+        key = key if isinstance(key, tuple) else (key,)
+        key = key + (slice(None),) * (self._values.ndim - len(key))
+
+        if (
+            (values.ndim < 2)
+            or (not isinstance(key[0], slice))
+            or (not isinstance(key[1], slice))
+        ):
+            return values
+
+        step = key[0].step or 1
+        dates = None if self.dates is None else self.dates[key[0]]
+        names = None
+        if (self.names is not None) and (values.ndim == 3):
+            names = list(_np.asarray(self.names, dtype=object)[key[2]])
+
+        return SimulationResult(
+            values,
+            dt=None if self.dt is None else self.dt * step,
+            dates=dates,
+            names=names,
+            seed=self.seed,
+        )
+
+    @property
+    def values(self):
+        """Numpy array of the simulated values, without a copy"""
+        return self._values
+
+    @property
+    def shape(self):
+        """Size of the values"""
+        return self._values.shape
+
+    @property
+    def N(self):
+        """Number of time steps, excluding time 0"""
+        return self._values.shape[0] - 1
+
+    @property
+    def sims(self):
+        """Number of simulations"""
+        return self._values.shape[1]
+
+    @property
+    def assets(self):
+        """Number of assets, 1 for univariate simulations"""
+        return self._values.shape[2] if self._values.ndim == 3 else 1
+
+    def _index(self):
+        if self.dates is not None:
+            return self.dates
+        return _pd.RangeIndex(self._values.shape[0])
+
+    def _names(self):
+        if self.names is not None:
+            return self.names
+        return list(range(self.assets))
+
+    def to_frame(self, asset=None):
+        """
+        Convert to a pandas dataframe with the time steps as rows.
+
+        Parameters
+        ----------
+        asset : int | str, optional
+            For multivariate simulations, the number or name of the asset to return. If
+            None, all assets are returned with columns as a MultiIndex of the asset and
+            the sim, which needs a copy. By default None.
+
+        Returns
+        -------
+        A pandas dataframe with the time steps as rows and the sims as columns. Univariate
+        simulations and single assets are not copied.
+        """
+        if self._values.ndim == 2:
+            return _pd.DataFrame(self._values, index=self._index(), copy=False)
+
+        if asset is not None:
+            i = self._names().index(asset) if self.names is not None else asset
+            return _pd.DataFrame(self._values[:, :, i], index=self._index(), copy=False)
+
+        values = _np.moveaxis(self._values, 2, 1).reshape(self._values.shape[0], -1)
+        columns = _pd.MultiIndex.from_product([self._names(), range(self.sims)])
+
+        return _pd.DataFrame(values, index=self._index(), columns=columns, copy=False)
+
+    def terminal(self):
+        """
+        Values at the last time step.
+
+        Returns
+        -------
+        A pandas series indexed by sim, or for multivariate simulations a pandas dataframe
+        with the sims as rows and the assets as columns.
+        """
+        last = self._values[-1]
+
+        if last.ndim == 1:
+            return _pd.Series(last, copy=False)
+        return _pd.DataFrame(last, columns=self._names(), copy=False)
+
+    def quantiles(self, q=(0.05, 0.5, 0.95)):
+        """
+        Quantiles across the sims of every time step, e.g. for fan charts.
+
+        Parameters
+        ----------
+        q : array-like[float], optional
+            Quantiles between 0 and 1. By default (0.05, 0.5, 0.95).
+
+        Returns
+        -------
+        A pandas dataframe with the time steps as rows and the quantiles (labelled P5,
+        P50 etc. as in FanAccumulator) as columns. For multivariate simulations, the
+        columns are a MultiIndex of the asset and the quantile.
+        """
+        q = list(_np.atleast_1d(q))
+        labels = [f"P{100 * p:g}" for p in q]
+        x = _np.quantile(self._values, q, axis=1)
+
+        if self._values.ndim == 2:
+            return _pd.DataFrame(x.T, index=self._index(), columns=labels)
+
+        return _pd.concat(
+            {
+                name: _pd.DataFrame(x[:, :, i].T, index=self._index(), columns=labels)
+                for i, name in enumerate(self._names())
+            },
+            axis=1,
+        )
@@ -6,10 +6,47 @@ from numpy.ctypeslib import ndpointer
 import os
 import multiprocessing as mp
 import time
+from concurrent.futures import ThreadPoolExecutor
 from numpy.random import default_rng, Generator, SFC64
 import platform
-from .extensions import csimOU as _csimOU
-from .extensions import csimOUJ as _csimOUJ
+from scipy.signal import lfilter as _lfilter
+from scipy.stats import poisson as _poisson
+from ._backends import _kernels, _resolve_backend
+from ._streams import RandomStreams, _spawn_rngs
+from ._results import SimulationResult
+
+# number of (N + 1) x sims arrays held at once by each simulator, used
+# to size the blocks of sims in the _iter generators
+_OU_ARRAYS = 2
+_OUJ_ARRAYS = 2
+
+# number of geometric gaps drawn at a time for the jump events of simOUJ,
+# doubling from the first to the last batch size so that small runs don't
+# draw more than they need. Fixed so that the events don't depend on the
+# block sizes of simOUJ_iter
+_GAP_BATCH_MIN = 2**10
+_GAP_BATCH = 2**16
+
+# discretization schemes for simOU and their codes in the compiled kernel
+_OU_SCHEMES = {"euler": 0, "exact": 1}
+
+# what the simulators return: the full paths, the terminal values only or
+# a few statistics of each path
+_KEEP = ["path", "terminal", "stats"]
+
+# parameters of a simOU_batch sweep and their defaults, as in simOU
+_BATCH_DEFAULTS = {"s0": 5, "mu": 4, "theta": 2, "sigma": 1}
+
+# how the simulators return paths
+_OUTPUT = ["frame", "array", "result"]
+
+# how simOUJ draws its jumps: a full array of jump sizes and counts for
+# every time step and sim, or only the steps that have a jump
+_JUMPS = ["sparse", "dense"]
+
+# methods of fitOU and the rows of the parameter frames of fitOU_batch
+_FIT_METHODS = ["OLS", "MLE"]
+_OU_PARAMS = ["theta", "annualized_sigma", "mu"]
 
 
 class Result:
@@ -50,12 +87,392 @@ def make_into_array(x, N):
 
     else:
         x = _np.ones(N + 1) * x
-    
 
     return x
 
 
-def simGBM(s0=10, mu=0, sigma=0.2, r=0, T=1, dt=1 / 252, sims=1000, eps=None):
+def _broadcast_param(x, N, sims):
+    """
+    Make a read-only view of size (sims x N + 1) of a scalar, time series (N) or
+    2D (N x sims) parameter for the compiled kernels. Scalars and time series
+    are broadcast with zero strides so they only take O(N) memory, and 2D
+    arrays are transposed without a copy.
+    """
+    x = _np.asarray(make_into_array(x, N), dtype=float)
+
+    if x.ndim == 1:
+        return _np.broadcast_to(x, (sims, N + 1))
+
+    return x.T
+
+
+def _ou_exact_coefs(theta, dt):
+    """
+    Coefficients of the exact OU transition over a step of dt with mu and sigma
+    held constant:
+
+        x[i] = a * x[i-1] + (1 - a) * mu - 0.5 * sigma**2 * g + sigma * b * eps
+
+    where the sigma**2 term is only used for log prices. Returns a, 1 - a, g and b.
+    Written with expm1 so that they tend to the Euler step as theta goes to 0.
+    """
+    a = _np.exp(-theta * dt)
+    oma = -_np.expm1(-theta * dt)
+
+    if theta != 0:
+        g = oma / theta
+        b = _np.sqrt(-_np.expm1(-2 * theta * dt) / (2 * theta))
+    else:
+        g = dt
+        b = _np.sqrt(dt)
+
+    return a, oma, g, b
+
+
+def _ou_terminal_moments(s0, mu, theta, sigma, dt, N, log_price=False, scheme="euler"):
+    """
+    Mean and standard deviation of an OU simulation after N steps with constant mu and
+    sigma. Both schemes step as an AR(1) process x = a * x + c + s * eps, so the terminal
+    value is normally distributed and can be sampled directly.
+    """
+    if scheme == "exact":
+        a, oma, g, b = _ou_exact_coefs(theta, dt)
+        c = oma * mu - 0.5 * sigma**2 * g * int(log_price)
+        s = sigma * b
+    else:
+        a = 1 - theta * dt
+        c = theta * mu * dt - 0.5 * sigma**2 * dt * int(log_price)
+        s = sigma * _np.sqrt(dt)
+
+    aN = a**N
+
+    if a == 1:
+        mean = s0 + c * N
+    else:
+        mean = aN * s0 + c * (1 - aN) / (1 - a)
+
+    if abs(a) == 1:
+        var = s**2 * N
+    else:
+        var = s**2 * (1 - aN**2) / (1 - a**2)
+
+    return mean, _np.sqrt(var)
+
+
+def _state_block_steps(sims):
+    # number of time steps of random numbers drawn at once when only the
+    # running state of each sim is kept, about 16MB of float64
+    return max(1, 2**21 // max(sims, 1))
+
+
+def _init_stats(x, keep, strike=None):
+    # running sum, min and max of each path, starting from time 0, and the
+    # number of time steps above strike
+    x_above = _np.zeros(x.shape[0] if (keep == "stats") & (strike is not None) else 0)
+    if keep == "stats":
+        return x.copy(), x.copy(), x.copy(), x_above
+    return _np.zeros(0), _np.zeros(0), _np.zeros(0), x_above
+
+
+def _state_output(
+    x, x_sum, x_min, x_max, N, keep, x_above=None, s0=None, strike=None, barrier=None
+):
+    if keep == "terminal":
+        return _pd.Series(x)
+
+    out = _pd.DataFrame(
+        {"terminal": x, "mean": x_sum / (N + 1), "min": x_min, "max": x_max}
+    )
+
+    if strike is not None:
+        # undiscounted payoffs of options on each path. The average of asian
+        # options is over the N time steps, excluding s0
+        avg = (x_sum - s0) / N
+        out["above"] = x_above / N
+        out["call"] = _np.maximum(x - strike, 0)
+        out["put"] = _np.maximum(strike - x, 0)
+        out["asian_call"] = _np.maximum(avg - strike, 0)
+        out["asian_put"] = _np.maximum(strike - avg, 0)
+
+    if barrier is not None:
+        # barriers above s0 are hit from below and barriers below s0 from above
+        if barrier > s0:
+            out["barrier_hit"] = x_max >= barrier
+        else:
+            out["barrier_hit"] = x_min <= barrier
+
+    return out
+
+
+def _path_output(s, output, dt=None, seed=None):
+    # (N + 1 x sims) paths as a dataframe, the array itself or a SimulationResult
+    if output == "array":
+        return s
+    if output == "result":
+        return SimulationResult(s, dt=dt, seed=seed)
+    return _pd.DataFrame(s, copy=False)
+
+
+def _keep_output(s, output, dtype=None):
+    # series or dataframe of keep='terminal' or 'stats' as is or as a numpy array
+    if output == "array":
+        return s.to_numpy(dtype=_np.float64 if dtype is None else dtype)
+    if output == "result":
+        raise ValueError("output='result' needs keep='path'")
+    return s if dtype is None else s.astype(dtype)
+
+
+def _ou_state_np(
+    x,
+    eps,
+    theta,
+    mu,
+    dt,
+    sigma,
+    x_sum,
+    x_min,
+    x_max,
+    x_above,
+    rows,
+    cols,
+    log_price,
+    scheme=0,
+    stats=0,
+    above=0,
+    strike=0.0,
+):
+    # numpy version of the csimOU_state kernel, vectorized over the sims
+    sq = _np.sqrt(dt)
+
+    if scheme == 1:
+        a, oma, g, b = _ou_exact_coefs(theta, dt)
+
+    for j in range(rows):
+        if scheme == 1:
+            x[:] = (
+                x * a
+                + oma * mu[j]
+                - 0.5 * log_price * sigma[j] * sigma[j] * g
+                + sigma[j] * b * eps[j]
+            )
+        elif log_price != 0:
+            x[:] = (
+                x
+                + (theta * (mu[j] - x) - 0.5 * sigma[j] * sigma[j]) * dt
+                + sigma[j] * sq * eps[j]
+            )
+        else:
+            x[:] = x + (theta * (mu[j] - x)) * dt + sigma[j] * sq * eps[j]
+
+        if stats != 0:
+            x_sum += x
+            _np.minimum(x_min, x, out=x_min)
+            _np.maximum(x_max, x, out=x_max)
+        if above != 0:
+            x_above += x > strike
+
+    return x
+
+
+def _ouj_state_np(
+    x,
+    eps,
+    elp,
+    ejp,
+    theta,
+    mu,
+    dt,
+    sigma,
+    lag_jump,
+    lag_left,
+    x_sum,
+    x_min,
+    x_max,
+    x_above,
+    rows,
+    cols,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+    stats=0,
+    above=0,
+    strike=0.0,
+):
+    # numpy version of the csimOUJ_state kernel, vectorized over the sims
+    sq = _np.sqrt(dt)
+
+    for j in range(rows):
+        # a jump raises the mean reversion level for mr_lag - 1 steps and
+        # no other jump can happen in that time
+        lagged = lag_left > 0
+        m = _np.where(lagged, mu[j] + lag_jump, mu[j])
+        jump = _np.where(lagged, 0.0, ejp[j] * elp[j])
+
+        lag_left[lagged] -= 1
+        if mr_lag > 1:
+            new = ~lagged & (ejp[j] > 0)
+            lag_jump[new] = jump[new]
+            lag_left[new] = mr_lag - 1
+
+        x[:] = (
+            x
+            + theta * (m - jump_prob * jump_avgsize - x) * x * dt
+            + sigma[j] * x * eps[j] * sq
+            + jump
+        )
+
+        if stats != 0:
+            x_sum += x
+            _np.minimum(x_min, x, out=x_min)
+            _np.maximum(x_max, x, out=x_max)
+        if above != 0:
+            x_above += x > strike
+
+    return x
+
+
+def _antithetic(draw, size, axis=-1):
+    """
+    Draws random numbers with draw(size=...) for the first half of the sims along axis
+    and mirrors them (times -1) for the second half. With an odd number of sims the
+    last mirrored sim is dropped.
+    """
+    size = list(size)
+    n = size[axis]
+    size[axis] = (n + 1) // 2
+
+    z = draw(size=tuple(size))
+    z = _np.concatenate((z, -z), axis=axis)
+
+    return _np.take(z, _np.arange(n), axis=axis)
+
+
+def _normal(rng, size, antithetic=False, axis=-1):
+    # standard normals, antithetic along the sims axis if asked
+    if antithetic:
+        return _antithetic(rng.normal, size, axis)
+    return rng.normal(size=size)
+
+
+def _make_rng(seed):
+    # an existing generator is used as is so that consecutive blocks of
+    # sims can be drawn from the same stream
+    if isinstance(seed, Generator):
+        return seed
+    if isinstance(seed, RandomStreams):
+        return seed.generator()
+    return Generator(SFC64(seed))
+
+
+def _resolve_workers(workers, sims):
+    # number of threads to use, -1 means all available cores
+    if workers is None:
+        return 1
+    workers = int(workers)
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, sims))
+
+
+def _run_by_sims(fun, sims, workers=1, backend=None):
+    """
+    Run fun(start, stop) over contiguous blocks of simulations. If more than
+    one worker is requested the blocks are run on a thread pool. The compiled
+    kernels release the GIL so the blocks run in parallel, and since every
+    sim is stepped by the same code the results do not depend on the number
+    of workers. Kernels of parallel backends (numba) run all the sims at once
+    on their own threads instead, and the numpy engines run on one thread.
+    """
+    if backend == "numpy":
+        workers = 1
+    workers = _resolve_workers(workers, sims)
+
+    if (backend is not None) and (backend != "numpy"):
+        kernels = _kernels(backend)
+        if kernels.parallel:
+            with kernels.threads(workers):
+                fun(0, sims)
+            return
+
+    if workers == 1:
+        fun(0, sims)
+        return
+
+    bounds = _np.linspace(0, sims, workers + 1).astype(int)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(fun, start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        for f in futures:
+            f.result()
+
+
+def plan_sim_chunks(N, sims, chunk_sims=None, max_bytes=2**30, arrays=4, itemsize=8):
+    """
+    Split a simulation into contiguous blocks of sims that each fit in a memory budget.
+
+    Parameters
+    ----------
+    N : int
+        Number of time steps in the simulation, excluding time 0.
+    sims : int
+        Total number of simulations to run.
+    chunk_sims : int, optional
+        Number of simulations per block. If None, the largest block that fits in max_bytes
+        is used. By default None.
+    max_bytes : int, optional
+        Memory budget in bytes for a single block. By default 1 GiB.
+    arrays : int, optional
+        Number of (N + 1) x sims arrays the simulator holds at once. By default 4.
+    itemsize : int, optional
+        Size in bytes of each value. By default 8 (float64).
+
+    Returns
+    -------
+    List of (start, stop) tuples of simulation numbers for each block.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.plan_sim_chunks(N=504, sims=200_000, max_bytes=100_000_000)
+    """
+    if chunk_sims is None:
+        bytes_per_sim = arrays * (N + 1) * itemsize
+        chunk_sims = int(max_bytes // bytes_per_sim)
+
+    chunk_sims = max(1, int(chunk_sims))
+
+    return [(i, min(i + chunk_sims, sims)) for i in range(0, sims, chunk_sims)]
+
+
+def _slice_sims(x, start, stop):
+    # take the columns of a 2D (periods x sims) parameter array that belong
+    # to a block of sims. Scalars and time series are shared by all blocks.
+    if is_iterable(x) and (_np.ndim(x) == 2) and (_np.shape(x)[1] >= 2):
+        return _np.asarray(x)[:, start:stop]
+    return x
+
+
+def simGBM(
+    s0=10,
+    mu=0,
+    sigma=0.2,
+    r=0,
+    T=1,
+    dt=1 / 252,
+    sims=1000,
+    eps=None,
+    dtype="float64",
+    output="frame",
+    keep="path",
+    antithetic=False,
+    source=None,
+    seed=None,
+    strike=None,
+    barrier=None,
+):
     """
     Simulates a Geometric Brownian Motion stochastic process (random walk)
 
@@ -80,35 +497,170 @@ def simGBM(s0=10, mu=0, sigma=0.2, r=0, T=1, dt=1 / 252, sims=1000, eps=None):
     eps : numpy array
         Random numbers to use for the returns. If provided, mu and sigma are ignored.
         Must of size (p x sims) where p is the number of periods in T/dt.
+    dtype : ['float64', 'float32']
+        Floating point type of the simulated values. float32 halves the memory of large
+        simulations. By default float64.
+    output : ['frame', 'array', 'result']
+        Return a pandas dataframe, the underlying numpy array or a SimulationResult, none of
+        which copy the simulated values. 'result' is only used with keep='path'. By default
+        'frame'.
+    keep : ['path', 'terminal', 'stats']
+        What to return. 'path' returns every time step. 'terminal' returns only the value at T,
+        sampled directly from its lognormal distribution if eps is not provided. 'stats' returns
+        the terminal, mean, min and max of each path (including s0) without holding the full
+        paths in memory. By default 'path'.
+    antithetic : bool
+        Use antithetic variates. Only half of the random numbers are drawn and the other half
+        of the sims use them mirrored around mu, which lowers the standard error of estimates
+        that are monotonic in the returns. Not used if eps is provided. By default False.
+    source : NormalSource, optional
+        Source of the standard normal random numbers, e.g. a SobolNormalSource for
+        quasi-Monte Carlo. If None, numpy's global random number generator is used. Not
+        used if eps is provided. By default None.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator (SFC64) as seed. If None, numpy's global
+        random state is used so that np.random.seed applies. By default None.
+    strike : float, optional
+        Only used with keep='stats'. Adds the undiscounted payoffs of options on each path,
+        computed while the paths are stepped: 'call' and 'put' on the terminal value,
+        'asian_call' and 'asian_put' on the average of the N time steps (excluding s0), and
+        'above', the fraction of the N time steps above strike. By default None.
+    barrier : float, optional
+        Only used with keep='stats'. Adds 'barrier_hit', whether each path reached the
+        barrier (from below if the barrier is above s0, otherwise from above) at any time
+        step. By default None.
 
     Returns
     -------
-    A list of simulated values
+    A pandas dataframe (or numpy array) with the time steps as rows and the simulations
+    as columns. For keep='terminal', a pandas series (or 1D array) of the terminal values
+    and for keep='stats', a pandas dataframe (or 2D array) with the sims as rows and the
+    terminal, mean, min and max as columns.
 
     Examples
     --------
     >>> import risktools as rt
     >>> rt.simGBM(s0=5, mu=0, sigma=0.2, r=0.01, T=2, dt=1/252, sims=1000)
+    >>> rt.simGBM(s0=5, sims=1_000_000, dtype="float32", output="array")
+    >>> rt.simGBM(s0=5, sims=1_000_000, keep="terminal")
+    >>> rt.simGBM(s0=5, sims=2**14, source=rt.SobolNormalSource())
     """
+    if output not in _OUTPUT:
+        raise ValueError(f"output must be one of {_OUTPUT}")
+    if keep not in _KEEP:
+        raise ValueError(f"keep must be one of {_KEEP}")
+
+    if (source is not None) & (eps is None):
+        eps = mu + source.normal(int(T / dt), sims)
+
+    if keep != "path":
+        s = _simGBM_state(
+            s0,
+            mu,
+            sigma,
+            r,
+            T,
+            dt,
+            sims,
+            eps,
+            dtype,
+            keep,
+            antithetic,
+            seed,
+            strike,
+            barrier,
+        )
+
+        return _keep_output(s, output, dtype)
 
     periods = int(T / dt)
-    s = _np.zeros((periods + 1, sims))
-    s = _pd.DataFrame(data=s)
 
     if eps is None:
-        eps = _np.random.normal(mu, 1, size=(periods, sims))
+        rng = _np.random if seed is None else _make_rng(seed)
+        eps = mu + _normal(rng, (periods, sims), antithetic)
+    else:
+        eps = _np.asarray(eps)
+        periods, sims = eps.shape
+
+    # log returns are written into a single buffer and then summed and
+    # exponentiated in place, so that no other arrays of the size of the
+    # simulation are created
+    s = _np.empty((periods + 1, sims), dtype=dtype)
+    s[0, :] = 0
 
-    s.iloc[0, :] = s0
-    s.iloc[1:, :] = eps
+    _np.multiply(eps, sigma * _np.sqrt(dt), out=s[1:, :], casting="same_kind")
+    s[1:, :] += (r - sigma**2 / 2) * dt
 
     # calc geometric brownian motion
-    s.loc[1:, :] = _np.exp(
-        (r - sigma**2 / 2) * dt + sigma * _np.sqrt(dt) * s.loc[1:, :]
-    )
+    _np.cumsum(s, axis=0, out=s)
+    _np.exp(s, out=s)
+    s *= s0
 
-    s = s.cumprod()
+    return _path_output(s, output, dt, seed)
 
-    return s
+
+def _simGBM_state(
+    s0,
+    mu,
+    sigma,
+    r,
+    T,
+    dt,
+    sims,
+    eps,
+    dtype,
+    keep,
+    antithetic=False,
+    seed=None,
+    strike=None,
+    barrier=None,
+):
+    # simGBM keeping only the current log value (and running statistics) of each sim
+    drift = (r - sigma**2 / 2) * dt
+    vol = sigma * _np.sqrt(dt)
+    rng = _np.random if seed is None else _make_rng(seed)
+
+    if eps is None:
+        N = int(T / dt)
+
+        if keep == "terminal":
+            # the sum of N normal returns with mean mu and unit variance
+            z = mu * N + _np.sqrt(N) * _normal(rng, (sims,), antithetic)
+            return _pd.Series(s0 * _np.exp(drift * N + vol * z))
+    else:
+        eps = _np.asarray(eps)
+        N, sims = eps.shape
+
+    x = _np.zeros(sims)
+    x_sum, x_min, x_max, x_above = _init_stats(_np.full(sims, float(s0)), keep, strike)
+    steps = _state_block_steps(sims)
+
+    for j in range(0, N, steps):
+        k = min(j + steps, N)
+
+        if eps is None:
+            e = mu + _normal(rng, (k - j, sims), antithetic)
+        else:
+            e = eps[j:k].astype(float)
+
+        e *= vol
+        e += drift
+        _np.cumsum(e, axis=0, out=e)
+        e += x
+        x = e[-1].copy()
+
+        if keep == "stats":
+            # exp is increasing, so the extremes can be taken on the log values
+            x_min = _np.minimum(x_min, s0 * _np.exp(e.min(axis=0)))
+            x_max = _np.maximum(x_max, s0 * _np.exp(e.max(axis=0)))
+            _np.exp(e, out=e)
+            x_sum += s0 * e.sum(axis=0)
+            if strike is not None:
+                x_above += (e > strike / s0).sum(axis=0)
+
+    return _state_output(
+        s0 * _np.exp(x), x_sum, x_min, x_max, N, keep, x_above, s0, strike, barrier
+    )
 
 
 def _import_csimOU():
@@ -146,6 +698,16 @@ def simOU(
     seed=None,
     log_price=False,
     c=True,
+    workers=1,
+    scheme="euler",
+    keep="path",
+    fan=None,
+    antithetic=False,
+    source=None,
+    backend=None,
+    output="frame",
+    strike=None,
+    barrier=None,
 ):
     """
     Function for calculating an Ornstein-Uhlenbeck Mean Reversion stochastic process (random walk) with multiple
@@ -188,53 +750,208 @@ def simOU(
         Random numbers to use for the returns. If provided, mu, sigma, T, dt and sims are ignored.
         Must of size (p x sims) where p is the number of periods in T, i.e. int(T/dt).
         Excludes time 0.
-    seed : int
-        To pass to numpy random number generator as seed. For testing only.
+    seed : int | Generator | RandomStreams
+        To pass to numpy random number generator as seed. For testing only. A numpy Generator
+        or RandomStreams can also be passed in which case random numbers are drawn from it
+        directly.
     log_price : bool
         Adds adjustment term to the mean reversion term if the prices passed are log prices. By
         default False.
     c : bool
-        Whether or not to run C optimized code. By default True. Otherwise use python loop.
+        Whether or not to run compiled code. By default True. Otherwise use the numpy engine.
+    workers : int
+        Number of threads to split the simulations across. -1 uses all available cores.
+        The random numbers are drawn from seed before the simulations are split, so results
+        are identical for any number of workers. Only used by the compiled backends.
+        By default 1.
+    scheme : ['euler', 'exact']
+        Discretization of the process. 'euler' uses an Euler step which needs theta * dt to be
+        small to be accurate. 'exact' uses the closed-form OU transition mean and variance over
+        each step, holding mu and sigma constant within the step, so it is unbiased for any dt
+        and allows coarse (weekly, monthly) time grids. By default 'euler'.
+    keep : ['path', 'terminal', 'stats']
+        What to return. 'path' returns every time step. 'terminal' returns only the value at T
+        and 'stats' the terminal, mean, min and max of each path (including s0). Both only hold
+        the current value of each sim so memory is O(sims) rather than O(N * sims). With scalar
+        mu and sigma and no eps, 'terminal' samples the terminal distribution directly without
+        stepping. Random numbers are drawn a time step at a time, so seeded results differ from
+        'path'. By default 'path'.
+    fan : FanAccumulator, optional
+        If given, the simulation is run in blocks of sims (as in simOU_iter) that are added
+        to fan instead of being returned, so that the per time step quantiles of very large
+        runs can be calculated in bounded memory. keep must be 'path'. By default None.
+    antithetic : bool, optional
+        Use antithetic variates. Only half of the random numbers are drawn and the other half
+        of the sims use them times -1, which lowers the standard error of estimates that are
+        monotonic in the shocks. Not used if eps is provided. By default False.
+    source : NormalSource, optional
+        Source of the standard normal random numbers, e.g. a SobolNormalSource for
+        quasi-Monte Carlo. The random numbers for all time steps and sims are drawn at
+        once and used as eps. If None, numpy's SFC64 generator is used with seed. Not used
+        if eps is provided. By default None.
+    backend : ['cython', 'numba', 'numpy'], optional
+        Engine that runs the simulation, see available_backends. If None, the backend from
+        get_backend is used, or 'numpy' if c is False. The compiled backends ('cython' and
+        'numba') give the same results for the same seed. By default None.
+    output : ['frame', 'array', 'result']
+        Return a pandas dataframe, the underlying numpy array or a SimulationResult, none of
+        which copy the simulated values. 'result' is only used with keep='path'. By default
+        'frame'.
+    strike : float, optional
+        Only used with keep='stats'. Adds the undiscounted payoffs of options on each path,
+        computed while the paths are stepped: 'call' and 'put' on the terminal value,
+        'asian_call' and 'asian_put' on the average of the N time steps (excluding s0), and
+        'above', the fraction of the N time steps above strike. By default None.
+    barrier : float, optional
+        Only used with keep='stats'. Adds 'barrier_hit', whether each path reached the
+        barrier (from below if the barrier is above s0, otherwise from above) at any time
+        step. By default None.
 
     Returns
     -------
-    A pandas dataframe with the time steps as rows and the number of simulations as columns
+    A pandas dataframe (or numpy array or SimulationResult, see output) with the time steps as
+    rows and the number of simulations as columns.
+    For keep='terminal', a pandas series (or 1D array) of the terminal values and for
+    keep='stats', a pandas dataframe (or 2D array) with the sims as rows and the statistics
+    as columns. If fan is given, the summary of fan (see FanAccumulator.summary).
 
     Examples
     --------
     >>> import risktools as rt
     >>> rt.simOU()
+    >>> rt.simOU(sims=200_000, T=2, workers=-1)
+    >>> rt.simOU(theta=20, T=5, dt=1/12, scheme="exact")
+    >>> rt.simOU(sims=1_000_000, T=2, keep="terminal")
+    >>> rt.simOU(sims=1_000_000, T=2, fan=rt.FanAccumulator())
     """
-    if eps is not None:
-        sims = eps.shape[1]
+    backend = _resolve_backend(backend, c)
 
-    # number of business days in a year
-    bdays_in_year = 252
+    if output not in _OUTPUT:
+        raise ValueError(f"output must be one of {_OUTPUT}")
+    if (fan is not None) & (keep != "path"):
+        raise ValueError("keep must be 'path' if fan is used")
 
-    # calc periods
-    N = int(T / dt)
+    if (source is not None) & (eps is None):
+        eps = source.normal(int(T / dt), sims)
 
-    # print half-life of theta
-    print("Half-life of theta in days = ", _np.log(2) / theta * bdays_in_year)
+    if (fan is not None) & (eps is None):
+        chunks = _simOU_iter(
+            s0,
+            mu,
+            theta,
+            sigma,
+            T,
+            dt,
+            sims,
+            None,
+            2**30,
+            seed,
+            log_price,
+            backend,
+            workers,
+            scheme,
+            antithetic,
+        )
+        for df in chunks:
+            fan.update(df)
 
-    # make mu array
-    mu = make_into_array(mu, N)
-    sigma = make_into_array(sigma, N)
+        return fan.summary()
 
-    # make same size as 1D array of all periods and sims
-    if len(mu.shape) == 1:
-        mu = _np.tile(_np.array(mu), sims)
-    else:
-        mu = mu.flatten("F")
-    
+    s = _simOU(
+        s0=s0,
+        mu=mu,
+        theta=theta,
+        sigma=sigma,
+        T=T,
+        dt=dt,
+        sims=sims,
+        eps=eps,
+        seed=seed,
+        log_price=log_price,
+        backend=backend,
+        workers=workers,
+        scheme=scheme,
+        keep=keep,
+        antithetic=antithetic,
+        strike=strike,
+        barrier=barrier,
+    )
 
-    # Don't run if 2D array passed for sigma
-    if len(sigma.shape) == 1:
-        sigma = _np.tile(_np.array(sigma), sims)
-    else:
-        sigma = sigma.flatten("F")
+    if fan is not None:
+        return fan.update(s).summary()
+
+    if keep != "path":
+        return _keep_output(s, output)
+
+    return _path_output(s, output, dt, seed)
+
+
+def _simOU(
+    s0,
+    mu,
+    theta,
+    sigma,
+    T,
+    dt,
+    sims,
+    eps,
+    seed,
+    log_price,
+    backend=None,
+    workers=1,
+    scheme="euler",
+    keep="path",
+    antithetic=False,
+    strike=None,
+    barrier=None,
+    N=None,
+):
+    # N is the number of time steps, by default int(T / dt)
+    backend = _resolve_backend(backend)
+
+    if scheme not in _OU_SCHEMES:
+        raise ValueError(f"scheme must be one of {list(_OU_SCHEMES)}")
+    if keep not in _KEEP:
+        raise ValueError(f"keep must be one of {_KEEP}")
+
+    if keep != "path":
+        return _simOU_state(
+            s0,
+            mu,
+            theta,
+            sigma,
+            T,
+            dt,
+            sims,
+            eps,
+            seed,
+            log_price,
+            backend,
+            workers,
+            scheme,
+            keep,
+            antithetic,
+            strike,
+            barrier,
+        )
+
+    if eps is not None:
+        sims = eps.shape[1]
+
+    # calc periods
+    if N is None:
+        N = int(T / dt)
 
-    if c == True:
+    if (eps is None) & antithetic:
+        # drawn sim by sim as in _simOUc
+        eps = _normal(_make_rng(seed), (sims, N), antithetic, axis=0).T
+
+    # make (sims x N + 1) views of mu and sigma. Scalars and time series
+    # are broadcast rather than copied for every sim
+    mu = _broadcast_param(mu, N, sims)
+    sigma = _broadcast_param(sigma, N, sims)
+
+    if backend != "numpy":
         return _simOUc(
             s0=s0,
             mu=mu,
@@ -246,6 +963,9 @@ def simOU(
             eps=eps,
             seed=seed,
             log_price=log_price,
+            workers=workers,
+            scheme=scheme,
+            backend=backend,
         )
     else:
         return _simOUpy(
@@ -259,25 +979,114 @@ def simOU(
             eps=eps,
             seed=seed,
             log_price=log_price,
+            scheme=scheme,
         )
 
 
-def _simOUc(s0, theta, mu, dt, sigma, T, sims=10, eps=None, seed=None, log_price=False):
-    # calc periods
-    N = int(T / dt)
+def _simOU_state(
+    s0,
+    mu,
+    theta,
+    sigma,
+    T,
+    dt,
+    sims,
+    eps,
+    seed,
+    log_price,
+    backend,
+    workers,
+    scheme,
+    keep,
+    antithetic=False,
+    strike=None,
+    barrier=None,
+):
+    # simOU keeping only the current value (and running statistics) of each sim
+    if eps is not None:
+        eps = _np.asarray(eps, dtype=float)
+        N, sims = eps.shape
+    else:
+        N = int(T / dt)
+        rng = _make_rng(seed)
+
+        if (keep == "terminal") & (not is_iterable(mu)) & (not is_iterable(sigma)):
+            mean, sd = _ou_terminal_moments(
+                s0, mu, theta, sigma, dt, N, log_price, scheme
+            )
+            return _pd.Series(mean + sd * _normal(rng, (sims,), antithetic))
+
+    # (N + 1) x sims views of mu and sigma
+    mu = _broadcast_param(mu, N, sims).T
+    sigma = _broadcast_param(sigma, N, sims).T
+
+    x = _np.full(sims, float(s0))
+    x_sum, x_min, x_max, x_above = _init_stats(x, keep, strike)
+
+    kernel = _ou_state_np if backend == "numpy" else _kernels(backend).simOU_state
+    steps = _state_block_steps(sims)
+
+    for j in range(1, N + 1, steps):
+        k = min(j + steps, N + 1)
+        if eps is None:
+            e = _normal(rng, (k - j, sims), antithetic)
+        else:
+            e = eps[j - 1 : k - 1]
+
+        def run(start, stop):
+            kernel(
+                x[start:stop],
+                e[:, start:stop],
+                theta,
+                mu[j:k, start:stop],
+                dt,
+                sigma[j:k, start:stop],
+                x_sum[start:stop],
+                x_min[start:stop],
+                x_max[start:stop],
+                x_above[start:stop],
+                rows=k - j,
+                cols=stop - start,
+                log_price=int(log_price),
+                scheme=_OU_SCHEMES[scheme],
+                stats=int(keep == "stats"),
+                above=int(x_above.shape[0] > 0),
+                strike=0.0 if strike is None else strike,
+            )
+
+        _run_by_sims(run, sims, workers, backend)
+
+    return _state_output(x, x_sum, x_min, x_max, N, keep, x_above, s0, strike, barrier)
+
+
+def _simOUc(
+    s0,
+    theta,
+    mu,
+    dt,
+    sigma,
+    T,
+    sims=10,
+    eps=None,
+    seed=None,
+    log_price=False,
+    workers=1,
+    scheme="euler",
+    backend="cython",
+):
+    # calc periods from the (sims x N + 1) mu
+    N = mu.shape[1] - 1
 
     # check on random number size
     if (N + 1) * sims > 200_000_000:
         import warnings
 
-        warnings.warn(
-            """
+        warnings.warn("""
             Note that this simulation will generate more than
             200M random numbers which may crash the python kernel. It may
-            be a better idea to split the simulation into a series of smaller
-            sims and then join them after.
-            """
-        )
+            be a better idea to run it in bounded memory in chunks of
+            sims using simOU_iter.
+            """)
 
     # generate a 1D array of random numbers that is based on a
     # 2D array of size P x S where P is the number of time steps
@@ -286,7 +1095,7 @@ def _simOUc(s0, theta, mu, dt, sigma, T, sims=10, eps=None, seed=None, log_price
     # part.
     if eps is None:
         # rng = default_rng(seed)
-        rng = Generator(SFC64(seed))
+        rng = _make_rng(seed)
         x = rng.normal(loc=0, scale=1, size=((N + 1) * sims))
         x[0] = s0
         x[:: (N + 1)] = s0
@@ -295,62 +1104,346 @@ def _simOUc(s0, theta, mu, dt, sigma, T, sims=10, eps=None, seed=None, log_price
         x = _np.c_[_np.ones(sims) * s0, x]
         x = x.reshape((N + 1) * sims)
 
-    x = _csimOU(
-        x, theta, mu, dt, sigma, rows=sims, cols=N + 1, log_price=int(log_price)
-    )
-
-    return _pd.DataFrame(x.reshape((sims, N + 1)).T)
-
-
-def _simOUpy(
-    s0, mu, theta, sigma, T, dt, sims=1000, eps=None, seed=None, log_price=False
-):
+    x = x.reshape((sims, N + 1))
 
-    # number of periods dt in T
-    N = int(T / dt)
+    kernels = _kernels(backend)
 
-    mu = mu.reshape((sims, N + 1)).T
-    sigma = sigma.reshape((sims, N + 1)).T
+    def run(start, stop):
+        kernels.simOU(
+            x[start:stop],
+            theta,
+            mu[start:stop],
+            dt,
+            sigma[start:stop],
+            rows=stop - start,
+            cols=N + 1,
+            log_price=int(log_price),
+            scheme=_OU_SCHEMES[scheme],
+        )
 
-    mu = _pd.DataFrame(mu)
-    sigma = _pd.DataFrame(sigma)
+    _run_by_sims(run, sims, workers, backend)
 
-    # init df with zeros, rows are steps forward in time, columns are simulations
-    out = _np.zeros((N + 1, sims))
-    out = _pd.DataFrame(data=out)
+    return x.T
 
-    # set first row as starting value of sim
-    out.loc[0, :] = s0
 
-    # calc gaussian vector
+def _simOUpy(
+    s0,
+    mu,
+    theta,
+    sigma,
+    T,
+    dt,
+    sims=1000,
+    eps=None,
+    seed=None,
+    log_price=False,
+    scheme="euler",
+):
+
+    # number of periods dt in T, from the (sims x N + 1) mu
+    N = mu.shape[1] - 1
+
+    # (N + 1 x sims) views, rows are steps forward in time, columns are simulations
+    mu = mu.T
+    sigma = sigma.T
+
+    # calc gaussian vector
     if eps is None:
-        # rng = default_rng(seed)
-        rng = Generator(SFC64(seed))
+        rng = _make_rng(seed)
         eps = rng.normal(size=(N, sims))
 
-    out.iloc[1:, :] = eps
+    eps = _np.asarray(eps, dtype=float)
 
-    if log_price:
-        ss = 0.5 * sigma * sigma
-        for i in range(1, N + 1):
-            # calc step
-            out.iloc[i, :] = (
-                out.iloc[i - 1, :]
-                + (theta * (mu.iloc[i, :] - out.iloc[i - 1, :]) - ss.iloc[i, :]) * dt
-                + sigma.iloc[i, :] * out.iloc[i, :] * _np.sqrt(dt)
-            )
+    # both schemes step as the AR(1) process x[i] = a * x[i-1] + u[i] where
+    # u holds everything that does not depend on x, so u is computed for all
+    # steps and sims at once and the recursion is run as a linear filter
+    if scheme == "exact":
+        a, oma, g, b = _ou_exact_coefs(theta, dt)
+        u = oma * mu[1:] + sigma[1:] * b * eps
+        if log_price:
+            u -= 0.5 * sigma[1:] * sigma[1:] * g
     else:
-        for i in range(1, N + 1):
-            # calc step
-            out.iloc[i, :] = (
-                out.iloc[i - 1, :]
-                + (theta * (mu.iloc[i, :] - out.iloc[i - 1, :])) * dt
-                + sigma.iloc[i, :] * out.iloc[i, :] * _np.sqrt(dt)
-            )
+        a = 1 - theta * dt
+        u = theta * mu[1:] * dt + sigma[1:] * _np.sqrt(dt) * eps
+        if log_price:
+            u -= 0.5 * sigma[1:] * sigma[1:] * dt
+
+    out = _np.empty((N + 1, sims))
+    out[0] = s0
+    out[1:], _ = _lfilter(
+        [1.0], [1.0, -a], u, axis=0, zi=_np.full((1, sims), a * out[0])
+    )
 
     return out
 
 
+def simOU_iter(
+    s0=5,
+    mu=4,
+    theta=2,
+    sigma=1,
+    T=1,
+    dt=1 / 252,
+    sims=1000,
+    chunk_sims=None,
+    max_bytes=2**30,
+    seed=None,
+    log_price=False,
+    c=True,
+    workers=1,
+    scheme="euler",
+    antithetic=False,
+    backend=None,
+):
+    """
+    Generator version of simOU that yields the simulation in contiguous blocks of sims
+    so that very large runs can be processed in bounded memory.
+
+    Random numbers for each block are drawn in turn from a single stream, so with a compiled
+    backend joining the blocks gives exactly the same result as simOU with the same seed, regardless
+    of the block size.
+
+    Parameters
+    ----------
+    s0, mu, theta, sigma, T, dt, log_price, c, workers, scheme, antithetic, backend
+        See simOU. 2D arrays for mu and sigma must be of size (p x sims) and are split by
+        block of sims. Antithetic pairs are formed within each block.
+    sims : int
+        Total number of simulations to run. By default 1000.
+    chunk_sims : int, optional
+        Number of simulations per block. If None, the block size is picked from max_bytes.
+        By default None.
+    max_bytes : int, optional
+        Memory budget in bytes for a single block. Only used if chunk_sims is None.
+        By default 1 GiB.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. The blocks draw in sim order from
+        the one stream of seed rather than from a child stream each (see RandomStreams),
+        which is what makes them match simOU for any block size. The trade-off is that a
+        block can't be drawn on its own or in parallel with the other blocks. workers split
+        the stepping of each block, not its draws.
+
+    Yields
+    ------
+    A pandas dataframe for each block with the time steps as rows and the simulations as
+    columns. Columns are labelled with the simulation number within the whole run.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> for df in rt.simOU_iter(sims=1_000_000, T=2, max_bytes=500_000_000):
+    ...     df.iloc[-1].mean()
+    """
+    backend = _resolve_backend(backend, c)
+
+    yield from _simOU_iter(
+        s0,
+        mu,
+        theta,
+        sigma,
+        T,
+        dt,
+        sims,
+        chunk_sims,
+        max_bytes,
+        seed,
+        log_price,
+        backend,
+        workers,
+        scheme,
+        antithetic,
+    )
+
+
+def _simOU_iter(
+    s0,
+    mu,
+    theta,
+    sigma,
+    T,
+    dt,
+    sims,
+    chunk_sims,
+    max_bytes,
+    seed,
+    log_price,
+    backend,
+    workers,
+    scheme,
+    antithetic=False,
+):
+    N = int(T / dt)
+    rng = _make_rng(seed)
+
+    for start, stop in plan_sim_chunks(
+        N, sims, chunk_sims, max_bytes, arrays=_OU_ARRAYS
+    ):
+        df = _simOU(
+            s0=s0,
+            mu=_slice_sims(mu, start, stop),
+            theta=theta,
+            sigma=_slice_sims(sigma, start, stop),
+            T=T,
+            dt=dt,
+            sims=stop - start,
+            eps=None,
+            seed=rng,
+            log_price=log_price,
+            backend=backend,
+            workers=workers,
+            scheme=scheme,
+            antithetic=antithetic,
+        )
+        df = _pd.DataFrame(df, columns=_pd.RangeIndex(start, stop), copy=False)
+
+        yield df
+
+
+def simOU_batch(
+    params,
+    T=1,
+    dt=1 / 252,
+    sims=1000,
+    eps=None,
+    seed=None,
+    log_price=False,
+    common=True,
+    c=True,
+    workers=1,
+    scheme="euler",
+    backend=None,
+):
+    """
+    Run simOU for a sweep of parameter sets at once, for sensitivity studies. All the
+    parameter sets and sims are stepped in a single kernel call instead of one simOU call
+    per set.
+
+    Parameters
+    ----------
+    params : DataFrame | dict
+        One parameter set per row (or per element of the arrays of a dict) with any of the
+        columns s0, mu, theta and sigma. Missing columns take the simOU defaults (s0=5, mu=4,
+        theta=2, sigma=1) and scalars are used for every set. mu and sigma are constant over
+        time.
+    T : float
+        Period length in years (i.e. 0.25 for 3 months). By default 1.
+    dt : float
+        Time step size in fractions of a year. So a day would be 1/252, where 252 is the
+        number of business days in a year. By default 1/252.
+    sims : int
+        Number of simulations per parameter set. By default 1000.
+    eps : array-like[float], optional
+        Random numbers to use. Either of size (N x sims), used for every parameter set, or
+        (N x sims x P) for one set each. Excludes time 0. By default None.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. By default None.
+    log_price : bool
+        Adds adjustment term to the mean reversion term if the prices passed are log prices.
+        By default False.
+    common : bool
+        Use the same random numbers for every parameter set (common random numbers), so
+        that differences between sets come from the parameters rather than from simulation
+        noise. Not used if eps is provided. By default True.
+    c, workers, scheme, backend
+        See simOU.
+
+    Returns
+    -------
+    A numpy array of size (N + 1 x sims x P) with the time steps, simulations and parameter
+    sets on the three axes.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> import numpy as np
+    >>> import pandas as pd
+    >>> params = pd.DataFrame({"theta": np.linspace(0.5, 5, 500), "sigma": 0.3})
+    >>> x = rt.simOU_batch(params, sims=1000)
+    >>> x[-1].std(axis=0)
+    """
+    if scheme not in _OU_SCHEMES:
+        raise ValueError(f"scheme must be one of {list(_OU_SCHEMES)}")
+
+    backend = _resolve_backend(backend, c)
+
+    if isinstance(params, dict):
+        # scalars are used for every set
+        values = _np.broadcast_arrays(*[_np.atleast_1d(v) for v in params.values()])
+        params = _pd.DataFrame(dict(zip(params.keys(), values)))
+
+    unknown = set(params.columns) - set(_BATCH_DEFAULTS)
+    if len(unknown) > 0:
+        raise ValueError(f"params columns must be in {list(_BATCH_DEFAULTS)}")
+
+    P = params.shape[0]
+    s0, mu, theta, sigma = [
+        _np.asarray(params.get(k, _np.full(P, v)), dtype=float)
+        for k, v in _BATCH_DEFAULTS.items()
+    ]
+
+    if eps is not None:
+        eps = _np.asarray(eps, dtype=float)
+        N, sims = eps.shape[:2]
+        if (eps.ndim == 3) & (eps.shape[-1] != P):
+            raise ValueError(f"eps must have {P} parameter sets, got {eps.shape[-1]}")
+    else:
+        N = int(T / dt)
+        rng = _make_rng(seed)
+        # drawn sim by sim, the same for every set if common
+        eps = rng.normal(size=(sims, N) if common else (P, sims, N)).T
+
+    # check on random number size
+    if (N + 1) * sims * P > 200_000_000:
+        import warnings
+
+        warnings.warn("""
+            Note that this simulation will hold more than 200M values
+            which may crash the python kernel. It may be a better idea
+            to run the sweep in smaller groups of parameter sets.
+            """)
+
+    # P x sims x (N + 1) so that every sim of every set is contiguous
+    x = _np.empty((P, sims, N + 1))
+    x[:, :, 0] = s0[:, _np.newaxis]
+    x[:, :, 1:] = eps.T
+
+    if backend == "numpy":
+        for p in range(P):
+            x[p] = _simOUpy(
+                s0=s0[p],
+                mu=_broadcast_param(mu[p], N, sims),
+                theta=theta[p],
+                sigma=_broadcast_param(sigma[p], N, sims),
+                T=T,
+                dt=dt,
+                sims=sims,
+                eps=x[p, :, 1:].T,
+                log_price=log_price,
+                scheme=scheme,
+            ).T
+    else:
+        kernels = _kernels(backend)
+        x = x.reshape(P * sims, N + 1)
+        theta, mu, sigma = [_np.repeat(v, sims) for v in (theta, mu, sigma)]
+
+        def run(start, stop):
+            kernels.simOU_batch(
+                x[start:stop],
+                theta[start:stop],
+                mu[start:stop],
+                sigma[start:stop],
+                dt,
+                rows=stop - start,
+                cols=N + 1,
+                log_price=int(log_price),
+                scheme=_OU_SCHEMES[scheme],
+            )
+
+        _run_by_sims(run, P * sims, workers, backend)
+
+    return x.reshape(P, sims, N + 1).T
+
+
 def simOUJ(
     s0=5,
     mu=5,
@@ -368,6 +1461,15 @@ def simOUJ(
     ejp=None,
     seed=None,
     c=True,
+    workers=1,
+    keep="path",
+    fan=None,
+    antithetic=False,
+    jumps="dense",
+    backend=None,
+    output="frame",
+    strike=None,
+    barrier=None,
 ):
     """
     Function for calculating an Ornstein-Uhlenbeck Jump Mean Reversion stochastic process (random walk) with multiple
@@ -422,25 +1524,200 @@ def simOUJ(
     ejp : numpy array, optional
         Array of random numbers to use for the jump size. If None, then random numbers are generated.
         By default, this is None.
-    seed : int, optional
-        To pass to numpy random number generator as seed. For testing only.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. For testing only. A numpy Generator
+        or RandomStreams can also be passed in which case random numbers are drawn from it
+        directly.
     log_price : bool, optional
         Adds adjustment term to the mean reversion term if the prices passed are log prices. By
         default False.
     c : bool, optional
         Whether or not to run C optimized code. By default True. Otherwise use python loop.
+    workers : int, optional
+        Number of threads to split the simulations across. -1 uses all available cores.
+        The random numbers are drawn from seed before the simulations are split, so results
+        are identical for any number of workers. Only used by the compiled backends.
+        By default 1.
+    keep : ['path', 'terminal', 'stats']
+        What to return. 'path' returns every time step. 'terminal' returns only the value at T
+        and 'stats' the terminal, mean, min and max of each path (including s0), holding only
+        the current value of each sim in memory. By default 'path'.
+    fan : FanAccumulator, optional
+        If given, the paths are added to fan instead of being returned. With jumps='sparse'
+        the simulation is run in blocks of sims as in simOUJ_iter, which gives the same
+        paths. keep must be 'path'. By default None.
+    antithetic : bool, optional
+        Use antithetic variates for the diffusion. Only half of the normal random numbers
+        are drawn and the other half of the sims use them times -1. The jumps are drawn
+        independently for every sim. Not used if eps is provided. By default False.
+    jumps : ['sparse', 'dense']
+        How the jumps are drawn if elp and ejp are not provided. 'sparse' only draws the time
+        steps that have a jump, from the geometric gaps between them, and their sizes, so
+        memory and random number costs scale with the number of jumps rather than with
+        N * sims. 'dense' draws a jump size and count for every time step and sim as elp and
+        ejp. Both give the same distribution but different draws for the same seed. By
+        default 'dense', which gives the same results as earlier versions for the same
+        seed.
+    backend : ['cython', 'numba', 'numpy'], optional
+        Engine that runs the simulation, see available_backends. If None, the backend from
+        get_backend is used, or 'numpy' if c is False. The compiled backends ('cython' and
+        'numba') give the same results for the same seed. By default None.
+    output : ['frame', 'array', 'result']
+        Return a pandas dataframe, the underlying numpy array or a SimulationResult, none of
+        which copy the simulated values. 'result' is only used with keep='path'. By default
+        'frame'.
+    strike : float, optional
+        Only used with keep='stats'. Adds the undiscounted payoffs of options on each path,
+        computed while the paths are stepped: 'call' and 'put' on the terminal value,
+        'asian_call' and 'asian_put' on the average of the N time steps (excluding s0), and
+        'above', the fraction of the N time steps above strike. By default None.
+    barrier : float, optional
+        Only used with keep='stats'. Adds 'barrier_hit', whether each path reached the
+        barrier (from below if the barrier is above s0, otherwise from above) at any time
+        step. By default None.
 
     Returns
     -------
-    A pandas dataframe with the time steps as rows and the number of simulations as columns
+    A pandas dataframe (or numpy array or SimulationResult, see output) with the time steps as
+    rows and the number of simulations as columns.
+    For keep='terminal', a pandas series (or 1D array) of the terminal values and for
+    keep='stats', a pandas dataframe (or 2D array) with the sims as rows and the statistics
+    as columns. If fan is given, the summary of fan (see FanAccumulator.summary).
 
     Examples
     --------
     >>> import risktools as rt
     >>> rt.simOUJ()
+    >>> rt.simOUJ(sims=1_000_000, mr_lag=5, keep="stats")
     """
-    # number of business days in a year
-    bdays_in_year = 252
+    backend = _resolve_backend(backend, c)
+
+    if output not in _OUTPUT:
+        raise ValueError(f"output must be one of {_OUTPUT}")
+    if (fan is not None) & (keep != "path"):
+        raise ValueError("keep must be 'path' if fan is used")
+
+    if (
+        (fan is not None)
+        & (jumps == "sparse")
+        & (eps is None)
+        & (elp is None)
+        & (ejp is None)
+    ):
+        chunks = _simOUJ_iter(
+            s0,
+            mu,
+            theta,
+            sigma,
+            jump_prob,
+            jump_avgsize,
+            jump_stdv,
+            T,
+            dt,
+            sims,
+            mr_lag,
+            None,
+            2**30,
+            seed,
+            backend,
+            workers,
+            antithetic,
+        )
+        for df in chunks:
+            fan.update(df)
+
+        return fan.summary()
+
+    s = _simOUJ(
+        s0=s0,
+        mu=mu,
+        theta=theta,
+        sigma=sigma,
+        jump_prob=jump_prob,
+        jump_avgsize=jump_avgsize,
+        jump_stdv=jump_stdv,
+        T=T,
+        dt=dt,
+        sims=sims,
+        mr_lag=mr_lag,
+        eps=eps,
+        elp=elp,
+        ejp=ejp,
+        seed=seed,
+        backend=backend,
+        workers=workers,
+        keep=keep,
+        antithetic=antithetic,
+        strike=strike,
+        barrier=barrier,
+        jumps=jumps,
+    )
+
+    if fan is not None:
+        return fan.update(s).summary()
+
+    if keep != "path":
+        return _keep_output(s, output)
+
+    return _path_output(s, output, dt, seed)
+
+
+def _simOUJ(
+    s0,
+    mu,
+    theta,
+    sigma,
+    jump_prob,
+    jump_avgsize,
+    jump_stdv,
+    T,
+    dt,
+    sims,
+    mr_lag,
+    eps,
+    elp,
+    ejp,
+    seed,
+    backend=None,
+    workers=1,
+    keep="path",
+    antithetic=False,
+    strike=None,
+    barrier=None,
+    jumps="dense",
+):
+    backend = _resolve_backend(backend)
+
+    if keep not in _KEEP:
+        raise ValueError(f"keep must be one of {_KEEP}")
+    if jumps not in _JUMPS:
+        raise ValueError(f"jumps must be one of {_JUMPS}")
+
+    if keep != "path":
+        return _simOUJ_state(
+            s0,
+            mu,
+            theta,
+            sigma,
+            jump_prob,
+            jump_avgsize,
+            jump_stdv,
+            T,
+            dt,
+            sims,
+            mr_lag,
+            eps,
+            elp,
+            ejp,
+            seed,
+            backend,
+            workers,
+            keep,
+            antithetic,
+            strike,
+            barrier,
+            jumps,
+        )
 
     # number of periods dt in T
     N = int(T / dt)
@@ -449,171 +1726,785 @@ def simOUJ(
     if (N + 1) * sims > 200_000_000:
         import warnings
 
-        warnings.warn(
-            """
+        warnings.warn("""
             Note that this simulation will generate more than
             200M random numbers which may crash the python kernel. It may
-            be a better idea to split the simulation into a series of smaller
-            sims and then join them after.
-            """
-        )
-
-    # print half-life of theta
-    print("Half-life of theta in days = ", _np.log(2) / theta * bdays_in_year)
+            be a better idea to run it in bounded memory in chunks of
+            sims using simOUJ_iter.
+            """)
 
     if (eps is None) | (elp is None) | (ejp is None):
-        rng = Generator(SFC64(seed))
+        rng = _make_rng(seed)
 
-    if eps is None:
-        eps = rng.normal(size=(N, sims))
-    else:
+    if eps is not None:
         N = eps.shape[0]
         sims = eps.shape[1]
+
+    if (jumps == "sparse") & (elp is None) & (ejp is None):
+        # drawn in the same order as simOUJ_iter, so that it gives the same
+        # result for any block size
+        if eps is None:
+            x = _ou_paths(rng, s0, N, sims, antithetic)
+        else:
+            x = _np.empty((sims, N + 1))
+            x[:, 0] = s0
+            x[:, 1:] = _np.asarray(eps, dtype=float).T
+
+        events = _jump_events(rng, N, sims, jump_prob * dt, jump_avgsize, jump_stdv)
+
+        return _simOUJ_sparse(
+            x,
+            events,
+            theta,
+            mu,
+            dt,
+            sigma,
+            mr_lag,
+            jump_prob,
+            jump_avgsize,
+            workers,
+            backend,
+        )
+
+    if eps is None:
+        eps = _normal(rng, (N, sims), antithetic)
     if elp is None:
         elp = rng.lognormal(mean=_np.log(jump_avgsize), sigma=jump_stdv, size=(N, sims))
     if ejp is None:
         ejp = rng.poisson(lam=jump_prob * dt, size=(N, sims))
 
-    mu = make_into_array(mu, N)
-    sigma = make_into_array(sigma, N)
-
-    # repeats first row of eps, elp, and ejp to match the number of simulations
-    eps = make_into_array(eps, N).astype(float)
-    elp = make_into_array(elp, N).astype(float)
-    ejp = make_into_array(ejp, N).astype(float)
-
-    if c == True:
-        if len(sigma.shape) == 2:
-            sigma = sigma.T.reshape((N + 1) * sims)
+    # repeats first row of eps, elp, and ejp so they line up with the N + 1
+    # time steps. Stacked directly so that a single sim stays 2D
+    eps, elp, ejp = [
+        _np.vstack((_np.asarray(e)[:1], _np.asarray(e))).astype(float)
+        for e in (eps, elp, ejp)
+    ]
 
+    if backend != "numpy":
         s = _simOUJc(
             s0,
             eps,
             elp,
             ejp,
             theta,
-            mu,
+            _broadcast_param(mu, N, sims),
             dt,
-            sigma,
+            _broadcast_param(sigma, N, sims),
             sims,
             N,
             mr_lag,
             jump_prob,
             jump_avgsize,
+            workers,
+            backend,
         )
     else:
-        # init df with zeros, rows are steps forward in time, columns are simulations
-        s = _np.zeros((N + 1, sims))
-        s = _pd.DataFrame(data=s)
-
-        # set first row as starting value of sim
-        s.iloc[0, :] = s0
         s = _simOUJpy(
-            N, s, mu, theta, sigma, jump_prob, jump_avgsize, dt, mr_lag, eps, elp, ejp
+            s0,
+            eps,
+            elp,
+            ejp,
+            theta,
+            _broadcast_param(mu, N, sims),
+            dt,
+            _broadcast_param(sigma, N, sims),
+            sims,
+            N,
+            mr_lag,
+            jump_prob,
+            jump_avgsize,
         )
 
     return s
 
 
-def _simOUJc(
+def _simOUJ_state(
     s0,
-    eps,
-    elp,
-    ejp,
-    theta,
     mu,
-    dt,
+    theta,
     sigma,
-    sims,
-    N,
-    mr_lag,
     jump_prob,
     jump_avgsize,
+    jump_stdv,
+    T,
+    dt,
+    sims,
+    mr_lag,
+    eps,
+    elp,
+    ejp,
+    seed,
+    backend,
+    workers,
+    keep,
+    antithetic=False,
+    strike=None,
+    barrier=None,
+    jumps="dense",
 ):
+    # simOUJ keeping only the current value (and running statistics) of each sim
+    if eps is not None:
+        eps = _np.asarray(eps, dtype=float)
+        N, sims = eps.shape
+    else:
+        N = int(T / dt)
 
-    # generate a 1D array of random numbers that is based on a
-    # 2D array of size P x S where P is the number of time steps
-    # including s0 (so N + 1) and S is the number of sims. 1D
-    # array will be of size P * S. This is actually the slowest
-    # part.
-    eps[0, :] = s0
-
-    # make same size as 1D array of all periods and sims
-    eps = eps.T.reshape((N + 1) * sims)
-    elp = elp.T.reshape((N + 1) * sims)
-    ejp = ejp.T.reshape((N + 1) * sims)
-    mu = _np.tile(_np.array(mu), sims)
-    sigma = _np.tile(_np.array(sigma), sims)
+    if (eps is None) | (elp is None) | (ejp is None):
+        rng = _make_rng(seed)
+
+    # (N + 1) x sims views of mu and sigma
+    mu = _broadcast_param(mu, N, sims).T
+    sigma = _broadcast_param(sigma, N, sims).T
+
+    x = _np.full(sims, float(s0))
+    x_sum, x_min, x_max, x_above = _init_stats(x, keep, strike)
+    lag_jump = _np.zeros(sims)
+    lag_left = _np.zeros(sims, dtype=_np.int64)
+    mr_lag = 0 if mr_lag is None else int(mr_lag)
+
+    kernel = _ouj_state_np if backend == "numpy" else _kernels(backend).simOUJ_state
+    steps = _state_block_steps(sims)
+
+    # sparse jumps are drawn up front as events and only expanded to elp and
+    # ejp for each block of time steps
+    events = None
+    if (jumps == "sparse") & (elp is None) & (ejp is None):
+        events = _jump_events(rng, N, sims, jump_prob * dt, jump_avgsize, jump_stdv)
+        ev_sim, ev_step, ev_jump, bounds = _events_by_step(events, N)
+
+    for j in range(1, N + 1, steps):
+        k = min(j + steps, N + 1)
+        n = k - j
+
+        e = _normal(rng, (n, sims), antithetic) if eps is None else eps[j - 1 : k - 1]
+        if events is not None:
+            a, b = bounds[j - 1], bounds[k - 1]
+            lp = _np.ones((n, sims))
+            jp = _np.zeros((n, sims))
+            lp[ev_step[a:b] - j, ev_sim[a:b]] = ev_jump[a:b]
+            jp[ev_step[a:b] - j, ev_sim[a:b]] = 1.0
+        else:
+            if elp is None:
+                lp = rng.lognormal(
+                    mean=_np.log(jump_avgsize), sigma=jump_stdv, size=(n, sims)
+                )
+            else:
+                lp = _np.asarray(elp, dtype=float)[j - 1 : k - 1]
+            if ejp is None:
+                jp = rng.poisson(lam=jump_prob * dt, size=(n, sims)).astype(float)
+            else:
+                jp = _np.asarray(ejp, dtype=float)[j - 1 : k - 1]
+
+        def run(start, stop):
+            kernel(
+                x[start:stop],
+                e[:, start:stop],
+                lp[:, start:stop],
+                jp[:, start:stop],
+                theta,
+                mu[j:k, start:stop],
+                dt,
+                sigma[j:k, start:stop],
+                lag_jump[start:stop],
+                lag_left[start:stop],
+                x_sum[start:stop],
+                x_min[start:stop],
+                x_max[start:stop],
+                x_above[start:stop],
+                rows=n,
+                cols=stop - start,
+                mr_lag=mr_lag,
+                jump_prob=jump_prob,
+                jump_avgsize=jump_avgsize,
+                stats=int(keep == "stats"),
+                above=int(x_above.shape[0] > 0),
+                strike=0.0 if strike is None else strike,
+            )
 
-    mr_lag = 0 if mr_lag is None else mr_lag
+        _run_by_sims(run, sims, workers, backend)
 
-    x = _csimOUJ(
-        x=eps,
-        elp=elp,
-        ejp=ejp,
-        theta=theta,
-        mu=mu,
-        dt=dt,
-        sigma=sigma,
-        rows=sims,
-        cols=N + 1,
-        mr_lag=mr_lag,
-        jump_prob=jump_prob,
-        jump_avgsize=jump_avgsize,
-    )
+    return _state_output(x, x_sum, x_min, x_max, N, keep, x_above, s0, strike, barrier)
 
-    return _pd.DataFrame(x.reshape((sims, N + 1)).T)
 
+class _JumpEvents:
+    """
+    Jumps of consecutive blocks of sims as events, see _jump_events. The time steps with
+    jumps, their counts and their sizes each come from their own child stream of rng and
+    are drawn in the order of the sims, so the events of a run are the same however it
+    is split into blocks.
+    """
 
-def _simOUJpy(
-    N, s, mu, theta, sigma, jump_prob, jump_avgsize, dt, mr_lag, eps, elp, ejp
-):
+    def __init__(self, rng, N, lam, jump_avgsize, jump_stdv):
+        self.N = N
+        self.lam = lam
+        self.jump_avgsize = jump_avgsize
+        self.jump_stdv = jump_stdv
+
+        # probability that a time step has at least one jump
+        self.p = -_np.expm1(-lam)
+
+        self._gaps, self._counts, self._sizes = _spawn_rngs(rng, 3)
+        self._pos = _np.zeros(0, dtype=_np.int64)
+        self._last = -1
+        self._start = 0
+        self._batch = _GAP_BATCH_MIN
+
+    def draw(self, sims):
+        """
+        Returns the events (ptr, step, jump) of the next sims sims.
+        """
+        N = self.N
+        end = (self._start + sims) * N
+
+        # positions of the time steps with jumps in the sims x N grid of the
+        # whole run from the geometric gaps between them, until past the end
+        # of the block. Positions left over from the last block come first
+        batches = [self._pos]
+        while (self.p > 0) and (self._last < end):
+            gaps = self._gaps.geometric(self.p, size=self._batch)
+            gaps = self._last + _np.cumsum(gaps)
+            batches.append(gaps)
+            self._last = gaps[-1]
+            self._batch = min(2 * self._batch, _GAP_BATCH)
+
+        pos = _np.concatenate(batches) if len(batches) > 1 else self._pos
+        k = _np.searchsorted(pos, end)
+        self._pos = pos[k:].copy()
+        pos = pos[:k] - self._start * N
+        self._start += sims
+
+        # counts are Poisson given that there is at least one jump
+        count = _poisson.ppf(
+            _np.exp(-self.lam) + self._counts.random(k) * self.p, self.lam
+        )
+        count = _np.maximum(count, 1)
+        size = self._sizes.lognormal(
+            mean=_np.log(self.jump_avgsize), sigma=self.jump_stdv, size=k
+        )
 
-    mu = _np.vstack([mu] * s.shape[1]).T
-    if len(sigma.shape) == 1:
-        sigma = _np.vstack([sigma] * s.shape[1]).T
+        sim, step = _np.divmod(pos, N)
+        ptr = _np.searchsorted(sim, _np.arange(sims + 1)).astype(_np.int64)
 
-    mu = _pd.DataFrame(mu)
-    sigma = _pd.DataFrame(sigma)
-    eps = _pd.DataFrame(eps)
-    elp = _pd.DataFrame(elp)
-    ejp = _pd.DataFrame(ejp)
+        return ptr, step + 1, count * size
 
-    for i in range(1, N + 1):
-        # calc step
-        # fmt: off
-        s.iloc[i, :] = (
-            s.iloc[i - 1, :]
-            + theta
-                * (mu.iloc[i, :] - jump_prob * jump_avgsize - s.iloc[i - 1, :])
-                * s.iloc[i - 1, :]
-                * dt
-            + sigma.iloc[i, :] * s.iloc[i - 1, :] * eps.iloc[i, :] * _np.sqrt(dt)
-            + ejp.iloc[i, :] * elp.iloc[i, :]
-        )
 
-        if mr_lag is not None:
-            # if there is a jump in this step, add it to the mean reversion
-            # level so that it doesn't drop back down to the given mean too
-            # quickly. Simulates impact of lagged market response to a jump
+def _jump_events(rng, N, sims, lam, jump_avgsize, jump_stdv):
+    """
+    Draws the jumps of N x sims time steps with Poisson(lam) jump counts and lognormal
+    jump sizes as a list of events, in CSR form sorted by sim and time step. Returns
+    (ptr, step, jump) where the events of sim r are ptr[r] to ptr[r + 1] of step (time
+    steps from 1 to N) and jump (count times size, as ejp * elp).
+    """
+    return _JumpEvents(rng, N, lam, jump_avgsize, jump_stdv).draw(sims)
 
-            mu.iloc[(i):(i + mr_lag), :] += ejp.iloc[i, :] * elp.iloc[i, :]
-            ejp.iloc[(i+1):(i + mr_lag), ejp.iloc[i,:] > 0] = 0 # stops double jumps
 
-        # fmt: on
+def _ou_paths(rng, s0, N, sims, antithetic=False):
+    # sims x (N + 1) array so each sim is contiguous, starting at s0 and
+    # followed by its random numbers. Drawn sim by sim as in _simOUc, so
+    # consecutive blocks of sims give the same numbers as a single draw
+    if antithetic:
+        x = _np.empty((sims, N + 1))
+        x[:, 1:] = _normal(rng, (sims, N), antithetic, axis=0)
+    else:
+        x = rng.normal(loc=0, scale=1, size=(sims, N + 1))
 
-    return s
+    x[:, 0] = s0
 
+    return x
 
-def fitOU(spread, dt=1 / 252, log_price=False, method="OLS", verbose=False):
-    """
-    Parameter estimation for the Ornstein-Uhlenbeck process
 
-    Parameters
-    ----------
-    spread : array-like
-        OU process as a list or series to estimate parameters for
-    dt : float
+def _simOUJ_sparse(
+    x,
+    events,
+    theta,
+    mu,
+    dt,
+    sigma,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+    workers=1,
+    backend="cython",
+):
+    # steps the sims x (N + 1) array x from _ou_paths in place with the
+    # jumps given as events, see _jump_events
+    sims, N = x.shape[0], x.shape[1] - 1
+    mu = _broadcast_param(mu, N, sims)
+    sigma = _broadcast_param(sigma, N, sims)
+    mr_lag = 0 if mr_lag is None else mr_lag
+
+    if backend == "numpy":
+        return _simOUJpy_sparse(
+            x, events, theta, mu, dt, sigma, mr_lag, jump_prob, jump_avgsize
+        )
+
+    ptr, step, jump = events
+    kernels = _kernels(backend)
+
+    def run(start, stop):
+        kernels.simOUJ_sparse(
+            x=x[start:stop],
+            ev_ptr=ptr[start : stop + 1],
+            ev_step=step,
+            ev_jump=jump,
+            theta=theta,
+            mu=mu[start:stop],
+            dt=dt,
+            sigma=sigma[start:stop],
+            rows=stop - start,
+            cols=N + 1,
+            mr_lag=mr_lag,
+            jump_prob=jump_prob,
+            jump_avgsize=jump_avgsize,
+        )
+
+    _run_by_sims(run, sims, workers, backend)
+
+    return x.T
+
+
+def _events_by_step(events, N):
+    # events of _jump_events in time step order, with the events of step j
+    # from bounds[j - 1] to bounds[j]
+    ptr, step, jump = events
+    order = _np.argsort(step, kind="stable")
+    sim = _np.repeat(_np.arange(ptr.shape[0] - 1), _np.diff(ptr))[order]
+    step = step[order]
+    bounds = _np.searchsorted(step, _np.arange(1, N + 2))
+
+    return sim, step, jump[order], bounds
+
+
+def _simOUJpy_sparse(x, events, theta, mu, dt, sigma, mr_lag, jump_prob, jump_avgsize):
+    # numpy version of the csimOUJ_sparse kernel, stepping all the sims at
+    # once. The events are put in time step order so that each step only
+    # sets the jumps of the sims that have one
+    sims, N = x.shape[0], x.shape[1] - 1
+    sim, step, jump, bounds = _events_by_step(events, N)
+
+    state = x[:, 0].copy()
+    lag_jump = _np.zeros(sims)
+    lag_left = _np.zeros(sims, dtype=_np.int64)
+    elp = _np.ones((1, sims))
+    ejp = _np.zeros((1, sims))
+    none = _np.zeros(0)
+
+    for j in range(1, N + 1):
+        k = slice(bounds[j - 1], bounds[j])
+        elp[0, sim[k]] = jump[k]
+        ejp[0, sim[k]] = 1.0
+
+        _ouj_state_np(
+            state,
+            x[None, :, j],
+            elp,
+            ejp,
+            theta,
+            mu[None, :, j],
+            dt,
+            sigma[None, :, j],
+            lag_jump,
+            lag_left,
+            none,
+            none,
+            none,
+            none,
+            1,
+            sims,
+            mr_lag,
+            jump_prob,
+            jump_avgsize,
+        )
+        x[:, j] = state
+
+        elp[0, sim[k]] = 1.0
+        ejp[0, sim[k]] = 0.0
+
+    return x.T
+
+
+def _simOUJc(
+    s0,
+    eps,
+    elp,
+    ejp,
+    theta,
+    mu,
+    dt,
+    sigma,
+    sims,
+    N,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+    workers=1,
+    backend="cython",
+):
+
+    # generate a 1D array of random numbers that is based on a
+    # 2D array of size P x S where P is the number of time steps
+    # including s0 (so N + 1) and S is the number of sims. 1D
+    # array will be of size P * S. This is actually the slowest
+    # part.
+    eps[0, :] = s0
+
+    # make sims x (N + 1) arrays so each sim is contiguous
+    eps = _np.ascontiguousarray(eps.T)
+    elp = _np.ascontiguousarray(elp.T)
+    ejp = _np.ascontiguousarray(ejp.T)
+
+    mr_lag = 0 if mr_lag is None else mr_lag
+
+    kernels = _kernels(backend)
+
+    def run(start, stop):
+        kernels.simOUJ(
+            x=eps[start:stop],
+            elp=elp[start:stop],
+            ejp=ejp[start:stop],
+            theta=theta,
+            mu=mu[start:stop],
+            dt=dt,
+            sigma=sigma[start:stop],
+            rows=stop - start,
+            cols=N + 1,
+            mr_lag=mr_lag,
+            jump_prob=jump_prob,
+            jump_avgsize=jump_avgsize,
+        )
+
+    _run_by_sims(run, sims, workers, backend)
+
+    return eps.T
+
+
+def _simOUJpy(
+    s0,
+    eps,
+    elp,
+    ejp,
+    theta,
+    mu,
+    dt,
+    sigma,
+    sims,
+    N,
+    mr_lag,
+    jump_prob,
+    jump_avgsize,
+):
+    # numpy version of _simOUJc, stepping all the sims at once with the
+    # same mr_lag state as the csimOUJ kernel. mu and sigma are (sims x N + 1)
+    # views so they are transposed to take whole time steps
+    mu = mu.T
+    sigma = sigma.T
+    mr_lag = 0 if mr_lag is None else mr_lag
+
+    out = _np.empty((N + 1, sims))
+    out[0] = s0
+
+    x = out[0].copy()
+    lag_jump = _np.zeros(sims)
+    lag_left = _np.zeros(sims, dtype=_np.int64)
+    none = _np.zeros(0)
+
+    for j in range(1, N + 1):
+        _ouj_state_np(
+            x,
+            eps[j : j + 1],
+            elp[j : j + 1],
+            ejp[j : j + 1],
+            theta,
+            mu[j : j + 1],
+            dt,
+            sigma[j : j + 1],
+            lag_jump,
+            lag_left,
+            none,
+            none,
+            none,
+            none,
+            1,
+            sims,
+            mr_lag,
+            jump_prob,
+            jump_avgsize,
+        )
+        out[j] = x
+
+    return out
+
+
+def simOUJ_iter(
+    s0=5,
+    mu=5,
+    theta=0.5,
+    sigma=0.2,
+    jump_prob=0.05,
+    jump_avgsize=3,
+    jump_stdv=0.05,
+    T=1,
+    dt=1 / 12,
+    sims=1000,
+    mr_lag=None,
+    chunk_sims=None,
+    max_bytes=2**30,
+    seed=None,
+    c=True,
+    workers=1,
+    antithetic=False,
+    backend=None,
+):
+    """
+    Generator version of simOUJ that yields the simulation in contiguous blocks of sims
+    so that very large runs can be processed in bounded memory.
+
+    The jumps are drawn as events as in simOUJ with jumps='sparse', and random numbers
+    are drawn in the same order, so joining the blocks gives exactly the same result as
+    simOUJ with jumps='sparse' and the same seed, regardless of the block size.
+
+    Parameters
+    ----------
+    s0, mu, theta, sigma, jump_prob, jump_avgsize, jump_stdv, T, dt, mr_lag, c, workers,
+    backend
+        See simOUJ. 2D arrays for mu and sigma must be of size (p x sims) and are split
+        by block of sims.
+    antithetic : bool, optional
+        See simOUJ. Antithetic pairs are formed within each block, so results depend on
+        the block size. By default False.
+    sims : int
+        Total number of simulations to run. By default 1000.
+    chunk_sims : int, optional
+        Number of simulations per block. If None, the block size is picked from max_bytes.
+        By default None.
+    max_bytes : int, optional
+        Memory budget in bytes for a single block. Only used if chunk_sims is None.
+        By default 1 GiB.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. As in simOU_iter, the blocks draw
+        in sim order from the one stream of seed, which is what makes them match simOUJ for
+        any block size, so a block can't be drawn on its own or in parallel with the other
+        blocks. The jump times, counts and sizes come from three child streams spawned off
+        it, each also drawn in sim order.
+
+    Yields
+    ------
+    A pandas dataframe for each block with the time steps as rows and the simulations as
+    columns. Columns are labelled with the simulation number within the whole run.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> for df in rt.simOUJ_iter(sims=1_000_000, dt=1/252, chunk_sims=50_000):
+    ...     df.max().mean()
+    """
+    backend = _resolve_backend(backend, c)
+
+    yield from _simOUJ_iter(
+        s0,
+        mu,
+        theta,
+        sigma,
+        jump_prob,
+        jump_avgsize,
+        jump_stdv,
+        T,
+        dt,
+        sims,
+        mr_lag,
+        chunk_sims,
+        max_bytes,
+        seed,
+        backend,
+        workers,
+        antithetic,
+    )
+
+
+def _simOUJ_iter(
+    s0,
+    mu,
+    theta,
+    sigma,
+    jump_prob,
+    jump_avgsize,
+    jump_stdv,
+    T,
+    dt,
+    sims,
+    mr_lag,
+    chunk_sims,
+    max_bytes,
+    seed,
+    backend,
+    workers,
+    antithetic=False,
+):
+    N = int(T / dt)
+
+    rng = _make_rng(seed)
+    events = _JumpEvents(rng, N, jump_prob * dt, jump_avgsize, jump_stdv)
+
+    for start, stop in plan_sim_chunks(
+        N, sims, chunk_sims, max_bytes, arrays=_OUJ_ARRAYS
+    ):
+        df = _simOUJ_sparse(
+            _ou_paths(rng, s0, N, stop - start, antithetic),
+            events.draw(stop - start),
+            theta,
+            _slice_sims(mu, start, stop),
+            dt,
+            _slice_sims(sigma, start, stop),
+            mr_lag,
+            jump_prob,
+            jump_avgsize,
+            workers,
+            backend,
+        )
+        df = _pd.DataFrame(df, columns=_pd.RangeIndex(start, stop), copy=False)
+
+        yield df
+
+
+def meanGBM(s0=10, mu=0, sigma=0.2, r=0, T=1, dt=1 / 252):
+    """
+    Expected value of a simGBM simulation at each time step, for use as a control
+    variate (see control_variate).
+
+    Parameters
+    ----------
+    s0, mu, sigma, r, T, dt
+        See simGBM.
+
+    Returns
+    -------
+    A pandas series of the expected value at each of the N + 1 time steps.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.meanGBM(s0=5, sigma=0.2, r=0.01, T=2)
+    """
+    N = int(T / dt)
+    k = _np.arange(N + 1)
+
+    return _pd.Series(s0 * _np.exp(k * (r * dt + sigma * _np.sqrt(dt) * mu)))
+
+
+def meanOU(
+    s0=5, mu=4, theta=2, sigma=1, T=1, dt=1 / 252, log_price=False, scheme="euler"
+):
+    """
+    Expected value of a simOU simulation at each time step, for use as a control
+    variate (see control_variate). The mean is that of the discretized process
+    given by scheme so that it is exact for the simulated paths.
+
+    Parameters
+    ----------
+    s0, mu, theta, sigma, T, dt, log_price, scheme
+        See simOU. mu and sigma can be scalars or time series of length T/dt. sigma
+        is only used if log_price is True.
+
+    Returns
+    -------
+    A pandas series of the expected value at each of the N + 1 time steps.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> rt.meanOU(s0=5, mu=4, theta=2, T=1, dt=1/252)
+    """
+    if scheme not in _OU_SCHEMES:
+        raise ValueError(f"scheme must be one of {list(_OU_SCHEMES)}")
+
+    N = int(T / dt)
+    mu = _broadcast_param(mu, N, 1)[0]
+    sigma = _broadcast_param(sigma, N, 1)[0]
+
+    # both schemes are an AR(1) process x = a * x + c + noise
+    if scheme == "exact":
+        a, oma, g, b = _ou_exact_coefs(theta, dt)
+        c = oma * mu - 0.5 * sigma**2 * g * int(log_price)
+    else:
+        a = 1 - theta * dt
+        c = theta * mu * dt - 0.5 * sigma**2 * dt * int(log_price)
+
+    out = _np.empty(N + 1)
+    out[0] = s0
+    for i in range(1, N + 1):
+        out[i] = a * out[i - 1] + c[i]
+
+    return _pd.Series(out)
+
+
+def control_variate(y, x, x_mean):
+    """
+    Control variate estimate of the mean of y from simulations. Controls are other
+    outputs of the same simulations whose expected value is known, e.g. the terminal
+    value of simOU or simGBM (see meanOU and meanGBM). The estimate is
+    mean(y) - beta * (mean(x) - x_mean), with beta fitted by least squares, which has
+    a lower standard error than mean(y) the more y and x are correlated.
+
+    Parameters
+    ----------
+    y : array-like[float]
+        Simulated values of the quantity to estimate, i.e. a payoff, one per simulation.
+    x : array-like[float]
+        Simulated values of the control variates. Either 1D with one value per simulation
+        or 2D of size (sims x k) for k controls.
+    x_mean : float | array-like[float]
+        Known expected value of each control.
+
+    Returns
+    -------
+    A pandas series with the estimate, its standard error, the variance reduction
+    (variance of y over the variance of the residuals) and the fitted beta of each
+    control (beta_0, beta_1, etc.).
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> import numpy as np
+    >>> df = rt.simGBM(s0=100, sigma=0.3, r=0.02, T=1, sims=10000, antithetic=True)
+    >>> payoff = np.maximum(df.iloc[-1] - 100, 0)
+    >>> rt.control_variate(payoff, df.iloc[-1], rt.meanGBM(s0=100, sigma=0.3, r=0.02).iloc[-1])
+    """
+    y = _np.asarray(y, dtype=float).ravel()
+    x = _np.asarray(x, dtype=float).reshape(y.shape[0], -1)
+    x_mean = _np.broadcast_to(_np.asarray(x_mean, dtype=float), x.shape[1:])
+
+    n, k = x.shape
+    if n <= k + 1:
+        raise ValueError("need more simulations than controls")
+
+    yc = y - y.mean()
+    xc = x - x.mean(axis=0)
+
+    beta = _np.linalg.lstsq(xc, yc, rcond=None)[0]
+    resid = yc - xc @ beta
+
+    out = _pd.Series(
+        {
+            "estimate": y.mean() - (x.mean(axis=0) - x_mean) @ beta,
+            "std_error": _np.sqrt((resid**2).sum() / (n - k - 1) / n),
+            "variance_reduction": yc.var() / resid.var(),
+        }
+    )
+    for i in range(k):
+        out[f"beta_{i}"] = beta[i]
+
+    return out
+
+
+def fitOU(spread, dt=1 / 252, log_price=False, method="OLS", verbose=False):
+    """
+    Parameter estimation for the Ornstein-Uhlenbeck process
+
+    Parameters
+    ----------
+    spread : array-like
+        OU process as a list or series to estimate parameters for
+    dt : float
         Time step size in fractions of a year. So a day would be 1/252,
         where 252 is the number of business days in a year. Default is 1/252.
         Only used if method is "OLS".
@@ -665,37 +2556,10 @@ def _fitOU_MLE(spread):
     >>> spread = rt.simOU(mu=5, theta=0.5, signma=0.2, T=5, dt=1/250)
     >>> rt.fitOU(spread)
     """
-    spread = _np.array(spread)
-    n = len(spread)
-    delta = 1
-
-    Sx = spread[:-1].sum()
-    Sy = spread[1:].sum()
-    Sxx = (spread[:-1] ** 2).sum()
-    Syy = (spread[1:] ** 2).sum()
-    Sxy = (_np.multiply(spread[:-1], spread[1:])).sum()
-    mu = (Sy * Sxx - Sx * Sxy) / ((n - 1) * (Sxx - Sxy) - (Sx**2 - Sx * Sy))
-
-    theta = (
-        -_np.log(
-            (Sxy - mu * Sx - mu * Sy + (n - 1) * mu**2)
-            / (Sxx - 2 * mu * Sx + (n - 1) * mu**2)
-        )
-        / delta
-    )
-    a = _np.exp(-theta * delta)
-    sigmah2 = (
-        Syy
-        - 2 * a * Sxy
-        + a**2 * Sxx
-        - 2 * mu * (1 - a) * (Sy - a * Sx)
-        + (n - 1) * mu**2 * (1 - a) ** 2
-    ) / (n - 1)
-    # print((sigmah2) * 2 * theta / (1 - a**2))
-    sigma = _np.sqrt((sigmah2) * 2 * theta / (1 - a**2))
-    theta = {"theta": theta, "mu": mu, "annualized_sigma": sigma}
+    spread = _np.asarray(spread, dtype=float).reshape(-1, 1)
+    theta, sigma, mu = _ou_params(*_ou_sums(spread), dt=1, method="MLE")
 
-    return theta
+    return {"theta": theta[0], "mu": mu[0], "annualized_sigma": sigma[0]}
 
 
 def _fitOU_OLS(spread, dt, verbose=False):
@@ -727,22 +2591,15 @@ def _fitOU_OLS(spread, dt, verbose=False):
     if isinstance(spread, _pd.DataFrame):
         raise ValueError("Spread must be a series or array-like, not a dataframe")
 
-    df = _pd.DataFrame()
-
-    df["mrg"] = spread
-    df["delta"] = df["mrg"].diff().shift(-1)
-
-    df = df.dropna().reset_index()
-
-    mod = _smf.ols(formula="delta ~ mrg", data=df)
-    res = mod.fit()
-
-    theta = -res.params.mrg / dt
-    mu = res.params.Intercept / theta / dt
-    sigma = res.resid.std() / _np.sqrt(dt)
+    x = _np.asarray(spread, dtype=float).reshape(-1, 1)
+    theta, sigma, mu = _ou_params(*_ou_sums(x), dt=dt, method="OLS")
+    theta, sigma, mu = theta[0], sigma[0], mu[0]
 
     if verbose == True:
-        print(res.summary())
+        # the regression itself is only run for its summary
+        df = _pd.DataFrame({"mrg": x[:, 0]})
+        df["delta"] = df["mrg"].diff().shift(-1)
+        print(_smf.ols(formula="delta ~ mrg", data=df.dropna()).fit().summary())
         print(
             "theta: ",
             round(theta, 2),
@@ -755,6 +2612,334 @@ def _fitOU_OLS(spread, dt, verbose=False):
     return {"theta": theta, "mu": mu, "annualized_sigma": sigma}
 
 
+def fitOU_batch(df, dt=1 / 252, log_price=False, method="OLS"):
+    """
+    Parameter estimation for many Ornstein-Uhlenbeck processes at once. Gives the
+    same estimates as fitOU on each column but is computed for all columns together
+    from the sums of x[t], x[t + 1], their squares and their products, so thousands
+    of series are fitted in milliseconds. Missing values are skipped, using only
+    the pairs of consecutive values that are both present, so columns can be of
+    different lengths.
+
+    Parameters
+    ----------
+    df : DataFrame | array-like
+        OU processes to estimate parameters for, one per column, with the time steps
+        as rows. A 1D array or series is a single process.
+    dt : float
+        Time step size in fractions of a year. Default is 1/252. Only used if method
+        is "OLS".
+    log_price : bool
+        If True, the log of the processes is taken. Default is False.
+    method : ['OLS', 'MLE']
+        Method to use for parameter estimation. Default is 'OLS'.
+
+    Returns
+    -------
+    DataFrame of the fitted parameters with theta, annualized_sigma and mu as rows
+    and the processes as columns. Columns with fewer than 3 pairs of values are NaN.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> df = rt.simOU(mu=5, theta=0.5, sigma=0.2, T=5, dt=1/252, sims=10000)
+    >>> rt.fitOU_batch(df, dt=1/252)
+    """
+    if method not in _FIT_METHODS:
+        raise ValueError(f"method must be one of {_FIT_METHODS}")
+
+    columns = df.columns if isinstance(df, _pd.DataFrame) else None
+    if isinstance(df, _pd.Series):
+        columns = [df.name]
+
+    x = _np.asarray(df, dtype=float)
+    x = x.reshape(x.shape[0], -1)
+
+    if log_price == True:
+        x = _np.log(x)
+
+    params = _ou_params(*_ou_sums(x), dt=dt, method=method)
+
+    return _pd.DataFrame(_np.vstack(params), index=_OU_PARAMS, columns=columns)
+
+
+def fitOU_rolling(
+    df, window=None, dt=1 / 252, log_price=False, method="OLS", min_periods=None
+):
+    """
+    Rolling or expanding window parameter estimation for Ornstein-Uhlenbeck
+    processes. The sums fitOU_batch fits from are kept as running totals, so each
+    time step adds the newest pair of values to the window and removes the oldest
+    one, and all windows of all columns take O(n) work in total rather than refitting
+    every window. Estimates are the same as fitOU_batch on each window.
+
+    Parameters
+    ----------
+    df : DataFrame | array-like
+        OU processes to estimate parameters for, one per column, with the time steps
+        as rows. A 1D array or series is a single process.
+    window : int, optional
+        Number of observations in each window, including the current one. If None,
+        the window expands from the first observation. By default None.
+    dt : float
+        Time step size in fractions of a year. Default is 1/252. Only used if method
+        is "OLS".
+    log_price : bool
+        If True, the log of the processes is taken. Default is False.
+    method : ['OLS', 'MLE']
+        Method to use for parameter estimation. Default is 'OLS'.
+    min_periods : int, optional
+        Minimum number of non-missing observations in a window to give estimates,
+        as in pandas rolling windows. By default the window for rolling windows and
+        1 for expanding ones. Windows with fewer than 3 pairs of consecutive values
+        are always NaN.
+
+    Returns
+    -------
+    DataFrame with the time steps of df as rows. For a single process the columns
+    are theta, annualized_sigma and mu, otherwise they are a MultiIndex of the
+    parameter and the process, so res["theta"] is the theta of every process.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> df = rt.simOU(mu=5, theta=0.5, sigma=0.2, T=5, dt=1/252, sims=100)
+    >>> res = rt.fitOU_rolling(df, window=252)
+    >>> res["theta"]
+    """
+    if method not in _FIT_METHODS:
+        raise ValueError(f"method must be one of {_FIT_METHODS}")
+    if (window is not None) and (window < 4):
+        raise ValueError("window must have at least 4 observations")
+
+    index = df.index if isinstance(df, (_pd.DataFrame, _pd.Series)) else None
+    columns = df.columns if isinstance(df, _pd.DataFrame) else None
+    single = _np.ndim(df) == 1
+
+    x = _np.asarray(df, dtype=float)
+    x = x.reshape(x.shape[0], -1)
+
+    if log_price == True:
+        x = _np.log(x)
+
+    if min_periods is None:
+        min_periods = 1 if window is None else window
+
+    ok, prev, nxt, ref = _ou_pairs(x)
+
+    # running totals with a row of zeros in front, the sums over the pairs
+    # ending at observations start + 1 to t are total[t] - total[start]
+    def total(v):
+        out = _np.zeros((v.shape[0] + 1, v.shape[1]))
+        _np.cumsum(v, axis=0, out=out[1:])
+        return out
+
+    t = _np.arange(x.shape[0])
+    start = _np.zeros_like(t) if window is None else _np.maximum(t - window + 1, 0)
+
+    sums = [total(v) for v in [ok, prev, nxt, prev * prev, prev * nxt, nxt * nxt]]
+    params = _ou_params(*[v[t] - v[start] for v in sums], ref=ref, dt=dt, method=method)
+
+    # observations in each window, start to t
+    count = total(_np.isfinite(x))
+    count = count[t + 1] - count[start]
+    params = [_np.where(count < min_periods, _np.nan, p) for p in params]
+
+    if single:
+        return _pd.DataFrame(_np.hstack(params), index=index, columns=_OU_PARAMS)
+
+    if columns is None:
+        columns = _pd.RangeIndex(x.shape[1])
+
+    return _pd.DataFrame(
+        _np.hstack(params),
+        index=index,
+        columns=_pd.MultiIndex.from_product([_OU_PARAMS, columns]),
+    )
+
+
+def fitOU_bootstrap(
+    spread,
+    n_boot=1000,
+    dt=1 / 252,
+    log_price=False,
+    method="OLS",
+    seed=None,
+    workers=1,
+    backend=None,
+):
+    """
+    Parametric bootstrap of the Ornstein-Uhlenbeck parameters fitted to a spread, for
+    confidence intervals on the output of fitOU. The spread is fitted, n_boot paths of
+    the same length are simulated from the fitted process in one call of the
+    simulation kernels, and every path is refitted with the estimator of fitOU_batch.
+
+    Parameters
+    ----------
+    spread : array-like
+        OU process as a list or series to estimate parameters for. Missing values are
+        dropped.
+    n_boot : int
+        Number of bootstrap replicates. Default is 1000.
+    dt : float
+        Time step size in fractions of a year. Default is 1/252. Only used if method
+        is "OLS".
+    log_price : bool
+        If True, the log of the spread is taken. Default is False.
+    method : ['OLS', 'MLE']
+        Method to use for parameter estimation. Paths are simulated with the Euler
+        scheme for OLS, which is the model it fits, and with the exact scheme and a
+        time step of 1 for MLE. Default is 'OLS'.
+    seed : int | Generator | RandomStreams, optional
+        To pass to numpy random number generator as seed. By default None.
+    workers : int
+        Number of threads to simulate and refit the paths on, -1 for all cores.
+        Results do not depend on the number of workers. Default is 1.
+    backend : ['cython', 'numba', 'numpy'], optional
+        Backend of the simulation kernels, by default the one set with set_backend.
+
+    Returns
+    -------
+    DataFrame of the fitted parameters of each replicate with the replicates as rows
+    and theta, annualized_sigma and mu as columns.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> spread = rt.simOU(mu=5, theta=0.5, sigma=0.2, T=5, dt=1/252)[0]
+    >>> boot = rt.fitOU_bootstrap(spread, n_boot=10000, workers=-1)
+    >>> boot.quantile([0.025, 0.975])
+    """
+    if method not in _FIT_METHODS:
+        raise ValueError(f"method must be one of {_FIT_METHODS}")
+
+    x = _np.asarray(spread, dtype=float).ravel()
+    if log_price == True:
+        x = _np.log(x)
+    x = x[_np.isfinite(x)]
+
+    theta, sigma, mu = [
+        p[0] for p in _ou_params(*_ou_sums(x[:, None]), dt=dt, method=method)
+    ]
+    if not _np.isfinite([theta, sigma, mu]).all():
+        raise ValueError("could not fit the spread, it needs at least 4 values")
+
+    # MLE estimates are per time step
+    if method == "MLE":
+        dt, scheme = 1, "exact"
+    else:
+        scheme = "euler"
+
+    # as many steps as the spread
+    N = x.shape[0] - 1
+    paths = _simOU(
+        s0=x[0],
+        mu=mu,
+        theta=theta,
+        sigma=sigma,
+        T=N * dt,
+        dt=dt,
+        sims=n_boot,
+        eps=None,
+        seed=seed,
+        log_price=False,
+        backend=_resolve_backend(backend),
+        workers=workers,
+        scheme=scheme,
+        N=N,
+    )
+
+    out = _np.empty((n_boot, 3))
+
+    def fit(start, stop):
+        params = _ou_params(*_ou_sums(paths[:, start:stop]), dt=dt, method=method)
+        out[start:stop] = _np.column_stack(params)
+
+    # the numpy reductions release the GIL, so the refits are split across threads
+    _run_by_sims(fit, n_boot, workers)
+
+    return _pd.DataFrame(out, columns=_OU_PARAMS)
+
+
+def _ou_pairs(x, ref=None):
+    # x[t] and x[t + 1] for each column of x relative to ref (by default the column
+    # means, to keep sums of them well conditioned), zeroed where either is not
+    # finite, and whether each pair is used
+    finite = _np.isfinite(x)
+
+    if finite.all():
+        # no masking needed
+        ref = x.mean(axis=0) if ref is None else ref
+        ok = _np.ones((x.shape[0] - 1, x.shape[1]), dtype=bool)
+        return ok, x[:-1] - ref, x[1:] - ref, ref
+
+    if ref is None:
+        count = finite.sum(axis=0)
+        ref = _np.where(finite, x, 0.0).sum(axis=0) / _np.maximum(count, 1)
+
+    ok = finite[:-1] & finite[1:]
+    prev = _np.where(ok, x[:-1] - ref, 0.0)
+    nxt = _np.where(ok, x[1:] - ref, 0.0)
+
+    return ok, prev, nxt, ref
+
+
+def _ou_sums(x, ref=None):
+    # number of pairs of x[t] and x[t + 1] in each column of x and the sums of
+    # them, their squares and their product, see _ou_pairs
+    ok, prev, nxt, ref = _ou_pairs(x, ref)
+
+    n = ok.sum(axis=0)
+    Sx = prev.sum(axis=0)
+    Sy = nxt.sum(axis=0)
+    Sxx = _np.einsum("ij,ij->j", prev, prev)
+    Sxy = _np.einsum("ij,ij->j", prev, nxt)
+    Syy = _np.einsum("ij,ij->j", nxt, nxt)
+
+    return n, Sx, Sy, Sxx, Sxy, Syy, ref
+
+
+def _ou_params(n, Sx, Sy, Sxx, Sxy, Syy, ref=0.0, dt=1 / 252, method="OLS"):
+    # theta, annualized sigma and mu from the sums of n pairs of _ou_sums, NaN
+    # where there are fewer than 3 pairs
+    n = _np.asarray(n, dtype=float)
+
+    with _np.errstate(divide="ignore", invalid="ignore"):
+        if method == "MLE":
+            mu = (Sy * Sxx - Sx * Sxy) / (n * (Sxx - Sxy) - (Sx**2 - Sx * Sy))
+            theta = -_np.log(
+                (Sxy - mu * Sx - mu * Sy + n * mu**2) / (Sxx - 2 * mu * Sx + n * mu**2)
+            )
+            a = _np.exp(-theta)
+            sigmah2 = (
+                Syy
+                - 2 * a * Sxy
+                + a**2 * Sxx
+                - 2 * mu * (1 - a) * (Sy - a * Sx)
+                + n * mu**2 * (1 - a) ** 2
+            ) / n
+            sigma = _np.sqrt(sigmah2 * 2 * theta / (1 - a**2))
+        else:
+            # least squares of x[t + 1] = c + b * x[t], the same fit as
+            # x[t + 1] - x[t] on x[t] with a slope of b - 1
+            sxx = Sxx - Sx**2 / n
+            sxy = Sxy - Sx * Sy / n
+            syy = Syy - Sy**2 / n
+            b = sxy / sxx
+            c = (Sy - b * Sx) / n
+
+            theta = (1 - b) / dt
+            mu = c / (1 - b)
+            sigma = _np.sqrt(_np.maximum(syy - b * sxy, 0) / (n - 1) / dt)
+
+    few = n < 3
+    return (
+        _np.where(few, _np.nan, theta),
+        _np.where(few, _np.nan, sigma),
+        _np.where(few, _np.nan, mu + ref),
+    )
+
+
 if __name__ == "__main__":
     import os
     import sys
@@ -787,13 +2972,15 @@ if __name__ == "__main__":
     assert df.equals(act), "simGBM generated eps failed"
 
 
-def OU_lastcol(sims=100000, steps=250, T=25, sigma=0.1, mu=1, theta=1, S0=1):
+def OU_lastcol(sims=100000, steps=250, T=25, sigma=0.1, mu=1, theta=1, S0=1, seed=None):
     # https://stackoverflow.com/questions/24973961/vectorizing-an-equation
     dt = T / steps
     c = 1 - theta * dt
     cv = c ** _np.arange(steps)[::-1]
 
-    R = _np.random.normal(theta * mu * dt, sigma, (sims, steps))
+    # global numpy random state unless seeded
+    rng = _np.random if seed is None else _make_rng(seed)
+    R = rng.normal(theta * mu * dt, sigma, (sims, steps))
 
     SN = _np.dot(R, cv) + S0 * c**steps
 
@@ -825,7 +3012,7 @@ def stochastic_mu(mu, jump_prob, jump_size, dt, lag, N, sims, seed=None):
     sims : int
         The number of simulations
 
-    seed : int
+    seed : int | Generator | RandomStreams
         The seed for the random number generator. By default, the seed is None.
 
     Returns
@@ -838,7 +3025,7 @@ def stochastic_mu(mu, jump_prob, jump_size, dt, lag, N, sims, seed=None):
     >>> import risktools as rt
     >>> rt.stochastic_mu(mu=4, jump_prob=0.1, jump_avgsize=4, jump_stdv=0.5, dt=1/252, N=100, sims=10)
     """
-    rng = Generator(SFC64(seed))
+    rng = _make_rng(seed)
     # elp = rng.lognormal(mean=_np.log(jump_avgsize), sigma=jump_stdv, size=(N, sims))
     elp = _np.ones((N, sims)) * jump_size
     ejp = rng.poisson(lam=jump_prob * dt, size=(N, sims))
@@ -0,0 +1,73 @@
+# reproducible, independent random number streams
+
+from numpy.random import Generator, SFC64, SeedSequence
+
+
+class RandomStreams:
+    """
+    Manager of reproducible and statistically independent random number streams based
+    on numpy's SeedSequence spawning.
+
+    Every stream can spawn any number of child streams, for example one per asset, per
+    block of sims or per worker, whose random numbers are independent of each other and
+    of the parent, and are the same every time for the same seed. A RandomStreams object
+    can be passed anywhere the simulators take a seed, in which case random numbers are
+    drawn from its generator.
+
+    Parameters
+    ----------
+    seed : int | SeedSequence | RandomStreams, optional
+        Entropy of the root stream. If None, fresh entropy is taken from the OS and can be
+        read back from the entropy property to reproduce the run. By default None.
+
+    Examples
+    --------
+    >>> import risktools as rt
+    >>> streams = rt.RandomStreams(42)
+    >>> assets = streams.spawn(3)
+    >>> [rt.simOU(sims=10, seed=s) for s in assets]
+    >>> streams.generator().normal(size=10)
+    """
+
+    def __init__(self, seed=None):
+        if isinstance(seed, RandomStreams):
+            seed = seed.seed_seq
+        if not isinstance(seed, SeedSequence):
+            seed = SeedSequence(seed)
+
+        self.seed_seq = seed
+        self._rng = None
+
+    @property
+    def entropy(self):
+        """Root entropy of the stream, to reproduce runs that were not seeded"""
+        return self.seed_seq.entropy
+
+    def generator(self):
+        """
+        Returns the numpy Generator (SFC64) of this stream. The same generator is returned
+        on every call so that draws carry on where they left off.
+        """
+        if self._rng is None:
+            self._rng = Generator(SFC64(self.seed_seq))
+        return self._rng
+
+    def spawn(self, n):
+        """
+        Returns a list of n new independent child streams. Successive calls hand out
+        different children.
+        """
+        return [RandomStreams(s) for s in self.seed_seq.spawn(n)]
+
+    def generators(self, n):
+        """
+        Returns a list of the generators of n new independent child streams.
+        """
+        return [s.generator() for s in self.spawn(n)]
+
+
+def _spawn_rngs(seed, n):
+    # n independent generators from anything that is accepted as a seed
+    if isinstance(seed, Generator):
+        return seed.spawn(n)
+    return RandomStreams(seed).generators(n)
@@ -4,110 +4,513 @@
 import numpy as np
 cimport numpy as np
 cimport cython
+from libc.math cimport sqrt, exp, expm1
 from libc.stdio cimport printf
 
+
+cdef inline void ou_exact_coefs(
+    double theta, double dt, double* a, double* oma, double* g, double* b
+    ) nogil:
+    # exact transition of the OU process over a step of dt holding
+    # mu and sigma constant. a is the decay, oma = 1 - a, g is the
+    # integral of the decay over the step and b the standard
+    # deviation of the step per unit of sigma. All are written in
+    # terms of expm1 so that they tend to Euler as theta -> 0.
+    a[0] = exp(-theta * dt)
+    oma[0] = -expm1(-theta * dt)
+    if theta != 0.0:
+        g[0] = oma[0] / theta
+        b[0] = sqrt(-expm1(-2.0 * theta * dt) / (2.0 * theta))
+    else:
+        g[0] = dt
+        b[0] = sqrt(dt)
+
+
+cdef inline double ou_step(
+    double x,
+    double e,
+    double theta,
+    double mu,
+    double sigma,
+    double dt,
+    double sq,
+    unsigned int log_price,
+    unsigned int scheme,
+    double a,
+    double oma,
+    double g,
+    double b
+    ) nogil:
+    # one step of the OU process from x with random number e
+    if scheme == 1:
+        return x * a + oma * mu - 0.5 * log_price * sigma * sigma * g + sigma * b * e
+    elif log_price != 0:
+        return x + (theta * (mu - x) - 0.5 * sigma * sigma) * dt + sigma * sq * e
+    else:
+        return x + (theta * (mu - x)) * dt + sigma * sq * e
+
+
+cdef inline double ouj_step(
+    double x,
+    double e,
+    double jump,
+    double theta,
+    double mu,
+    double sigma,
+    double dt,
+    double sq,
+    double jump_prob,
+    double jump_avgsize
+    ) nogil:
+    # one step of the OU jump process from x with random number e
+    return (
+        x
+        + theta
+            * (mu - jump_prob * jump_avgsize - x)
+            * x
+            * dt
+        + sigma * x * e * sq
+        + jump
+    )
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def csimOU(
-    double[::1] x,
+    double[:, ::1] x,
     double theta,
-    double[::1] mu,
+    const double[:, :] mu,
     double dt,
-    double[::1] sigma,
+    const double[:, :] sigma,
     unsigned long long int rows,
     unsigned long long int cols,
-    unsigned int log_price
+    unsigned int log_price,
+    unsigned int scheme=0
     ):
-    cdef long long int i = 1
-    cdef long long int j = 0
-
-    # pre-compute to make faster
-    cdef long long int ll = rows * cols
-
-    cdef double sq = np.sqrt(dt)
-
-    # input x is a 2D array that has been reshaped to be 1D.
-    # Loop through entire 1D array of length rows*cols,
-    # skips value every time counter j is reaches row
-    # count - effectively a new sim.
-
-    if log_price != 0:
-        for i in range(1, ll):
-            if j >= (cols - 1):
-                j = 0
-            else:
-                j = j + 1
-                x[i] = x[i - 1] + (theta * (mu[i] - x[i - 1]) - 0.5 * sigma[i] * sigma[i]) * dt + sigma[i] * sq * x[i];
-    else:
-        for i in range(1, ll):
-            if j >= (cols - 1):
-                j = 0
-            else:
-                j = j + 1
-                x[i] = x[i - 1] + (theta * (mu[i] - x[i - 1])) * dt + sigma[i] * sq * x[i];  
+    cdef long long int j
+    cdef long long int r
+
+    cdef double sq = sqrt(dt)
+    cdef double a = 0.0, oma = 0.0, g = 0.0, b = 0.0
+
+    # input x is a 2D array of size sims x (N + 1) where the first
+    # value of each sim is s0, so it is skipped. mu and sigma are
+    # indexed the same way but can be broadcast views (zero strides)
+    # of scalars or time series so they don't need a copy per sim.
+    # The loop does not need the GIL so that callers can split the
+    # sims across threads.
+
+    if scheme == 1:
+        ou_exact_coefs(theta, dt, &a, &oma, &g, &b)
+
+    with nogil:
+        for r in range(rows):
+            for j in range(1, cols):
+                x[r, j] = ou_step(
+                    x[r, j - 1], x[r, j], theta, mu[r, j], sigma[r, j], dt, sq,
+                    log_price, scheme, a, oma, g, b
+                )
 
     return np.asarray(x)
 
 
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def csimOU_batch(
+    double[:, ::1] x,
+    const double[::1] theta,
+    const double[::1] mu,
+    const double[::1] sigma,
+    double dt,
+    unsigned long long int rows,
+    unsigned long long int cols,
+    unsigned int log_price,
+    unsigned int scheme=0
+    ):
+    cdef long long int j
+    cdef long long int r
+
+    cdef double sq = sqrt(dt)
+    cdef double a = 0.0, oma = 0.0, g = 0.0, b = 0.0
+
+    # same as csimOU but every sim (row of x) has its own theta, mu
+    # and sigma, constant over time, so that a sweep of parameter sets
+    # is run in one call.
+
+    with nogil:
+        for r in range(rows):
+            if scheme == 1:
+                ou_exact_coefs(theta[r], dt, &a, &oma, &g, &b)
+
+            for j in range(1, cols):
+                x[r, j] = ou_step(
+                    x[r, j - 1], x[r, j], theta[r], mu[r], sigma[r], dt, sq,
+                    log_price, scheme, a, oma, g, b
+                )
+
+    return np.asarray(x)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def csimOU_MV(
+    double[:, :, :] x,
+    const double[::1] theta,
+    const double[:, :, :] mu,
+    const double[:, :, :] sigma,
+    double dt,
+    unsigned long long int steps,
+    unsigned long long int sims,
+    unsigned long long int assets,
+    unsigned int log_price,
+    unsigned int scheme=0
+    ):
+    cdef long long int j
+    cdef long long int r
+    cdef long long int i
+
+    cdef double sq = sqrt(dt)
+    cdef double[::1] a = np.zeros(assets)
+    cdef double[::1] oma = np.zeros(assets)
+    cdef double[::1] g = np.zeros(assets)
+    cdef double[::1] b = np.zeros(assets)
+
+    # all assets of a multivariate OU process at once. x is of size
+    # (N + 1) x sims x M with s0 in the first row and the correlated
+    # random numbers in the rest, stepped in place. mu and sigma are
+    # (N x sims x M) for steps 1 to N and can be broadcast views (zero
+    # strides) of per asset values or time series. x can be a slice of
+    # the sims so that callers can split them across threads.
+
+    if scheme == 1:
+        for i in range(assets):
+            ou_exact_coefs(theta[i], dt, &a[i], &oma[i], &g[i], &b[i])
+
+    with nogil:
+        for j in range(1, steps + 1):
+            for r in range(sims):
+                for i in range(assets):
+                    x[j, r, i] = ou_step(
+                        x[j - 1, r, i], x[j, r, i], theta[i], mu[j - 1, r, i],
+                        sigma[j - 1, r, i], dt, sq, log_price, scheme, a[i],
+                        oma[i], g[i], b[i]
+                    )
+
+    return np.asarray(x)
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def csimOUJ(
-    double[::1] x,
-    double[::1] elp,
-    double[::1] ejp,
+    double[:, ::1] x,
+    const double[:, ::1] elp,
+    const double[:, ::1] ejp,
+    double theta,
+    const double[:, :] mu,
+    double dt,
+    const double[:, :] sigma,
+    unsigned long long int rows,
+    unsigned long long int cols,
+    unsigned int mr_lag,
+    double jump_prob,
+    double jump_avgsize
+    ):
+    cdef long long int j
+    cdef long long int r
+    cdef long long int lag_left
+    cdef double lag_jump
+    cdef double jump
+    cdef double m
+
+    cdef double sq = sqrt(dt)
+
+    # input x is a 2D array of size sims x (N + 1) where the first
+    # value of each sim is s0, so it is skipped. mu and sigma can be
+    # broadcast views as in csimOU. After a jump the mean reversion
+    # level stays raised by the jump (lag_jump) for the next
+    # mr_lag - 1 steps (lag_left) and no other jump can happen in
+    # that time. Only one jump can be active at a time so the lag is
+    # held per sim rather than written ahead into an array, and
+    # elp, ejp and mu are never modified.
+
+    with nogil:
+        for r in range(rows):
+            lag_left = 0
+            lag_jump = 0.0
+
+            for j in range(1, cols):
+                m = mu[r, j]
+                jump = ejp[r, j] * elp[r, j]
+
+                if lag_left > 0:
+                    m = m + lag_jump
+                    jump = 0.0
+                    lag_left = lag_left - 1
+                elif (mr_lag > 1) and (ejp[r, j] > 0.0):
+                    # if there is a jump in this step, add it to the mean
+                    # reversion level so that it doesn't drop back down to
+                    # the given mean too quickly. Simulates impact of lagged
+                    # market response to a jump
+                    lag_jump = jump
+                    lag_left = mr_lag - 1
+
+                x[r, j] = ouj_step(
+                    x[r, j - 1], x[r, j], jump, theta, m, sigma[r, j], dt, sq,
+                    jump_prob, jump_avgsize
+                )
+
+    return np.asarray(x)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def csimOUJ_sparse(
+    double[:, ::1] x,
+    const long long[::1] ev_ptr,
+    const long long[::1] ev_step,
+    const double[::1] ev_jump,
     double theta,
-    double[::1] mu,
+    const double[:, :] mu,
     double dt,
-    double[::1] sigma,
+    const double[:, :] sigma,
     unsigned long long int rows,
     unsigned long long int cols,
     unsigned int mr_lag,
     double jump_prob,
     double jump_avgsize
     ):
-    cdef long long int i = 1
-    cdef long long int j = 0
-    cdef long long int end
-
-    # pre-compute to make faster
-    cdef long long int ll = rows * cols
-
-    cdef double sq = np.sqrt(dt)
-
-    # input x is a 2D array that has been reshaped to be 1D.
-    # Loop through entire 1D array of length rows*cols,
-    # skips value every time counter j is reaches row
-    # count - effectively a new sim.
-
-    for i in range(1, ll):
-        if j >= (cols - 1):
-            j = 0
-        else:
-            j = j + 1
-
-            # calc step
-            x[i] = (
-                x[i - 1]
-                + theta
-                    * (mu[i] - jump_prob * jump_avgsize - x[i - 1])
-                    * x[i - 1]
-                    * dt
-                + sigma[i] * x[i - 1] * x[i] * sq
-                + ejp[i] * elp[i]
-            )
-
-            if (ejp[i] > 0.0):
-                # if there is a jump in this step, add it to the mean reversion
-                # level so that it doesn't drop back down to the given mean too
-                # quickly. Simulates impact of lagged market response to a jump
-
-                # make sure that it doesn't roll over into a new simulation
-                end = min(mr_lag, cols - j - 1)
-
-                for k in range(i, i + end):
-                    mu[k] = mu[k] + ejp[i] * elp[i]
-                    if k > i:
-                        ejp[k] = 0.0 # stops double jumps
+    cdef long long int j
+    cdef long long int r
+    cdef long long int k
+    cdef long long int lag_left
+    cdef double lag_jump
+    cdef double jump
+    cdef double m
+
+    cdef double sq = sqrt(dt)
+
+    # same as csimOUJ but the jumps are given as a list of events rather
+    # than dense arrays. The events of sim r are ev_ptr[r] to ev_ptr[r + 1]
+    # (exclusive) of ev_step and ev_jump, sorted by time step. After a jump
+    # the mean reversion level stays raised by the jump for the next
+    # mr_lag - 1 steps and no other jump can happen in that time.
+
+    with nogil:
+        for r in range(rows):
+            k = ev_ptr[r]
+            lag_left = 0
+            lag_jump = 0.0
+
+            for j in range(1, cols):
+                m = mu[r, j]
+                jump = 0.0
+
+                if (k < ev_ptr[r + 1]) and (ev_step[k] == j):
+                    jump = ev_jump[k]
+                    k = k + 1
+
+                if lag_left > 0:
+                    m = m + lag_jump
+                    jump = 0.0
+                    lag_left = lag_left - 1
+                elif (mr_lag > 1) and (jump != 0.0):
+                    lag_jump = jump
+                    lag_left = mr_lag - 1
+
+                x[r, j] = ouj_step(
+                    x[r, j - 1], x[r, j], jump, theta, m, sigma[r, j], dt, sq,
+                    jump_prob, jump_avgsize
+                )
+
+    return np.asarray(x)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def csimOUJ_MV(
+    double[:, :, :] x,
+    const long long[::1] ev_ptr,
+    const long long[::1] ev_step,
+    const double[::1] ev_jump,
+    const double[::1] theta,
+    const double[:, :, :] mu,
+    double dt,
+    const double[:, :, :] sigma,
+    unsigned long long int steps,
+    unsigned long long int sims,
+    unsigned long long int assets,
+    const long long[::1] mr_lag,
+    const double[::1] jump_prob,
+    const double[::1] jump_avgsize
+    ):
+    cdef long long int j
+    cdef long long int r
+    cdef long long int i
+    cdef long long int n
+    cdef double jump
+    cdef double m
+
+    cdef double sq = sqrt(dt)
+    cdef long long[::1] k = np.array(np.asarray(ev_ptr)[: sims * assets])
+    cdef long long[::1] lag_left = np.zeros(sims * assets, dtype=np.int64)
+    cdef double[::1] lag_jump = np.zeros(sims * assets)
+
+    # all assets of a multivariate OU jump process at once, see csimOU_MV
+    # for the layout of x, mu and sigma. The jumps are events as in
+    # csimOUJ_sparse with a row for every sim and asset, r * M + i, and k
+    # is the next event of each row. theta, mr_lag, jump_prob and
+    # jump_avgsize are per asset.
+
+    with nogil:
+        for j in range(1, steps + 1):
+            for r in range(sims):
+                for i in range(assets):
+                    n = r * assets + i
+                    m = mu[j - 1, r, i]
+                    jump = 0.0
+
+                    if (k[n] < ev_ptr[n + 1]) and (ev_step[k[n]] == j):
+                        jump = ev_jump[k[n]]
+                        k[n] = k[n] + 1
+
+                    if lag_left[n] > 0:
+                        m = m + lag_jump[n]
+                        jump = 0.0
+                        lag_left[n] = lag_left[n] - 1
+                    elif (mr_lag[i] > 1) and (jump != 0.0):
+                        lag_jump[n] = jump
+                        lag_left[n] = mr_lag[i] - 1
+
+                    x[j, r, i] = ouj_step(
+                        x[j - 1, r, i], x[j, r, i], jump, theta[i], m,
+                        sigma[j - 1, r, i], dt, sq, jump_prob[i], jump_avgsize[i]
+                    )
+
+    return np.asarray(x)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def csimOU_state(
+    double[::1] x,
+    const double[:, :] eps,
+    double theta,
+    const double[:, :] mu,
+    double dt,
+    const double[:, :] sigma,
+    double[::1] x_sum,
+    double[::1] x_min,
+    double[::1] x_max,
+    double[::1] x_above,
+    unsigned long long int rows,
+    unsigned long long int cols,
+    unsigned int log_price,
+    unsigned int scheme=0,
+    unsigned int stats=0,
+    unsigned int above=0,
+    double strike=0.0
+    ):
+    cdef long long int j
+    cdef long long int r
+
+    cdef double sq = sqrt(dt)
+    cdef double a = 0.0, oma = 0.0, g = 0.0, b = 0.0
+
+    # advances the current value x of each sim by a block of time
+    # steps without storing the path. eps, mu and sigma are of size
+    # steps x sims (time steps as rows). If stats is set, the running
+    # sum, min and max of each path are updated as well, and if above
+    # is set the number of steps above strike (x_above).
+
+    if scheme == 1:
+        ou_exact_coefs(theta, dt, &a, &oma, &g, &b)
+
+    with nogil:
+        for j in range(rows):
+            for r in range(cols):
+                x[r] = ou_step(
+                    x[r], eps[j, r], theta, mu[j, r], sigma[j, r], dt, sq,
+                    log_price, scheme, a, oma, g, b
+                )
+
+                if stats != 0:
+                    x_sum[r] = x_sum[r] + x[r]
+                    if x[r] < x_min[r]:
+                        x_min[r] = x[r]
+                    if x[r] > x_max[r]:
+                        x_max[r] = x[r]
+                if (above != 0) and (x[r] > strike):
+                    x_above[r] = x_above[r] + 1.0
+
+    return np.asarray(x)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def csimOUJ_state(
+    double[::1] x,
+    const double[:, :] eps,
+    const double[:, :] elp,
+    const double[:, :] ejp,
+    double theta,
+    const double[:, :] mu,
+    double dt,
+    const double[:, :] sigma,
+    double[::1] lag_jump,
+    long long[::1] lag_left,
+    double[::1] x_sum,
+    double[::1] x_min,
+    double[::1] x_max,
+    double[::1] x_above,
+    unsigned long long int rows,
+    unsigned long long int cols,
+    unsigned int mr_lag,
+    double jump_prob,
+    double jump_avgsize,
+    unsigned int stats=0,
+    unsigned int above=0,
+    double strike=0.0
+    ):
+    cdef long long int j
+    cdef long long int r
+    cdef double jump
+    cdef double m
+
+    cdef double sq = sqrt(dt)
+
+    # advances the current value x of each sim by a block of time
+    # steps as in csimOU_state. After a jump the mean reversion level
+    # stays raised by the jump (lag_jump) for the next mr_lag - 1
+    # steps (lag_left) and no other jump can happen in that time,
+    # the same as csimOUJ.
+
+    with nogil:
+        for j in range(rows):
+            for r in range(cols):
+                m = mu[j, r]
+                jump = ejp[j, r] * elp[j, r]
+
+                if lag_left[r] > 0:
+                    m = m + lag_jump[r]
+                    jump = 0.0
+                    lag_left[r] = lag_left[r] - 1
+                elif (mr_lag > 1) and (ejp[j, r] > 0.0):
+                    lag_jump[r] = jump
+                    lag_left[r] = mr_lag - 1
+
+                x[r] = ouj_step(
+                    x[r], eps[j, r], jump, theta, m, sigma[j, r], dt, sq,
+                    jump_prob, jump_avgsize
+                )
+
+                if stats != 0:
+                    x_sum[r] = x_sum[r] + x[r]
+                    if x[r] < x_min[r]:
+                        x_min[r] = x[r]
+                    if x[r] > x_max[r]:
+                        x_max[r] = x[r]
+                if (above != 0) and (x[r] > strike):
+                    x_above[r] = x_above[r] + 1.0
 
     return np.asarray(x)